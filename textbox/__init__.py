@@ -1,14 +1,16 @@
 import asyncio
 import curses
-from typing import Callable, Union, List
+import signal
+from concurrent.futures import Executor
+from typing import AsyncIterable, Callable, Optional, Union, List, Tuple
 
 import uvloop
 
 from .signals import WindowQuit
 from .window import Window
 from .curses_utils import curses_wrapper
-from .input_manager import AsyncInputManager
-from .input_output_workspace import InputOutputWorkspace
+from .input_manager import AsyncInputManager, READ_MODE
+from .input_output_workspace import InputOutputWorkspace, INPUT_MODE
 from .input_box import InputBox
 from .text_box import TextBox
 from .text import Text
@@ -16,6 +18,9 @@ from .text_segment import TextSegment
 from .text_line import TextLine
 from .segmented_text_line import SegmentedTextLine
 from .color_code import ColorCode
+from .handler_runner import HandlerRunner
+from .output_queue import OutputQueue, OVERFLOW
+from .latency_stats import LatencyStats
 
 import logging
 
@@ -23,10 +28,64 @@ logger = logging.getLogger()
 
 
 class App:
-    def __init__(self):
+    def __init__(
+        self,
+        fps: Optional[float] = 60,
+        read_mode: READ_MODE = READ_MODE.EVENT,
+        key_timeout: Optional[float] = 1.0,
+        executor: Optional[Executor] = None,
+        max_queued_prints: Optional[int] = None,
+        print_overflow: OVERFLOW = OVERFLOW.BLOCK,
+        latency_stats: bool = False,
+        history_file: Optional[str] = None,
+        max_scrollback_lines: Optional[int] = None,
+        max_scrollback_bytes: Optional[int] = None,
+        search_workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            fps (Optional[float]): The most times per second that printed output is painted.  None paints on every
+                event loop iteration.
+            read_mode (READ_MODE): Whether to wait for terminal input events or to poll for keys.
+            key_timeout (Optional[float]): Seconds to wait for the next key of a sequence such as gg.  None waits
+                forever.
+            executor (Optional[Executor]): Runs submit and command handlers that are plain functions, e.g. a
+                ThreadPoolExecutor, so they do not block the UI.  Without one they are called directly.  Handlers
+                that are coroutine functions always run as tasks.
+            max_queued_prints (Optional[int]): The most prints from other threads that may wait for the event loop.
+                None does not bound them.
+            print_overflow (OVERFLOW): What print does in another thread when max_queued_prints are waiting:
+                block until the event loop catches up, drop the oldest print, or merge the print into the newest.
+            latency_stats (bool): Whether to time each burst of keys from the terminal having input to the result
+                being painted.  The :stats command prints the percentiles, and turns the timing on and off.
+            history_file (Optional[str]): A file that keeps the history of submitted input across restarts.  None
+                keeps the latest 100 entries in memory.
+            max_scrollback_lines (Optional[int]): The most lines of printed output kept.  The oldest output is
+                dropped beyond it.  None keeps all of it.
+            max_scrollback_bytes (Optional[int]): The most bytes of printed output kept, as for max_scrollback_lines.
+            search_workers (Optional[int]): The processes that scan long output for / and ? searches that its index
+                cannot narrow down.  None starts one per core, the first time one is needed.  They are started with
+                spawn, so the script that starts the App must guard it with if __name__ == "__main__".
+        """
+        self.fps = fps
+        self.read_mode = read_mode
+        self.key_timeout = key_timeout
+        self.history_file = history_file
+        self.max_scrollback_lines = max_scrollback_lines
+        self.max_scrollback_bytes = max_scrollback_bytes
+        self.search_workers = search_workers
+        self.stats = LatencyStats(enabled=latency_stats)
+        self._handlers = HandlerRunner(executor)
+        self._output = OutputQueue(self._print_batch, max_queued_prints, print_overflow, merge=self._merge_prints)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._input_manager: Optional[AsyncInputManager] = None
+        self._key_bindings: List[Tuple[INPUT_MODE, str, Callable[[int], None]]] = []
         self._submit_callbacks = []
-        self._user_defined_commands = {"help": self._default_help}
-        self._user_defined_commands_help = {"help": "Print this help message."}
+        self._user_defined_commands = {"help": self._default_help, "stats": self._default_stats}
+        self._user_defined_commands_help = {
+            "help": "Print this help message.",
+            "stats": "Print keystroke-to-paint latency.  Takes on, off or reset.",
+        }
         self.workspace: InputOutputWorkspace = None
 
     def start(self):
@@ -40,30 +99,81 @@ class App:
         main()
 
     async def run(self, window: Window):
-        async with AsyncInputManager(window) as input_manager:
+        self._loop = asyncio.get_running_loop()
+        async with AsyncInputManager(window, self.read_mode) as input_manager:
             try:
+                self._input_manager = input_manager
+                self._loop.add_signal_handler(signal.SIGINT, self._on_interrupt)
                 await asyncio.sleep(0.05)
-                self.workspace = InputOutputWorkspace(window, input_manager)
+                self.workspace = InputOutputWorkspace(
+                    window,
+                    input_manager,
+                    fps=self.fps,
+                    key_timeout=self.key_timeout,
+                    stats=self.stats,
+                    history_path=self.history_file,
+                    max_scrollback_lines=self.max_scrollback_lines,
+                    max_scrollback_bytes=self.max_scrollback_bytes,
+                    search_workers=self.search_workers,
+                )
+                for mode, keys, func in self._key_bindings:
+                    self.workspace.keymap.bind(mode, keys, func)
                 self.workspace.set_submit_callback(self._submit_callback)
                 self.workspace.set_command_callback(self._command_callback)
+                self.workspace.set_cancel_callback(self._handlers.cancel)
+                self._handlers.on_busy = self._on_busy
+                self._handlers.on_error = self._on_handler_error
+                self._output.attach(self._loop)
                 self.workspace.enter_insert_mode()
                 window.refresh()
                 self.workspace.focused_box.refresh()
+                self.workspace.render()
 
             except Exception as e:
                 logger.exception(e)
                 input_manager.stop()
                 raise e
+        self._handlers.cancel()
+        self._output.detach()
+        self._loop.remove_signal_handler(signal.SIGINT)
+        if self.workspace is not None:
+            self.workspace.close()
         self.workspace = None
+        self._input_manager = None
+        self._loop = None
 
     def _submit_callback(self, text: str):
         for func in self._submit_callbacks:
-            func(text)
+            self._handlers.run(func, text)
+
+    def _on_busy(self, busy: bool):
+        if self.workspace is not None:
+            self.workspace.busy = busy
+
+    def _on_handler_error(self, exc: BaseException):
+        if isinstance(exc, WindowQuit):
+            self._input_manager.stop()
+            return
+        logger.info("Handler failed", exc_info=exc)
+        self.print(f"{type(exc).__name__}: {exc}")
+
+    def _on_interrupt(self):
+        """Ctrl-C cancels the running handlers, or quits when nothing is running"""
+        if not self._handlers.cancel():
+            self._input_manager.stop()
+
+    def cancel(self) -> bool:
+        """Cancel the running submit and command handlers.
+
+        Returns:
+            bool: Whether there was anything to cancel
+        """
+        return self._handlers.cancel()
 
     def _command_callback(self, command_str: str):
         command = command_str.split(" ")[0]
         if command in self._user_defined_commands:
-            self._user_defined_commands[command](command_str)
+            self._handlers.run(self._user_defined_commands[command], command_str)
         else:
             self.print(f"Unknown command: {command}")
 
@@ -72,6 +182,29 @@ class App:
         return func
 
     def print(self, text: Union[str, Text, List[SegmentedTextLine]], end="\n"):
+        """Print text to the output box.  Safe to call from any thread."""
+        if not isinstance(text, (str, Text, list)):
+            raise ValueError(f"Cannot print {type(text)}")
+        if self._loop is not None and self._running_loop() is not self._loop:
+            # Curses may only be used from the event loop, so other threads queue their output for it.
+            self._output.put((text, end))
+            return
+        # Apply what other threads printed first, to keep the order.
+        self._output.drain()
+        self._print_now(text, end)
+
+    def _print_batch(self, batch: List[Tuple[Union[str, Text, List[SegmentedTextLine]], str]]):
+        for text, end in batch:
+            self._print_now(text, end)
+
+    @staticmethod
+    def _merge_prints(first: Tuple[Union[str, Text, List], str], second: Tuple[Union[str, Text, List], str]):
+        """Merge two queued prints of strings into one print"""
+        if not isinstance(first[0], str) or not isinstance(second[0], str):
+            return None
+        return first[0] + first[1] + second[0], second[1]
+
+    def _print_now(self, text: Union[str, Text, List[SegmentedTextLine]], end="\n"):
         if self.workspace.output_bounding_box is None:
             raise ValueError("The application is not running.")
         if isinstance(text, str):
@@ -94,6 +227,56 @@ class App:
         if end == "\n":
             self.workspace.output_box.end_current_text()
 
+    async def stream(
+        self, tokens: AsyncIterable[Union[str, TextSegment]], style: Optional[int] = None, end: str = "\n"
+    ) -> str:
+        """Print tokens as they arrive, appending each one in place to the same output Text.  Output printed while
+        the tokens stream, e.g. by another handler, is added below the reply rather than into it.
+
+        Appending a token does not draw anything.  The rows it changed are painted in the next frame, so thousands of
+        tokens per second stream without a redraw each.
+
+        Args:
+            tokens (AsyncIterable[Union[str, TextSegment]]): The tokens, e.g. of a streamed LLM reply
+            style (Optional[int]): The color pair, e.g. a ColorCode, of tokens given as str.  None continues the
+                color of the text before them.
+            end (str): Printed after the last token, as for print.
+
+        Returns:
+            str: Everything that was streamed
+        """
+        if self.workspace is None:
+            raise ValueError("The application is not running.")
+        self._output.drain()
+        output_box = self.workspace.output_box
+        # The reply keeps its own Text, since other handlers may print while it streams.
+        text_id = output_box.open_text()
+        streamed = []
+        try:
+            async for token in tokens:
+                if style is not None and isinstance(token, str):
+                    token = TextSegment(token, style)
+                output_box.append_to(text_id, token)
+                streamed.append(str(token))
+        finally:
+            # Later output starts below the reply even if the stream failed or was cancelled, unless end continues
+            # it and nothing was printed below it.
+            output_box.close_text(text_id, resume=end != "\n")
+        return "".join(streamed)
+
+    @staticmethod
+    def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def flush(self):
+        """Paint printed output that is waiting for the next frame right away"""
+        if self.workspace is None:
+            raise ValueError("The application is not running.")
+        self.workspace.render()
+
     def command(self, name: str, *alt_names, help: str = None):
         def decorator(func):
             self._user_defined_commands[name] = func
@@ -104,13 +287,61 @@ class App:
 
         return decorator
 
+    def bind(self, keys: str, mode: INPUT_MODE = INPUT_MODE.COMMAND):
+        """Call the decorated function with the count, 1 unless one was typed, when keys are typed in mode.
+
+        Keys are written as in vim, e.g. "gx", "<C-r>" or "<Esc>", and replace any binding they share.
+        """
+
+        def decorator(func: Callable[[int], None]):
+            self._key_bindings.append((mode, keys, func))
+            if self.workspace is not None:
+                self.workspace.keymap.bind(mode, keys, func)
+            return func
+
+        return decorator
+
     def _default_help(self, command_str: str):
         self.print("Commands:")
         for command, help in self._user_defined_commands_help.items():
             self.print(f"  {command}: {help}")
 
+    def _default_stats(self, command_str: str):
+        args = command_str.split()[1:]
+        match args:
+            case ["on"]:
+                self.stats.enabled = True
+                self.print("Latency stats on.")
+            case ["off"]:
+                self.stats.enabled = False
+                self.print("Latency stats off.")
+            case ["reset"]:
+                self.stats.reset()
+                self.print("Latency stats reset.")
+            case []:
+                if self.stats.count("total") == 0:
+                    state = "on" if self.stats.enabled else "off, :stats on starts them"
+                    self.print(f"No latency samples yet.  Latency stats are {state}.")
+                    return
+                for line in self.stats.format():
+                    self.print(line)
+            case _:
+                self.print("Usage: stats [on|off|reset]")
+
     def stop(self):
         raise WindowQuit()
 
 
-__all__ = ["App", "Text", "InputBox", "TextBox", "TextSegment", "TextLine", "ColorCode"]
+__all__ = [
+    "App",
+    "READ_MODE",
+    "INPUT_MODE",
+    "OVERFLOW",
+    "LatencyStats",
+    "Text",
+    "InputBox",
+    "TextBox",
+    "TextSegment",
+    "TextLine",
+    "ColorCode",
+]
@@ -0,0 +1,44 @@
+from typing import Dict, Optional
+import curses
+
+from textbox.window import Window
+
+import logging
+
+logger = logging.getLogger()
+
+
+class Compositor:
+    """Batches the refreshes of several windows into a single physical screen update per frame.
+
+    Boxes mark their window dirty instead of refreshing it.  render() stages every dirty window with
+    noutrefresh and then calls curses.doupdate() once.  The focused window is always staged last, so it wins
+    any rows it shares with its neighbours and the terminal cursor ends up inside it."""
+
+    def __init__(self):
+        self._dirty: Dict[int, Window] = {}
+        self.focused: Optional[Window] = None
+
+    @property
+    def dirty(self) -> bool:
+        """Whether any window is waiting to be drawn"""
+        return len(self._dirty) > 0
+
+    def mark_dirty(self, window: Window):
+        """Stage window to be copied to the screen in the next frame"""
+        self._dirty[id(window)] = window
+
+    def render(self, verbose=False):
+        """Draw every dirty window to the screen with a single doupdate"""
+        if not self._dirty:
+            return
+        for window in self._dirty.values():
+            if window is not self.focused:
+                window.noutrefresh(verbose=verbose)
+        if self.focused is not None:
+            self.focused.touch(verbose=verbose)
+            self.focused.noutrefresh(verbose=verbose)
+        self._dirty.clear()
+        curses.doupdate()
+        if verbose:
+            logger.info("Compositor: frame rendered")
@@ -0,0 +1,148 @@
+from itertools import islice
+from typing import Iterable, List, Tuple
+
+
+class FenwickTree:
+    """A binary indexed tree over a list of non-negative integers.
+
+    Point updates, appends and prefix sums cost O(log n), and find() maps a running total back to the
+    index that contains it in O(log n).  This is used to turn wrapped row numbers into line/text indexes.
+
+    popleft() removes the first value by zeroing it and moving the start of the tree past it, so the indexes of
+    the remaining values shift down by one.  The tree is rebuilt without the removed values once they make up
+    half of it, which keeps popleft O(log n) amortized.
+
+    splice() inserts or removes values in the middle, shifting the indexes of the values after them."""
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._build(list(values))
+
+    def _build(self, values: List[int]):
+        self._values: List[int] = values
+        # The values before _start were popped, and are zero in the tree.
+        self._start = 0
+        self._tree: List[int] = [0] * (len(self._values) + 1)
+        for idx, value in enumerate(self._values, start=1):
+            self._tree[idx] += value
+            parent = idx + (idx & -idx)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[idx]
+        self._total = sum(self._values)
+
+    @property
+    def total(self) -> int:
+        """Get the sum of every value in the tree"""
+        return self._total
+
+    def set(self, idx: int, value: int):
+        """Set the value at idx"""
+        idx += self._start
+        delta = value - self._values[idx]
+        if delta == 0:
+            return
+        self._values[idx] = value
+        self._total += delta
+        idx += 1
+        while idx < len(self._tree):
+            self._tree[idx] += delta
+            idx += idx & -idx
+
+    def append(self, value: int):
+        """Append a value to the end of the tree"""
+        idx = len(self._tree)
+        lowest_bit = idx & -idx
+        self._tree.append(value + self._prefix_sum(idx - 1) - self._prefix_sum(idx - lowest_bit))
+        self._values.append(value)
+        self._total += value
+
+    def splice(self, start: int, stop: int, values: Iterable[int] = ()):
+        """Replace the values in [start, stop) with values, shifting the ones after them.
+
+        Only the tree nodes from start on are rebuilt, so this costs O(n - start + log n) integer additions."""
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError(f"Cannot splice [{start}, {stop}) of a FenwickTree of length {len(self)}")
+        start += self._start
+        stop += self._start
+        values = list(values)
+        self._total += sum(values) - sum(self._values[start:stop])
+        self._values[start:stop] = values
+        tree = self._tree
+        tree[start + 1 :] = self._values[start:]
+        # The nodes up to start only cover values before it.  The ones whose parents were reset are on its prefix
+        # sum path.
+        idx = start
+        while idx > 0:
+            parent = idx + (idx & -idx)
+            if parent < len(tree):
+                tree[parent] += tree[idx]
+            idx -= idx & -idx
+        for idx in range(start + 1, len(tree)):
+            parent = idx + (idx & -idx)
+            if parent < len(tree):
+                tree[parent] += tree[idx]
+
+    def popleft(self) -> int:
+        """Remove the first value and return it"""
+        if len(self) == 0:
+            raise IndexError("popleft from an empty FenwickTree")
+        value = self._values[self._start]
+        self.set(0, 0)
+        self._start += 1
+        if self._start * 2 > len(self._values):
+            self._build(self._values[self._start :])
+        return value
+
+    def prefix_sum(self, count: int) -> int:
+        """Get the sum of the first count values"""
+        # The popped values are zero, so they add nothing.
+        return self._prefix_sum(self._start + count)
+
+    def _prefix_sum(self, count: int) -> int:
+        result = 0
+        while count > 0:
+            result += self._tree[count]
+            count -= count & -count
+        return result
+
+    def range_sum(self, start: int, stop: int) -> int:
+        """Get the sum of the values in [start, stop)"""
+        return self.prefix_sum(stop) - self.prefix_sum(start)
+
+    def find(self, target: int) -> Tuple[int, int]:
+        """Find the index whose span of the running total contains target.
+
+        Returns:
+            Tuple[int, int]: The index, and how far target lies past the start of that index's span
+
+        Raises:
+            IndexError: If target is negative or not less than the total
+        """
+        if not 0 <= target < self._total:
+            raise IndexError(f"{target} is out of range for a FenwickTree with total {self._total}")
+        position = 0
+        remaining = target
+        step = 1 << (len(self._values).bit_length() - 1)
+        while step > 0:
+            next_position = position + step
+            if next_position < len(self._tree) and self._tree[next_position] <= remaining:
+                position = next_position
+                remaining -= self._tree[next_position]
+            step >>= 1
+        # Popped values span no rows, so the position is never before the start.
+        return position - self._start, remaining
+
+    def __getitem__(self, idx: int) -> int:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("FenwickTree index out of range")
+        return self._values[self._start + idx]
+
+    def __len__(self) -> int:
+        return len(self._values) - self._start
+
+    def __iter__(self):
+        return islice(self._values, self._start, None)
+
+    def __repr__(self) -> str:
+        return f"FenwickTree({list(self)})"
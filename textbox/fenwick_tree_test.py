@@ -0,0 +1,149 @@
+import random
+
+import pytest
+
+from textbox.fenwick_tree import FenwickTree
+
+
+def test_prefix_sum():
+    test = FenwickTree([1, 2, 3, 4, 5])
+    assert test.total == 15
+    assert [test.prefix_sum(idx) for idx in range(6)] == [0, 1, 3, 6, 10, 15]
+    assert test.range_sum(1, 3) == 5
+    assert len(test) == 5
+    assert list(test) == [1, 2, 3, 4, 5]
+
+
+def test_set():
+    test = FenwickTree([1, 2, 3])
+    test.set(1, 10)
+    assert test[1] == 10
+    assert test.total == 14
+    assert test.prefix_sum(2) == 11
+
+
+def test_append():
+    test = FenwickTree()
+    for value in range(1, 20):
+        test.append(value)
+        assert test.prefix_sum(len(test)) == test.total == sum(range(1, value + 1))
+    assert [test.prefix_sum(idx) for idx in range(20)] == [sum(range(1, idx + 1)) for idx in range(20)]
+
+
+def test_find():
+    test = FenwickTree([2, 0, 3, 1])
+    assert test.find(0) == (0, 0)
+    assert test.find(1) == (0, 1)
+    assert test.find(2) == (2, 0)
+    assert test.find(4) == (2, 2)
+    assert test.find(5) == (3, 0)
+    with pytest.raises(IndexError):
+        test.find(6)
+    with pytest.raises(IndexError):
+        test.find(-1)
+    with pytest.raises(IndexError):
+        FenwickTree().find(0)
+
+
+def test_matches_list_model():
+    rng = random.Random(0)
+    model = [rng.randrange(5) for _ in range(50)]
+    test = FenwickTree(model)
+    for _ in range(500):
+        if rng.random() < 0.2:
+            model.append(rng.randrange(5))
+            test.append(model[-1])
+        else:
+            idx = rng.randrange(len(model))
+            model[idx] = rng.randrange(5)
+            test.set(idx, model[idx])
+        count = rng.randrange(len(model) + 1)
+        assert test.prefix_sum(count) == sum(model[:count])
+    for target in range(sum(model)):
+        idx, offset = test.find(target)
+        assert sum(model[:idx]) + offset == target
+        assert 0 <= offset < model[idx]
+
+
+def test_popleft():
+    test = FenwickTree([1, 2, 3])
+    assert test.popleft() == 1
+    assert len(test) == 2
+    assert list(test) == [2, 3]
+    assert test[0] == 2
+    assert test.total == 5
+    assert test.prefix_sum(1) == 2
+    assert test.find(0) == (0, 0)
+    assert test.find(2) == (1, 0)
+    test.set(0, 4)
+    assert test.total == 7
+    assert test.popleft() == 4
+    assert test.popleft() == 3
+    with pytest.raises(IndexError):
+        test.popleft()
+
+
+def test_popleft_matches_list_model():
+    rng = random.Random(1)
+    model = [rng.randrange(5) for _ in range(20)]
+    test = FenwickTree(model)
+    for _ in range(1000):
+        choice = rng.random()
+        if choice < 0.4 and len(model) > 0:
+            assert test.popleft() == model.pop(0)
+        elif choice < 0.8:
+            model.append(rng.randrange(5))
+            test.append(model[-1])
+        elif len(model) > 0:
+            idx = rng.randrange(len(model))
+            model[idx] = rng.randrange(5)
+            test.set(idx, model[idx])
+        assert len(test) == len(model)
+        assert test.total == sum(model)
+        count = rng.randrange(len(model) + 1)
+        assert test.prefix_sum(count) == sum(model[:count])
+        if test.total > 0:
+            target = rng.randrange(test.total)
+            idx, offset = test.find(target)
+            assert sum(model[:idx]) + offset == target
+            assert 0 <= offset < model[idx]
+
+
+def test_splice():
+    test = FenwickTree([1, 2, 3, 4])
+    test.splice(1, 1, [5])
+    assert list(test) == [1, 5, 2, 3, 4]
+    test.splice(2, 4)
+    assert list(test) == [1, 5, 4]
+    assert test.total == 10
+    assert test.find(6) == (2, 0)
+    test.splice(3, 3, [7, 8])
+    assert [test.prefix_sum(idx) for idx in range(6)] == [0, 1, 6, 10, 17, 25]
+    with pytest.raises(IndexError):
+        test.splice(4, 6)
+
+
+def test_splice_matches_list_model():
+    rng = random.Random(2)
+    model = [rng.randrange(5) for _ in range(30)]
+    test = FenwickTree(model)
+    for _ in range(1000):
+        choice = rng.random()
+        if choice < 0.2 and len(model) > 0:
+            assert test.popleft() == model.pop(0)
+        else:
+            start = rng.randrange(len(model) + 1)
+            stop = rng.randrange(start, min(start + 3, len(model)) + 1)
+            values = [rng.randrange(5) for _ in range(rng.randrange(4))]
+            model[start:stop] = values
+            test.splice(start, stop, values)
+        assert list(test) == model
+        assert test.total == sum(model)
+        assert [test.prefix_sum(count) for count in range(len(model) + 1)] == [
+            sum(model[:count]) for count in range(len(model) + 1)
+        ]
+        if test.total > 0:
+            target = rng.randrange(test.total)
+            idx, offset = test.find(target)
+            assert sum(model[:idx]) + offset == target
+            assert 0 <= offset < model[idx]
@@ -0,0 +1,76 @@
+from concurrent.futures import Executor
+from typing import Any, Callable, Optional, Set
+import asyncio
+import functools
+import inspect
+
+import logging
+
+logger = logging.getLogger()
+
+
+class HandlerRunner:
+    """Runs user handlers, such as on_submit functions, without blocking the input loop.
+
+    Coroutine functions are scheduled as tasks.  Plain functions run in the executor when one is given, and are
+    called directly otherwise.  Handlers that are still running can be cancelled.  A function running in a thread
+    cannot be stopped, so cancelling it only discards its result."""
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self.executor = executor
+        # Called with True when the first handler starts running, and with False when the last one finishes.
+        self.on_busy = lambda busy: None
+        # Called with the exception of a handler that failed.
+        self.on_error = lambda exc: logger.info("Handler failed", exc_info=exc)
+        self._running: Set[asyncio.Future] = set()
+
+    @property
+    def busy(self) -> bool:
+        """Whether any handler is still running"""
+        return len(self._running) > 0
+
+    def run(self, func: Callable[..., Any], *args) -> Optional[asyncio.Future]:
+        """Start func(*args).
+
+        Returns:
+            Optional[asyncio.Future]: The future of the running handler, or None if it already returned.
+        """
+        loop = asyncio.get_running_loop()
+        if inspect.iscoroutinefunction(func):
+            future = loop.create_task(func(*args))
+        elif self.executor is not None:
+            future = loop.run_in_executor(self.executor, functools.partial(func, *args))
+        else:
+            result = func(*args)
+            if not inspect.isawaitable(result):
+                return None
+            future = asyncio.ensure_future(result)
+
+        self._running.add(future)
+        future.add_done_callback(self._on_done)
+        if len(self._running) == 1:
+            self.on_busy(True)
+        return future
+
+    def cancel(self) -> bool:
+        """Cancel every running handler.
+
+        Returns:
+            bool: Whether there was anything to cancel
+        """
+        if not self.busy:
+            return False
+        logger.info("Cancelling %s handlers", len(self._running))
+        for future in list(self._running):
+            future.cancel()
+        return True
+
+    def _on_done(self, future: asyncio.Future):
+        self._running.discard(future)
+        if not self.busy:
+            self.on_busy(False)
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            self.on_error(exc)
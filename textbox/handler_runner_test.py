@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from textbox.handler_runner import HandlerRunner
+
+
+def test_plain_function_runs_inline():
+    calls = []
+
+    async def main():
+        runner = HandlerRunner()
+        assert runner.run(calls.append, "hello") is None
+        assert not runner.busy
+
+    asyncio.run(main())
+    assert calls == ["hello"]
+
+
+def test_coroutine_function_runs_as_task():
+    calls = []
+    busy = []
+
+    async def handler(text: str):
+        await asyncio.sleep(0.01)
+        calls.append(text)
+
+    async def main():
+        runner = HandlerRunner()
+        runner.on_busy = busy.append
+        future = runner.run(handler, "hello")
+        assert runner.busy
+        assert calls == []
+        await future
+        assert not runner.busy
+
+    asyncio.run(main())
+    assert calls == ["hello"]
+    assert busy == [True, False]
+
+
+def test_executor_runs_plain_functions_in_threads():
+    threads = []
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            runner = HandlerRunner(executor)
+            await runner.run(lambda: threads.append(threading.get_ident()))
+
+    asyncio.run(main())
+    assert threads != [threading.get_ident()]
+
+
+def test_cancel():
+    cancelled = []
+
+    async def handler():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        runner = HandlerRunner()
+        assert not runner.cancel()
+        future = runner.run(handler)
+        await asyncio.sleep(0)
+        assert runner.cancel()
+        await asyncio.wait([future])
+        await asyncio.sleep(0)
+        assert future.cancelled()
+        assert not runner.busy
+
+    asyncio.run(main())
+    assert cancelled == [True]
+
+
+def test_errors_go_to_on_error():
+    errors = []
+
+    async def handler():
+        raise ValueError("boom")
+
+    async def main():
+        runner = HandlerRunner()
+        runner.on_error = errors.append
+        runner.run(handler)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert [str(exc) for exc in errors] == ["boom"]
@@ -0,0 +1,65 @@
+from typing import List, Optional, Tuple
+
+from textbox.input_box import InputHistory
+from textbox.text import Text
+
+
+class HistorySearch:
+    """An incremental reverse search through an InputHistory, as with Ctrl-R in a shell.
+
+    Each character typed extends the query and keeps the current match if it still matches, or finds an older
+    one.  older() skips to the next older match, and backspace() undoes the last character typed, along with the
+    matches it led to."""
+
+    def __init__(self, history: InputHistory):
+        self.history = history
+        self.query = ""
+        # The index of the matched entry, or None before anything matched.
+        self.match: Optional[int] = None
+        # Whether the last character typed, or the last older(), found nothing.  The previous match is kept.
+        self.failed = False
+        self._states: List[Tuple[str, Optional[int], bool]] = []
+
+    @property
+    def prompt(self) -> str:
+        failed = "failed " if self.failed else ""
+        return f"({failed}reverse-i-search)`{self.query}': "
+
+    @property
+    def text(self) -> Optional[Text]:
+        """The matched entry"""
+        if self.match is None:
+            return None
+        return self.history[self.match]
+
+    def add(self, text: str):
+        """Add text to the query"""
+        self._save()
+        self.query += text
+        if not self.failed:
+            # The current match may still match the longer query.
+            self._search(None if self.match is None else self.match + 1)
+
+    def older(self):
+        """Find the next older entry that matches the query"""
+        if self.query == "":
+            return
+        self._save()
+        self._search(self.match)
+
+    def backspace(self):
+        """Undo the last add() or older()"""
+        if len(self._states) > 0:
+            self.query, self.match, self.failed = self._states.pop()
+
+    def _save(self):
+        self._states.append((self.query, self.match, self.failed))
+
+    def _search(self, before: Optional[int]):
+        match = self.history.search(self.query, before)
+        self.failed = match is None
+        if match is not None:
+            self.match = match
+
+    def __repr__(self):
+        return f"HistorySearch(query={self.query!r}, match={self.match}, failed={self.failed})"
@@ -0,0 +1,126 @@
+from textbox.history_search import HistorySearch
+from textbox.input_box import InputHistory
+from textbox.text import Text
+from textbox.text_list import TextList
+
+
+def make_history(*entries: str, **kwargs) -> InputHistory:
+    history = InputHistory(**kwargs)
+    for entry in entries:
+        history.append(Text(entry))
+    return history
+
+
+def test_search_newest_first():
+    history = make_history("git status", "ls -la", "git commit", "echo hi")
+    assert history.search("git") == 2
+    assert history.search("git", before=2) == 0
+    assert history.search("git", before=0) is None
+    assert history.search("svn") is None
+    assert history.search("") is None
+    # Shorter than a trigram, so every entry is checked.
+    assert history.search("hi") == 3
+
+
+def test_search_sees_new_and_evicted_entries():
+    history = make_history("alpha one", "beta two", max_size=3)
+    assert history.search("alpha") == 0
+    history.append(Text("alpha three"))
+    assert history.search("alpha") == 2
+    history.append(Text("gamma four"))
+    # "alpha one" was evicted, so the indexes moved down.
+    assert history.search("alpha") == 1
+    assert history.search("one") is None
+    assert str(history[history.search("two")]) == "beta two"
+
+
+def test_search_unwraps_lines():
+    history = InputHistory()
+    history.append(Text("a long prompt that wraps", max_line_width=6))
+    assert history.search("long prompt") == 0
+
+
+def test_search_store(tmp_path):
+    history = InputHistory(path=tmp_path / "history")
+    for idx in range(1000):
+        history.append(Text(f"prompt number {idx}"))
+    assert history.search("number 99") == 999
+    assert history.search("number 99", before=999) == 998
+    assert history.search("number 5") == 599
+    history.close()
+
+
+def test_incremental_search():
+    search = HistorySearch(make_history("make test", "make build", "git push", "make test again"))
+    assert search.text is None
+    search.add("m")
+    assert search.match == 3
+    for ch in "ake b":
+        search.add(ch)
+    assert search.query == "make b"
+    assert search.match == 1
+    assert str(search.text) == "make build"
+    assert search.prompt == "(reverse-i-search)`make b': "
+    search.add("x")
+    assert search.failed
+    assert search.match == 1
+    assert search.prompt.startswith("(failed reverse-i-search)")
+    search.backspace()
+    search.backspace()
+    assert search.query == "make "
+    assert search.match == 3
+    assert not search.failed
+
+
+def test_older_matches():
+    search = HistorySearch(make_history("make test", "make build", "git push", "make test again"))
+    search.add("make")
+    assert search.match == 3
+    search.older()
+    assert search.match == 1
+    search.older()
+    assert search.match == 0
+    search.older()
+    assert search.failed
+    assert search.match == 0
+    search.backspace()
+    assert search.match == 0
+    assert not search.failed
+    search.backspace()
+    assert search.match == 1
+
+
+def test_search_while_indexing(tmp_path):
+    history = InputHistory(path=tmp_path / "history")
+    for idx in range(1000):
+        history.append(Text(f"prompt number {idx}"))
+    history.close()
+
+    history = InputHistory(path=tmp_path / "history")
+    assert not history.indexed
+    queries = [("number 99", None), ("number 99", 999), ("number 5", None), ("number 12", 100), ("nothing", None)]
+    expected = [999, 998, 599, 12, None]
+    assert [history.search(query, before) for query, before in queries] == expected
+    assert history.index_step(300)
+    assert [history.search(query, before) for query, before in queries] == expected
+    while history.index_step(300):
+        pass
+    assert history.indexed
+    assert [history.search(query, before) for query, before in queries] == expected
+    history.append(Text("a new prompt"))
+    assert history.indexed
+    assert history.search("new prompt") == 1000
+    history.close()
+
+
+def test_match_from_history_file_is_wrapped_at_box_width(tmp_path):
+    make_history("short", "deploy " + "x" * 30, path=tmp_path / "history").close()
+    history = InputHistory(path=tmp_path / "history")
+    search = HistorySearch(history)
+    search.add("deploy")
+    # The match is shown in the user box the way Ctrl-R shows it.
+    text_list = TextList(max_line_width=10)
+    text_list.add_text(Text(""))
+    text_list.set_first_text(search.text)
+    assert [len(row) for row in text_list.iter_rows()] == [10, 10, 10, 7]
+    history.close()
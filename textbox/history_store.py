@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from typing import BinaryIO, List, Union
+import json
+import os
+import struct
+
+import logging
+
+logger = logging.getLogger()
+
+
+class HistoryStore:
+    """An append-only history of strings kept on disk, which is read lazily.
+
+    Entries are written to a log file, one JSON string per line, and the byte offset of each entry is written to
+    an index file next to it as a fixed-size integer.  Opening the store only reads the sizes of the two files, and
+    reading an entry costs a seek into each, so startup and append take the same time for a hundred entries or a
+    million.  Entries are read a page at a time, and the most recently used pages are cached, so scrolling back
+    through the history reads each page once.
+
+    A crash between writing an entry and its offset is repaired on the next open by indexing the entries the index
+    is missing, and a torn last entry is cut off."""
+
+    PAGE_SIZE = 256
+    MAX_CACHED_PAGES = 16
+    _OFFSET = struct.Struct("<Q")
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        """
+        Args:
+            path (Union[str, os.PathLike]): The log file.  The index is kept in the same place with .idx added.
+        """
+        self.path = os.fspath(path)
+        self.index_path = self.path + ".idx"
+        self._log: BinaryIO = open(self.path, "ab+")
+        self._index: BinaryIO = open(self.index_path, "ab+")
+        self._pages: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._log_size = self._log.seek(0, os.SEEK_END)
+        index_size = self._index.seek(0, os.SEEK_END)
+        self._count = index_size // self._OFFSET.size
+        self._recover(index_size)
+
+    def _recover(self, index_size: int):
+        """Make the index match the log, after a crash or if either file was changed by hand"""
+        # Drop offsets past the end of the log, and any partly written offset.
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._offset(mid) < self._log_size:
+                lo = mid + 1
+            else:
+                hi = mid
+        if index_size != lo * self._OFFSET.size:
+            logger.info("HistoryStore: dropping %s offsets past the end of %s", self._count - lo, self.path)
+            self._truncate(lo, self._log_size)
+
+        # Index the entries after the last indexed one.
+        start = self._offset(self._count - 1) if self._count > 0 else 0
+        self._log.seek(start)
+        if self._count > 0 and not self._log.readline().endswith(b"\n"):
+            logger.info("HistoryStore: cutting off a torn entry at the end of %s", self.path)
+            self._truncate(self._count - 1, start)
+            return
+        offsets = []
+        position = self._log.tell()
+        for line in self._log:
+            if not line.endswith(b"\n"):
+                logger.info("HistoryStore: cutting off a torn entry at the end of %s", self.path)
+                self._truncate(self._count, position)
+                break
+            offsets.append(position)
+            position += len(line)
+        if len(offsets) > 0:
+            logger.info("HistoryStore: indexing %s entries missing from %s", len(offsets), self.index_path)
+            self._write_offsets(offsets)
+
+    def _truncate(self, count: int, log_size: int):
+        self._count = count
+        self._index.truncate(count * self._OFFSET.size)
+        self._log_size = log_size
+        self._log.truncate(log_size)
+
+    def _offset(self, idx: int) -> int:
+        self._index.seek(idx * self._OFFSET.size)
+        return self._OFFSET.unpack(self._index.read(self._OFFSET.size))[0]
+
+    def _write_offsets(self, offsets: List[int]):
+        self._index.write(b"".join(self._OFFSET.pack(offset) for offset in offsets))
+        self._index.flush()
+        self._count += len(offsets)
+
+    def append(self, text: str):
+        """Add text to the end of the history and write it to disk"""
+        if not isinstance(text, str):
+            raise ValueError("Text must be a string")
+        record = (json.dumps(text, ensure_ascii=False) + "\n").encode("utf-8")
+        # The entry is written before its offset, so the index never points at an entry that is not there.
+        self._log.write(record)
+        self._log.flush()
+        offset = self._log_size
+        self._log_size += len(record)
+        page = self._pages.get(self._count // self.PAGE_SIZE)
+        self._write_offsets([offset])
+        if page is not None:
+            page.append(text)
+
+    def _page(self, page_idx: int) -> List[str]:
+        page = self._pages.get(page_idx)
+        if page is not None:
+            self._pages.move_to_end(page_idx)
+            return page
+
+        first = page_idx * self.PAGE_SIZE
+        last = min(first + self.PAGE_SIZE, self._count)
+        start = self._offset(first)
+        stop = self._offset(last) if last < self._count else self._log_size
+        self._log.seek(start)
+        lines = self._log.read(stop - start).splitlines()
+        page = [json.loads(line) for line in lines]
+
+        self._pages[page_idx] = page
+        if len(self._pages) > self.MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
+        return page
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(item, slice):
+            return [self[idx] for idx in range(*item.indices(self._count))]
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("HistoryStore index out of range")
+        return self._page(item // self.PAGE_SIZE)[item % self.PAGE_SIZE]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self._log.close()
+        self._index.close()
+        self._pages.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"HistoryStore(path={self.path}, len={self._count}, cached_pages={list(self._pages)})"
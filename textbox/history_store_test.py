@@ -0,0 +1,135 @@
+import os
+
+from textbox.history_store import HistoryStore
+from textbox.input_box import InputHistory
+from textbox.text import Text
+from textbox.text_list import TextList
+
+
+def test_append_and_read(tmp_path):
+    with HistoryStore(tmp_path / "history") as store:
+        assert len(store) == 0
+        for text in ("first", "two\nlines", 'ünïcode "quoted"'):
+            store.append(text)
+        assert len(store) == 3
+        assert store[0] == "first"
+        assert store[1] == "two\nlines"
+        assert store[-1] == 'ünïcode "quoted"'
+        assert store[1:] == ["two\nlines", 'ünïcode "quoted"']
+
+
+def test_survives_reopen(tmp_path):
+    path = tmp_path / "history"
+    with HistoryStore(path) as store:
+        for idx in range(1000):
+            store.append(f"entry {idx}")
+    with HistoryStore(path) as store:
+        assert len(store) == 1000
+        assert store[-1] == "entry 999"
+        assert store[0] == "entry 0"
+        store.append("after reopen")
+    with HistoryStore(path) as store:
+        assert len(store) == 1001
+        assert store[1000] == "after reopen"
+
+
+def test_pages_are_read_lazily(tmp_path):
+    path = tmp_path / "history"
+    with HistoryStore(path) as store:
+        for idx in range(HistoryStore.PAGE_SIZE * 3):
+            store.append(str(idx))
+    with HistoryStore(path) as store:
+        assert repr(store).endswith("cached_pages=[])")
+        assert store[-1] == str(HistoryStore.PAGE_SIZE * 3 - 1)
+        assert list(store._pages) == [2]
+        # A cached last page sees new entries.
+        store.append("new")
+        assert store[-1] == "new"
+        assert store[HistoryStore.PAGE_SIZE * 3] == "new"
+
+
+def test_cache_is_bounded(tmp_path):
+    with HistoryStore(tmp_path / "history") as store:
+        store.PAGE_SIZE = 2
+        store.MAX_CACHED_PAGES = 3
+        for idx in range(20):
+            store.append(str(idx))
+        assert [store[idx] for idx in range(20)] == [str(idx) for idx in range(20)]
+        assert len(store._pages) == 3
+
+
+def test_indexes_entries_missing_from_index(tmp_path):
+    path = tmp_path / "history"
+    with HistoryStore(path) as store:
+        for text in ("a", "b", "c"):
+            store.append(text)
+    # Lose the last offset, as if the process died between writing the entry and its offset.
+    os.truncate(str(path) + ".idx", 8 * 2 + 3)
+    with HistoryStore(path) as store:
+        assert len(store) == 3
+        assert store[:] == ["a", "b", "c"]
+
+
+def test_cuts_off_torn_entry(tmp_path):
+    path = tmp_path / "history"
+    with HistoryStore(path) as store:
+        store.append("complete")
+        store.append("torn entry")
+    os.truncate(path, os.path.getsize(path) - 3)
+    with HistoryStore(path) as store:
+        assert len(store) == 1
+        assert store[:] == ["complete"]
+        store.append("next")
+    with HistoryStore(path) as store:
+        assert store[:] == ["complete", "next"]
+
+
+def test_drops_offsets_past_end_of_log(tmp_path):
+    path = tmp_path / "history"
+    with HistoryStore(path) as store:
+        for text in ("a", "b", "c"):
+            store.append(text)
+    os.truncate(path, len('"a"\n'))
+    with HistoryStore(path) as store:
+        assert store[:] == ["a"]
+
+
+def test_input_history_with_path(tmp_path):
+    path = tmp_path / "history"
+    history = InputHistory(path=path)
+    history.append(Text("one"))
+    history.append(Text("two\nlines"))
+    history.close()
+
+    history = InputHistory(path=path)
+    assert len(history) == 2
+    assert history.at_present()
+    assert history.has_history()
+    history.set_short_term_memory(Text("draft"))
+    assert str(history.previous()) == "two\nlines"
+    assert str(history.previous()) == "one"
+    assert str(history.next()) == "two\nlines"
+    assert str(history.next()) == "draft"
+    history.close()
+
+
+def test_input_history_stores_unwrapped_lines(tmp_path):
+    history = InputHistory(path=tmp_path / "history")
+    history.append(Text("a" * 25 + "\nb", max_line_width=10))
+    history.close()
+    with HistoryStore(tmp_path / "history") as store:
+        assert store[0] == "a" * 25 + "\nb"
+
+
+def test_recalled_entry_is_wrapped_at_box_width(tmp_path):
+    history = InputHistory(path=tmp_path / "history")
+    history.append(Text("x" * 35))
+    history.close()
+
+    history = InputHistory(path=tmp_path / "history")
+    text_list = TextList(max_line_width=10)
+    text_list.add_text(Text(""))
+    text_list.set_first_text(history.previous())
+    assert text_list.line_count == 4
+    assert [len(row) for row in text_list.iter_rows()] == [10, 10, 10, 5]
+    history.close()
@@ -1,7 +1,11 @@
-from typing import Union
+from typing import List, Optional, Union
+import os
 
 from textbox.text_box import TextBox
 from textbox.text import Text
+from textbox.history_store import HistoryStore
+from textbox.ring_buffer import RingBuffer
+from textbox.ngram_index import NgramIndex
 
 import logging
 
@@ -9,11 +13,25 @@ logger = logging.getLogger()
 
 
 class InputHistory:
-    def __init__(self, max_size: int = 100):
+    def __init__(self, max_size: int = 100, path: Optional[Union[str, os.PathLike]] = None):
+        """
+        Args:
+            max_size (int): The most entries kept when the history only lives in memory.
+            path (Optional[Union[str, os.PathLike]]): A file that keeps the history across restarts.  Every entry is
+                kept, and entries are read from the file as the history is scrolled through.
+        """
         self._max_size = max_size
-        self._history = []
-        self._history_ptr = 0
+        if path is None:
+            self._history: Union[RingBuffer[Text], HistoryStore] = RingBuffer(max_size)
+        else:
+            self._history = HistoryStore(path)
+        self._history_ptr = len(self._history)
         self._short_term_memory = None
+        # Entries evicted from a full in-memory history.  An entry's id in the search index is its index plus this.
+        self._evicted = 0
+        self._index = NgramIndex()
+        # The id of the oldest entry that is not in the search index yet.
+        self._indexed = 0
 
     def has_short_term_memory(self) -> bool:
         return self._short_term_memory is not None
@@ -38,40 +56,121 @@ class InputHistory:
         if not isinstance(text, Text):
             raise ValueError("Text must be a Text object")
 
-        self._history.append(text)
-        if len(self._history) > self._max_size:
-            self._history = self._history[-self._max_size :]
+        caught_up = self.indexed
+        if isinstance(self._history, HistoryStore):
+            self._history.append(self._unwrapped(text))
+        else:
+            # A full buffer evicts the oldest entry.
+            evicted = self._history.append(text)
+            if evicted is not None:
+                if self._evicted < self._indexed:
+                    self._index.remove(self._evicted, self._unwrapped(evicted))
+                self._evicted += 1
         self._history_ptr = len(self._history)
+        if caught_up:
+            self.index_step(1)
+
+    @property
+    def indexed(self) -> bool:
+        """Whether every entry is in the search index"""
+        return self._indexed >= self._evicted + len(self._history)
+
+    def index_step(self, budget: int = 1000) -> bool:
+        """Add up to budget of the entries that are not in the search index yet to it, oldest first.  New entries
+        are added as they are appended once the index has caught up.
+
+        Returns:
+            bool: Whether entries remain to be indexed
+        """
+        self._indexed = max(self._indexed, self._evicted)
+        stop = min(self._indexed + budget, self._evicted + len(self._history))
+        for doc_id in range(self._indexed, stop):
+            self._index.add(doc_id, self._plain(doc_id - self._evicted))
+        self._indexed = stop
+        return not self.indexed
+
+    def search(self, query: str, before: Optional[int] = None) -> Optional[int]:
+        """Find the newest entry that contains query, as for Ctrl-R.
+
+        The entries in the search index are looked up by the trigrams of the query, so only the entries that have
+        all of them are read.  Entries that are not indexed yet, which are the newest, are read one by one.
+
+        Args:
+            query (str): The text to find
+            before (Optional[int]): Only search the entries before this index.  None searches every entry.
+
+        Returns:
+            Optional[int]: The index of the entry, or None if no entry contains query
+        """
+        if before is None:
+            before = len(self._history)
+        if query == "" or before <= 0:
+            return None
+        first_unindexed = max(self._indexed - self._evicted, 0)
+        for idx in range(before - 1, first_unindexed - 1, -1):
+            if query in self._plain(idx):
+                return idx
+        before = min(before, first_unindexed)
+        candidates = self._index.candidates(query, before=self._evicted + before)
+        if candidates is None:
+            candidates = range(self._evicted + before - 1, self._evicted - 1, -1)
+        for doc_id in candidates:
+            idx = doc_id - self._evicted
+            if query in self._plain(idx):
+                return idx
+        return None
+
+    def _plain(self, idx: int) -> str:
+        entry = self._history[idx]
+        return entry if isinstance(entry, str) else self._unwrapped(entry)
 
     def previous(self) -> Text:
         if self._history_ptr > 0:
             self._history_ptr -= 1
-            return self._history[self._history_ptr]
+            return self._entry(self._history_ptr)
         else:
-            return self._history[0]
+            return self._entry(0)
 
     def next(self) -> Text:
         if self._history_ptr < len(self._history) - 1:
             self._history_ptr += 1
-            return self._history[self._history_ptr]
+            return self._entry(self._history_ptr)
         elif self._history_ptr == len(self._history) - 1:
             self._history_ptr += 1
             return self.pop_short_term_memory()
         else:
             return None
 
-    def __getitem__(self, item: Union[int, slice]) -> Text:
-        return self._history[item]
+    @staticmethod
+    def _unwrapped(text: Text) -> str:
+        # str(text) has a newline wherever a line wraps.
+        return "\n".join(str(line) for line in text)
+
+    def _entry(self, idx: int) -> Text:
+        entry = self._history[idx]
+        return Text(entry) if isinstance(entry, str) else entry
+
+    def close(self):
+        """Close the history file, if there is one"""
+        if isinstance(self._history, HistoryStore):
+            self._history.close()
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[Text, List[Text]]:
+        if isinstance(item, slice):
+            return [self._entry(idx) for idx in range(*item.indices(len(self._history)))]
+        return self._entry(item)
 
     def __len__(self):
         return len(self._history)
 
     def __repr__(self):
-        return f"InputHistory(len={len(self._history)}, ptr={self._history_ptr}, memory={str(self._short_term_memory)})"
+        return (
+            f"InputHistory(len={len(self._history)}, ptr={self._history_ptr}, memory={str(self._short_term_memory)})"
+        )
 
 
 class InputBox(TextBox):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, history: Optional[InputHistory] = None, **kwargs):
         super().__init__(*args, **kwargs)
         if not self.top_to_bottom:
             raise ValueError("InputBox must be top-to-bottom")
@@ -79,7 +178,11 @@ class InputBox(TextBox):
         # Initialize the text list with a single empty text.
         self._text_list.insert("")
         self._text_ptr = 0
-        self._history = InputHistory()
+        self._history = history if history is not None else InputHistory()
+
+    @property
+    def history(self) -> InputHistory:
+        return self._history
 
     def set_text(self, text: Text):
         if self.verbose:
@@ -149,20 +252,20 @@ class InputBox(TextBox):
             logger.info("Appending to history: %s", repr(self.text))
         self._history.append(self.text.copy())
 
-    def cursor_down(self):
-        self.text.increment_line_ptr()
+    def cursor_down(self, count: int = 1):
+        self.text.increment_line_ptr(count)
         self.redraw(True)
 
-    def cursor_up(self):
-        self.text.decrement_line_ptr()
+    def cursor_up(self, count: int = 1):
+        self.text.decrement_line_ptr(count)
         self.redraw(True)
 
-    def cursor_left(self):
-        self.text.decrement_column_ptr()
+    def cursor_left(self, count: int = 1):
+        self.text.decrement_column_ptr(count)
         self.redraw(True)
 
-    def cursor_right(self):
-        self.text.increment_column_ptr()
+    def cursor_right(self, count: int = 1):
+        self.text.increment_column_ptr(count)
         self.redraw(True)
 
     def handle_backspace(self):
@@ -173,19 +276,32 @@ class InputBox(TextBox):
         self.text.insert(ch)
         self.redraw(with_cursor=True)
 
+    def insert_text_at_cursor(self, text: str):
+        self.text.insert_block(text)
+        self.redraw(with_cursor=True)
+
+    def replace_text_at_cursor(self, text: str):
+        for ch in text:
+            self.text.replace_character(ch)
+        self.redraw(with_cursor=True)
+
     def replace_character_at_cursor(self, ch: str):
         self.text.replace_character(ch)
         self.redraw(with_cursor=True)
 
-    def word_forward(self):
-        next_word_position = self.text.start_of_next_word()
-        if next_word_position is not None:
+    def word_forward(self, count: int = 1):
+        for _ in range(count):
+            next_word_position = self.text.start_of_next_word()
+            if next_word_position is None:
+                break
             self.text.goto(next_word_position)
         self.redraw(with_cursor=True)
 
-    def word_backward(self):
-        prev_word_position = self.text.start_of_previous_word()
-        if prev_word_position is not None:
+    def word_backward(self, count: int = 1):
+        for _ in range(count):
+            prev_word_position = self.text.start_of_previous_word()
+            if prev_word_position is None:
+                break
             self.text.goto(prev_word_position)
         self.redraw(with_cursor=True)
 
@@ -196,3 +312,16 @@ class InputBox(TextBox):
     def start_of_line(self):
         self.text.to_start_of_line()
         self.redraw(with_cursor=True)
+
+    def start_of_text(self):
+        self.text.to_start_of_text()
+        self.redraw(with_cursor=True)
+
+    def end_of_text(self):
+        self.text.to_last_line()
+        self.text.to_start_of_line()
+        self.redraw(with_cursor=True)
+
+    def delete_line(self):
+        self.text.delete_line()
+        self.redraw(with_cursor=True)
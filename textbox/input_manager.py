@@ -1,53 +1,221 @@
 import asyncio
 import curses
+import os
+import signal
+import sys
+from enum import Enum
+from typing import List, Optional, Union
 
 from .window import Window
 from .signals import WindowQuit, DelayedRedraw
+from .latency_stats import LatencyStats
 import logging
 
 logger = logging.getLogger()
 
 
+class READ_MODE(Enum):
+    # Wake up only when the terminal has bytes to read, or the terminal was resized.
+    EVENT = 0
+    # Poll getch, sleeping between polls while no key is pending.
+    POLL = 1
+
+
 class AsyncInputManager:
-    def __init__(self, window: Window):
+    BRACKETED_PASTE_ON = "\x1b[?2004h"
+    BRACKETED_PASTE_OFF = "\x1b[?2004l"
+    PASTE_START = (27, ord("["), ord("2"), ord("0"), ord("0"), ord("~"))
+    PASTE_END = b"\x1b[201~"
+    # How long the start of PASTE_START at the end of a read waits for the rest of it.  A lone Esc key waits this
+    # long before it is handled.
+    PASTE_START_TIMEOUT = 0.025
+
+    def __init__(self, window: Window, read_mode: READ_MODE = READ_MODE.EVENT, bracketed_paste: bool = True):
         self.window = window
+        self.read_mode = read_mode
+        self.bracketed_paste = bracketed_paste
         self.on_keypress = lambda x: None
+        # Called with every key read in one wakeup, and the text of any bracketed paste among them as a str.
+        # Defaults to calling on_keypress and on_paste.
+        self.on_keypresses = None
+        # Called with the text of a bracketed paste.  Defaults to calling on_keypress for each character.
+        self.on_paste = None
         self.redraw = lambda: None
+        # Times each wakeup from the terminal having input to its keys being read, when enabled.
+        self.stats = LatencyStats()
         self.running = False
+        self._readable: asyncio.Event = None
+        self._paste: Optional[bytearray] = None
+        # The keys at the end of the last read that begin PASTE_START, in case the rest of it is in the next read.
+        self._paste_start: List[int] = []
 
     async def __aenter__(self, *args, **kwargs):
         self.window._local_window.nodelay(True)
         self.running = True
-        self.input_future = asyncio.create_task(self.__async_input_loop())
         self.redraw_soon = False
+        if self.bracketed_paste:
+            self.__write_terminal(self.BRACKETED_PASTE_ON)
+        if self.read_mode == READ_MODE.EVENT:
+            loop = asyncio.get_running_loop()
+            self._readable = asyncio.Event()
+            loop.add_reader(sys.stdin.fileno(), self._on_readable)
+            loop.add_signal_handler(signal.SIGWINCH, self._on_resize)
+            self.input_future = asyncio.create_task(self.__async_event_loop())
+        else:
+            self.input_future = asyncio.create_task(self.__async_input_loop())
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         logger.debug("InputManager: Pending Exit")
         await self.input_future
+        if self.bracketed_paste:
+            self.__write_terminal(self.BRACKETED_PASTE_OFF)
+        if self.read_mode == READ_MODE.EVENT:
+            loop = asyncio.get_running_loop()
+            loop.remove_reader(sys.stdin.fileno())
+            loop.remove_signal_handler(signal.SIGWINCH)
         self.window._local_window.nodelay(False)
         logger.debug("InputManager: Complete")
 
     async def __async_input_loop(self):
         sleep_time = 0.015
         while self.running:
+            if self.stats.enabled:
+                self.stats.begin()
+            # A held start of PASTE_START waits for one more poll at most.
+            keys = self.__read_pending_keys(flush=len(self._paste_start) > 0)
+            if self.stats.enabled:
+                self.__mark_read(keys)
+            if self.redraw_soon:
+                self.redraw()
+                self.redraw_soon = False
+            if len(keys) == 0:
+                await asyncio.sleep(sleep_time)
+            else:
+                await self.__dispatch(keys)
+
+    async def __async_event_loop(self):
+        while self.running:
+            timed_out = False
+            if len(self._paste_start) > 0:
+                try:
+                    await asyncio.wait_for(self._readable.wait(), self.PASTE_START_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # No more input came, so the keys were not a paste, e.g. the Esc key.
+                    timed_out = True
+            else:
+                await self._readable.wait()
+            self._readable.clear()
+            keys = self.__read_pending_keys(flush=timed_out)
+            if self.stats.enabled:
+                self.__mark_read(keys)
+            if len(keys) > 0:
+                await self.__dispatch(keys)
+                if self.stats.enabled:
+                    # The paint ends the trace.  Drop it if the keys painted nothing, e.g. because a handler failed.
+                    self.stats.discard()
+            if self.redraw_soon:
+                self.redraw()
+                self.redraw_soon = False
+
+    def _on_readable(self):
+        # The reader fires on every loop iteration until the keys are read, so only the first call starts the trace.
+        if self.stats.enabled and not self.stats.tracing:
+            self.stats.begin()
+        self._readable.set()
+
+    def __mark_read(self, keys: List[Union[int, str]]):
+        if len(keys) > 0:
+            self.stats.mark("read")
+        else:
+            self.stats.discard()
+
+    def __read_pending_keys(self, flush: bool = False) -> List[Union[int, str]]:
+        """Read every key that is ready.  curses may hold several keys in its own buffer from a single read.
+
+        Args:
+            flush (bool): Return the keys held by the last read as the start of a paste, even if they still are.
+        """
+        keys = []
+        while True:
             try:
                 key = self.window.getch()
-                if self.redraw_soon:
-                    self.redraw()
-                    self.redraw_soon = False
-                if key == curses.ERR:
-                    await asyncio.sleep(sleep_time)
+            except curses.error:
+                break
+            if key == curses.ERR:
+                break
+            keys.append(key)
+        return self.__parse_pastes(keys, flush)
+
+    def __parse_pastes(self, keys: List[int], flush: bool = False) -> List[Union[int, str]]:
+        """Replace each bracketed paste in keys with the text that was pasted.  A paste may span several reads.
+
+        Keys at the end that begin PASTE_START are held back and parsed with the next read, unless flush is set.
+        """
+        keys = self._paste_start + keys
+        self._paste_start = []
+        events = []
+        idx = 0
+        while idx < len(keys):
+            key = keys[idx]
+            if self._paste is not None:
+                idx += 1
+                # Keys curses decoded from escape sequences inside the paste are dropped.
+                if 0 <= key < 256:
+                    self._paste.append(key)
+                if key == self.PASTE_END[-1] and self._paste.endswith(self.PASTE_END):
+                    del self._paste[-len(self.PASTE_END) :]
+                    text = self._paste.decode("utf-8", errors="replace")
+                    events.append(text.replace("\r\n", "\n").replace("\r", "\n"))
+                    self._paste = None
+            elif key == self.PASTE_START[0] and tuple(keys[idx : idx + len(self.PASTE_START)]) == self.PASTE_START:
+                idx += len(self.PASTE_START)
+                self._paste = bytearray()
+            elif key == self.PASTE_START[0] and not flush and tuple(keys[idx:]) == self.PASTE_START[: len(keys) - idx]:
+                # The rest of the start marker may be in the next read.
+                self._paste_start = keys[idx:]
+                break
+            else:
+                idx += 1
+                events.append(key)
+        return events
+
+    async def __dispatch(self, keys: List[Union[int, str]]):
+        if self.on_keypresses is not None:
+            try:
+                await self.on_keypresses(keys)
+            except WindowQuit:
+                self.stop()
+            except DelayedRedraw:
+                self.redraw_soon = True
+            return
+
+        for key in keys:
+            try:
+                if not isinstance(key, str):
+                    await self.on_keypress(key)
+                elif self.on_paste is not None:
+                    await self.on_paste(key)
                 else:
-                    try:
-                        await self.on_keypress(key)
-                    except WindowQuit:
-                        self.stop()
-                    except DelayedRedraw:
-                        self.redraw_soon = True
+                    for ch in key:
+                        await self.on_keypress(ord(ch))
+            except WindowQuit:
+                self.stop()
+                return
+            except DelayedRedraw:
+                self.redraw_soon = True
 
-            except curses.error:
-                await asyncio.sleep(sleep_time)
+    def __write_terminal(self, sequence: str):
+        sys.stdout.write(sequence)
+        sys.stdout.flush()
+
+    def _on_resize(self):
+        """Handle SIGWINCH in place of curses' own handler.  resizeterm queues a KEY_RESIZE for the next getch."""
+        size = os.get_terminal_size(sys.stdin.fileno())
+        curses.resizeterm(size.lines, size.columns)
+        self._readable.set()
 
     def stop(self):
         self.running = False
+        if self._readable is not None:
+            self._readable.set()
@@ -0,0 +1,34 @@
+from textbox.input_manager import AsyncInputManager
+
+
+def parse_pastes(manager: AsyncInputManager, keys, flush=False):
+    return manager._AsyncInputManager__parse_pastes([ord(key) if isinstance(key, str) else key for key in keys], flush)
+
+
+def test_paste():
+    manager = AsyncInputManager(None)
+    assert parse_pastes(manager, "a\x1b[200~dd\rx\x1b[201~b") == [ord("a"), "dd\nx", ord("b")]
+
+
+def test_paste_spans_reads():
+    manager = AsyncInputManager(None)
+    assert parse_pastes(manager, "\x1b[200~dd") == []
+    assert parse_pastes(manager, "x\x1b[20") == []
+    assert parse_pastes(manager, "1~") == ["ddx"]
+
+
+def test_paste_start_split_across_reads():
+    for split in range(1, len(AsyncInputManager.PASTE_START)):
+        manager = AsyncInputManager(None)
+        keys = "a\x1b[200~dd\x1b[201~"
+        assert parse_pastes(manager, keys[: split + 1]) == [ord("a")]
+        assert parse_pastes(manager, keys[split + 1 :]) == ["dd"]
+
+
+def test_held_paste_start_is_flushed():
+    manager = AsyncInputManager(None)
+    # The Esc key.
+    assert parse_pastes(manager, "\x1b") == []
+    assert parse_pastes(manager, "", flush=True) == [27]
+    assert parse_pastes(manager, "\x1b[") == []
+    assert parse_pastes(manager, "x") == [27, ord("["), ord("x")]
@@ -1,15 +1,24 @@
 import asyncio
 import curses
+import re
 from enum import Enum
-from typing import Callable
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 
 from textbox.window import Window
 from textbox.input_manager import AsyncInputManager
-from textbox.input_box import InputBox
+from textbox.input_box import InputBox, InputHistory
+from textbox.history_search import HistorySearch
+from textbox.scrollback_search import ScrollbackSearch, SearchMatch
+from textbox.sharded_search import ShardedSearch
 from textbox.text_box import TextBox
+from textbox.text import Text
 from textbox.box_types import BoundingBox, Dimensions
 from textbox.signals import WindowQuit, DelayedRedraw
 from textbox.color_code import ColorCode
+from textbox.compositor import Compositor
+from textbox.render_scheduler import RenderScheduler
+from textbox.keymap import Keymap
+from textbox.latency_stats import LatencyStats
 
 import logging
 
@@ -26,10 +35,30 @@ class INPUT_MODE(Enum):
     COMMAND = 2
     COMMAND_ENTRY = 3
     READ_ONLY = 4
+    HISTORY_SEARCH = 5
+    SEARCH_ENTRY = 6
 
 
 class InputOutputWorkspace:
-    def __init__(self, main_window: Window, input_manager: AsyncInputManager):
+    # Number of history entries added to the search index between yields to the event loop.
+    HISTORY_INDEX_BUDGET = 100
+    # Number of output Texts added to the search index between yields to the event loop.
+    SCROLLBACK_INDEX_BUDGET = 100
+    # Searches the index cannot narrow down are scanned by worker processes once the output has this many lines.
+    PARALLEL_SEARCH_LINES = 20000
+
+    def __init__(
+        self,
+        main_window: Window,
+        input_manager: AsyncInputManager,
+        fps: Optional[float] = 60,
+        key_timeout: Optional[float] = 1.0,
+        stats: Optional[LatencyStats] = None,
+        history_path: Optional[str] = None,
+        max_scrollback_lines: Optional[int] = None,
+        max_scrollback_bytes: Optional[int] = None,
+        search_workers: Optional[int] = None,
+    ):
         self.main_window = main_window
         self.command_box_height = 1
         self.user_box_height = 5
@@ -40,7 +69,13 @@ class InputOutputWorkspace:
         logger.info("command_box: %s", self.command_box)
 
         self.user_box = InputBox(
-            "user_box", main_window, self.user_bounding_box, ColorCode.WHITE, top_to_bottom=True, has_box=True
+            "user_box",
+            main_window,
+            self.user_bounding_box,
+            ColorCode.WHITE,
+            top_to_bottom=True,
+            has_box=True,
+            history=InputHistory(path=history_path),
         )
         self.output_box = TextBox(
             "output_box",
@@ -49,22 +84,127 @@ class InputOutputWorkspace:
             ColorCode.OUPTUT_TEXT,
             top_to_bottom=False,
             has_box=True,
+            max_lines=max_scrollback_lines,
+            max_bytes=max_scrollback_bytes,
         )
         self._submit_callback = None
         self._command_callback = None
+        self._cancel_callback = None
+        self._mode_text = ""
+        self._busy = False
+        self._history_search: Optional[HistorySearch] = None
+        self._history_search_return = INPUT_MODE.INSERT
+        self._history_search_original: Optional[Text] = None
+        self.scrollback_search = ScrollbackSearch(self.output_box.text_list)
+        self._search_regex: Optional[re.Pattern] = None
+        self._search_backward = False
+        # The direction of the search being typed, which is not read back from its prompt.
+        self._search_entry_backward = False
+        # The match shown in the output box.  n and N search from it.
+        self._search_match: Optional[SearchMatch] = None
+        self._scrollback_index_task: Optional[asyncio.Task] = None
+        self.output_box.text_list.on_add = self._scrollback_added
+        self.sharded_search = ShardedSearch(self.output_box.text_list, workers=search_workers)
+        self._parallel_search_task: Optional[asyncio.Task] = None
         # self.output_box.verbose = True
 
+        # Shared with the input manager, which starts each trace when the terminal has input.
+        self.stats = stats if stats is not None else input_manager.stats
+        input_manager.stats = self.stats
+        self.compositor = Compositor()
+        self.scheduler = RenderScheduler(self._render_frame, fps=fps)
+        for box in (self.command_box, self.user_box, self.output_box):
+            box.compositor = self.compositor
+            box.scheduler = self.scheduler
+
+        self.keymap = Keymap(timeout=key_timeout)
+        self._key_timeout_handle: Optional[asyncio.TimerHandle] = None
+        self._bind_default_keys()
+
         self._focused_box: TextBox = self.user_box
+        self.compositor.focused = self.user_box.window
         self.input_mode = INPUT_MODE.COMMAND
         input_manager.on_keypress = self.handle_keypress
+        input_manager.on_keypresses = self.handle_keypresses
+        input_manager.on_paste = self.handle_paste
         input_manager.redraw = self.redraw
 
+        self._history_index_task: Optional[asyncio.Task] = None
+        try:
+            asyncio.get_running_loop()
+            self._history_index_task = asyncio.create_task(self._index_history_in_background())
+        except RuntimeError:
+            pass
+
+    async def _index_history_in_background(self):
+        """Index the user box's history for Ctrl-R a little at a time, so a long history does not hold up the UI"""
+        while self.user_box.history.index_step(self.HISTORY_INDEX_BUDGET):
+            await asyncio.sleep(0)
+        self._history_index_task = None
+        logger.debug("History search index complete")
+
+    def _scrollback_added(self):
+        """Index the output for / and ? as it is added, a little at a time"""
+        if self._scrollback_index_task is not None or self.scrollback_search.indexed:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Texts that are not indexed are still searched, only more slowly.
+            return
+        self._scrollback_index_task = asyncio.create_task(self._index_scrollback_in_background())
+
+    async def _index_scrollback_in_background(self):
+        while self.scrollback_search.index_step(self.SCROLLBACK_INDEX_BUDGET):
+            await asyncio.sleep(0)
+        self._scrollback_index_task = None
+
+    def close(self):
+        """Stop background work and close the history file"""
+        if self._history_index_task is not None:
+            self._history_index_task.cancel()
+            self._history_index_task = None
+        if self._scrollback_index_task is not None:
+            self._scrollback_index_task.cancel()
+            self._scrollback_index_task = None
+        self._cancel_parallel_search()
+        self.sharded_search.close()
+        self.user_box.history.close()
+
     def set_submit_callback(self, func: Callable[[str], None]):
         self._submit_callback = func
 
     def set_command_callback(self, func: Callable[[str], None]):
         self._command_callback = func
 
+    def set_cancel_callback(self, func: Callable[[], bool]):
+        """Set the function that cancels running handlers.  It returns whether there was anything to cancel."""
+        self._cancel_callback = func
+
+    def cancel(self) -> bool:
+        if self._cancel_callback is None:
+            return False
+        return self._cancel_callback()
+
+    @property
+    def busy(self) -> bool:
+        """Whether a handler is running.  The command box shows this next to the input mode."""
+        return self._busy
+
+    @busy.setter
+    def busy(self, value: bool):
+        self._busy = value
+        if self.input_mode not in (INPUT_MODE.COMMAND_ENTRY, INPUT_MODE.SEARCH_ENTRY):
+            self.show_mode_text(self._mode_text)
+        self.scheduler.request()
+
+    def show_mode_text(self, text: str):
+        self._mode_text = text
+        if self._busy:
+            text = f"{text} [busy, Esc cancels]"
+        # The command box is a single row, and text that wraps would put the cursor below it.
+        self.command_box.set_text_to_str(text[: self.command_box.printable_width - 1])
+
     @property
     def command_bounding_box(self):
         return BoundingBox(
@@ -107,10 +247,26 @@ class InputOutputWorkspace:
 
     def redraw(self):
         logger.info("Redraw All Boxes")
-        self.command_box.redraw()
-        self.user_box.redraw()
-        self.output_box.redraw()
-        self.focused_box.redraw()
+        # getch refreshes the main window whenever it has changes, e.g. after resize_term, and it would paint
+        # its blank background over the boxes. Stage it first, so the boxes are drawn over it in the same frame.
+        self.main_window.noutrefresh()
+        for box in (self.command_box, self.user_box, self.output_box):
+            box.redraw()
+        self.render()
+
+    def _render_frame(self):
+        # Only the frame that follows the key handlers ends their trace.
+        traced = self.stats.enabled and self.stats.last_stage == "handler"
+        if traced:
+            self.stats.mark("draw")
+        self.compositor.render()
+        if traced:
+            self.stats.mark("paint")
+            self.stats.end()
+
+    def render(self):
+        """Draw everything that is pending, including scheduled redraws, to the screen in one update"""
+        self.scheduler.flush()
 
     @property
     def focused_box(self):
@@ -125,18 +281,20 @@ class InputOutputWorkspace:
             self._focused_box.box_visible = True
         else:
             self._focused_box = box_to_focus
+        self.compositor.focused = self._focused_box.window
 
     def cycle_focus(self):
         if self.focused_box == self.user_box:
             self.enter_reading_mode()
         elif self.focused_box == self.output_box:
+            self.end_scrollback_search()
             self.enter_command_mode()
 
     def enter_reading_mode(self):
         logger.info("Input Mode: READ_ONLY")
         self.input_mode = INPUT_MODE.READ_ONLY
         self.focused_box = self.output_box
-        self.command_box.set_text_to_str("-- READING --")
+        self.show_mode_text("-- READING --")
         curses.curs_set(0)
         self.focused_box.refresh()
 
@@ -144,7 +302,7 @@ class InputOutputWorkspace:
         curses.curs_set(1)
         self.input_mode = INPUT_MODE.REPLACE
         self.focused_box = self.user_box
-        self.command_box.set_text_to_str("-- REPLACE --")
+        self.show_mode_text("-- REPLACE --")
         logger.info("Input Mode: REPLACE")
         self.focused_box.refresh()
 
@@ -156,7 +314,7 @@ class InputOutputWorkspace:
             self.focused_box.text.increment_column_ptr()
         self.focused_box.update_cursor()
         self.input_mode = INPUT_MODE.INSERT
-        self.command_box.set_text_to_str("-- INSERT --")
+        self.show_mode_text("-- INSERT --")
         logger.info("Input Mode: INSERT")
         self.focused_box.refresh()
 
@@ -167,7 +325,7 @@ class InputOutputWorkspace:
         if self.focused_box != self.user_box:
             self.focused_box = self.user_box
         self.focused_box.text.edit_mode = False
-        self.command_box.set_text_to_str("-- COMMAND --")
+        self.show_mode_text("-- COMMAND --")
         logger.info("Input Mode: COMMAND")
         self.focused_box.redraw(with_cursor=True)
 
@@ -181,19 +339,263 @@ class InputOutputWorkspace:
         logger.info("Input Mode: COMMAND_ENTRY")
         self.focused_box.redraw()
 
+    def enter_search_entry_mode(self, backward: bool = False):
+        """Type a pattern to find in the output box after / or ?, as in vim"""
+        curses.curs_set(2)
+        self.input_mode = INPUT_MODE.SEARCH_ENTRY
+        self.focused_box = self.command_box
+        self._search_entry_backward = backward
+        self.command_box.set_text_to_str("?" if backward else "/")
+        self.focused_box.text.edit_mode = True
+        self.focused_box.text.increment_column_ptr()
+        logger.info("Input Mode: SEARCH_ENTRY")
+        self.focused_box.redraw()
+
+    def submit_search_entry(self):
+        entry = str(self.command_box.text)
+        self.submit_command()
+        self.enter_reading_mode()
+        self.search_scrollback(entry[1:], backward=self._search_entry_backward)
+
+    def _search_entry_backspace(self):
+        """Delete the character before the cursor.  The / or ? prompt is kept, and backspacing over it with no
+        pattern typed leaves the search line, as in vim."""
+        text = self.command_box.text
+        if text.column_ptr > 1:
+            self.focused_box.handle_backspace()
+        elif len(str(text)) <= 1:
+            self.enter_reading_mode()
+
+    def search_scrollback(self, pattern: str, backward: bool = False):
+        """Find a regex in the output box, scroll to the match and highlight every match in view.  An empty pattern
+        repeats the last search."""
+        if pattern != "":
+            try:
+                self._search_regex = re.compile(pattern)
+            except re.error as error:
+                self.show_mode_text(f"-- READING -- Invalid pattern: {error}")
+                return
+        elif self._search_regex is None:
+            return
+        self._search_backward = backward
+        self.search_next()
+
+    def search_next(self, reverse: bool = False):
+        """Find the next match of the last search, or the previous one if reverse, as with n and N in vim"""
+        if self._search_regex is None:
+            return
+        backward = self._search_backward != reverse
+        self.output_box.highlight = self._search_regex
+        if self._search_match is not None:
+            origin = self._search_match.position
+        else:
+            origin = self._view_origin(backward)
+        self._cancel_parallel_search()
+        if self._searches_in_parallel(self._search_regex):
+            self._parallel_search_task = asyncio.create_task(
+                self._search_in_parallel(self._search_regex, origin, backward)
+            )
+            return
+        match = self.scrollback_search.find(self._search_regex, origin, backward)
+        if match is not None:
+            self._show_search_match(match)
+        else:
+            self.output_box.request_redraw()
+        self.show_mode_text(f"-- READING -- {self._search_status(match, origin, backward)}")
+
+    def _searches_in_parallel(self, regex: re.Pattern) -> bool:
+        """Whether to scan for regex with the worker processes, which is when the index cannot narrow the search
+        down and scanning the output on the event loop would hold up the UI"""
+        if self.scrollback_search.can_look_up(regex):
+            return False
+        if self.output_box.text_list.line_count < self.PARALLEL_SEARCH_LINES:
+            return False
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    async def _search_in_parallel(self, regex: re.Pattern, origin: Optional[Tuple[int, int, int]], backward: bool):
+        """Show the matches as the worker processes find them, and jump to the nearest as soon as it is known"""
+        try:
+            async for progress in self.sharded_search.find(regex, origin, backward):
+                if progress.match is not None and self._search_match != progress.match:
+                    self._show_search_match(progress.match)
+                if progress.shards_done < progress.shards:
+                    status = (
+                        self._search_prompt
+                        if progress.match is None
+                        else self._search_status(progress.match, origin, backward)
+                    )
+                    status += f" [{progress.matches} matches, {progress.shards_done}/{progress.shards} scanned]"
+                else:
+                    status = self._search_status(progress.match, origin, backward)
+                    if progress.match is not None:
+                        status += f" [{progress.matches} matches]"
+                self.show_mode_text(f"-- READING -- {status}")
+                self.scheduler.request()
+        except Exception as error:
+            logger.exception("Search failed")
+            self.show_mode_text(f"-- READING -- Search failed: {error}")
+            self.scheduler.request()
+        finally:
+            if asyncio.current_task() is self._parallel_search_task:
+                self._parallel_search_task = None
+
+    def _cancel_parallel_search(self):
+        if self._parallel_search_task is not None:
+            self._parallel_search_task.cancel()
+            self._parallel_search_task = None
+
+    @property
+    def _search_prompt(self) -> str:
+        return ("?" if self._search_backward else "/") + self._search_regex.pattern
+
+    def _search_status(
+        self, match: Optional[SearchMatch], origin: Optional[Tuple[int, int, int]], backward: bool
+    ) -> str:
+        if match is None:
+            return f"Pattern not found: {self._search_regex.pattern}"
+        wrapped = origin is not None and (match.position >= origin if backward else match.position <= origin)
+        return self._search_prompt + (" (search wrapped)" if wrapped else "")
+
+    def _show_search_match(self, match: SearchMatch):
+        self._search_match = match
+        text_list = self.output_box.text_list
+        self.output_box.scroll_to_row(
+            text_list.row_of(match.text_id - text_list.first_text_id, match.lineno, match.start)
+        )
+
+    def _view_origin(self, backward: bool) -> Optional[Tuple[int, int, int]]:
+        """The position a search starts from before anything matched: the top of the output box, or its bottom
+        when searching backward"""
+        text_list = self.output_box.text_list
+        if text_list.line_count == 0:
+            return None
+        if backward:
+            row = min(self.output_box.last_viewable_lineno, text_list.line_count) - 1
+            text_idx, lineno, line_row = text_list.locate(row)
+            column = (line_row + 1) * text_list.max_line_width
+        else:
+            text_idx, lineno, line_row = text_list.locate(self.output_box.first_viewable_lineno)
+            column = line_row * text_list.max_line_width - 1
+        return (text_list.first_text_id + text_idx, lineno, column)
+
+    def end_scrollback_search(self):
+        """Clear the highlights, and let the output box follow its text again.  n still repeats the last search."""
+        self._cancel_parallel_search()
+        self._search_match = None
+        self.output_box.highlight = None
+        self.output_box.follows_cursor = True
+        self.output_box.request_redraw()
+
+    def enter_history_search_mode(self):
+        """Search the user box's history as the query is typed, as with Ctrl-R in a shell"""
+        self._history_search = HistorySearch(self.user_box.history)
+        self._history_search_return = self.input_mode
+        self._history_search_original = self.user_box.text.copy()
+        self.input_mode = INPUT_MODE.HISTORY_SEARCH
+        logger.info("Input Mode: HISTORY_SEARCH")
+        self._show_history_search()
+
+    def _show_history_search(self):
+        search = self._history_search
+        self.show_mode_text(search.prompt)
+        text = search.text if search.match is not None else self._history_search_original
+        self.user_box.set_text(text)
+
+    def _history_search_key(self, key: int):
+        """Add a typed character to the query.  Any other key accepts the match and is handled as usual."""
+        if 32 <= key < 256 and key != 127:
+            self._history_search.add(chr(key))
+            self._show_history_search()
+            return
+        self.leave_history_search()
+        self.keymap.handle(self.input_mode, key)
+
+    def _history_search_older(self):
+        self._history_search.older()
+        self._show_history_search()
+
+    def _history_search_backspace(self):
+        self._history_search.backspace()
+        self._show_history_search()
+
+    def leave_history_search(self, restore: bool = False):
+        """Return to the mode the search started in, keeping the match in the user box unless restore is set"""
+        if restore:
+            self.user_box.set_text(self._history_search_original)
+        self._history_search = None
+        self._history_search_original = None
+        if self._history_search_return == INPUT_MODE.INSERT:
+            self.enter_insert_mode()
+        else:
+            self.enter_command_mode()
+
     async def handle_keypress(self, key: int):
+        await self.handle_keypresses([key])
+
+    async def handle_paste(self, text: str):
+        await self.handle_keypresses([text])
+
+    async def handle_keypresses(self, keys: List[Union[int, str]]):
+        """Apply a burst of keys, and pasted text, to the boxes, then draw the result in a single frame"""
+        delayed_redraw = False
+        if self.stats.enabled and not self.stats.tracing:
+            self.stats.begin()
+        with self.scheduler.batch():
+            for key, repeat in self._key_runs(keys):
+                try:
+                    if isinstance(key, str):
+                        self.paste(key)
+                    else:
+                        await self._handle_key(key, repeat)
+                except DelayedRedraw:
+                    delayed_redraw = True
+            if self.stats.enabled:
+                self.stats.mark("handler")
+        if delayed_redraw:
+            raise DelayedRedraw()
+
+    def _key_runs(self, keys: List[Union[int, str]]) -> Iterator[Tuple[Union[int, str], int]]:
+        """Group each run of a repeatable key, such as a held-down motion key, so it is applied with one count.
+
+        Runs are found as the keys are handled, because a key may change the mode the next keys are read in."""
+        idx = 0
+        while idx < len(keys):
+            key = keys[idx]
+            stop = idx + 1
+            if not isinstance(key, str) and self.keymap.repeatable(self.input_mode, key):
+                while stop < len(keys) and keys[stop] == key:
+                    stop += 1
+            yield key, stop - idx
+            idx = stop
+
+    async def _handle_key(self, key: int, repeat: int = 1):
         if key == curses.KEY_RESIZE:
             await self.resize()
-        elif self.input_mode == INPUT_MODE.COMMAND:
-            self.command_handler(key)
-        elif self.input_mode == INPUT_MODE.INSERT:
-            self.text_handler(key)
-        elif self.input_mode == INPUT_MODE.REPLACE:
-            self.text_handler(key)
-        elif self.input_mode == INPUT_MODE.COMMAND_ENTRY:
-            self.command_entry_handler(key)
-        elif self.input_mode == INPUT_MODE.READ_ONLY:
-            self.read_only_handler(key)
+            return
+        self.keymap.handle(self.input_mode, key, repeat)
+        self._schedule_key_timeout()
+
+    def _schedule_key_timeout(self):
+        """Complete a pending sequence, such as g when g and gg are both bound, if no key follows in time"""
+        if self._key_timeout_handle is not None:
+            self._key_timeout_handle.cancel()
+            self._key_timeout_handle = None
+        if self.keymap.timeout is None or not self.keymap.pending(self.input_mode):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._key_timeout_handle = loop.call_later(self.keymap.timeout, self._expire_keys, self.input_mode)
+
+    def _expire_keys(self, input_mode: INPUT_MODE):
+        self._key_timeout_handle = None
+        with self.scheduler.batch():
+            self.keymap.expire(input_mode)
 
     def submit(self):
         logger.info("Submit(print=%s)", print)
@@ -228,147 +630,152 @@ class InputOutputWorkspace:
                 if self._command_callback is not None:
                     self._command_callback(text)
 
-    def read_only_handler(self, key: int):
-        if key == ord("\t"):
-            logger.info("Command: Tab")
-            self.cycle_focus()
-
-    def text_handler(self, key: int):
-        logger.debug("text_handler.key_pressed: %s", chr(key))
-        if key == curses.KEY_UP:
-            logger.info("Key: Up")
-            self.focused_box.cursor_up()
-
-        elif key == curses.KEY_DOWN:
-            logger.info("Key: Down")
-            self.focused_box.cursor_down()
-
-        elif key == curses.KEY_LEFT:
-            logger.info("Key: Left")
-            self.focused_box.cursor_left()
-
-        elif key == curses.KEY_RIGHT:
-            logger.info("Key: Right")
-            self.focused_box.cursor_right()
-
-        elif key == 27:
-            logger.info("Key: Escape")
-            self.enter_command_mode()
-
-        elif key == ord("\n") or key == ord("\r"):
-            logger.info("Key: Enter")
-            self.submit()
-
-        elif key == ord("\t"):
-            logger.info("Command: Tab")
-            self.cycle_focus()
-
-        elif key == curses.KEY_BACKSPACE or key == 127:  # 127 is the delete key.  Macs use delete instead of backspace.
-            self.focused_box.handle_backspace()
-
-        else:
-            logger.info("key: %s", chr(key))
-            if self.input_mode == INPUT_MODE.REPLACE:
-                self.focused_box.replace_character_at_cursor(chr(key))
-            else:
-                self.focused_box.insert_character_at_cursor(chr(key))
-
-    def command_handler(self, key: int):
-        logger.debug("command_handler.key_pressed: %s", chr(key))
-        if key == curses.KEY_UP:
-            logger.info("Command: Up")
-            self.focused_box.history_scroll_up()
-
-        elif key == curses.KEY_DOWN:
-            logger.info("Key: Down")
-            self.focused_box.history_scroll_down()
-
-        elif key == ord("\t"):
-            logger.info("Command: Tab")
-            self.cycle_focus()
-
-        elif key == ord("j"):
-            logger.info("Command: j (cursor down)")
-            self.focused_box.cursor_down()
-
-        elif key == ord("k"):
-            logger.info("Command: k (cursor up)")
-            self.focused_box.cursor_up()
-
-        elif key == ord("h"):
-            logger.info("Command: h (cursor left)")
-            self.focused_box.cursor_left()
-
-        elif key == ord("l"):
-            logger.info("Command: l (cursor right)")
-            self.focused_box.cursor_right()
-
-        elif key == ord("a"):
-            logger.info("Command: i")
-            self.enter_insert_mode(append=True)
-            logger.info("Input Mode: %s", self.input_mode)
-
-        elif key == ord("i"):
-            logger.info("Command: i")
-            self.enter_insert_mode()
-            logger.info("Input Mode: %s", self.input_mode)
-
-        elif key == ord("b"):
-            logger.info("Command: b (word backward)")
-            self.focused_box.word_backward()
-
-        elif key == ord("w"):
-            logger.info("Command: w (word forward)")
-            self.focused_box.word_forward()
-
-        elif key == ord("$"):
-            logger.info("Command: $ (end of line)")
-            self.focused_box.end_of_line()
-
-        elif key == ord("0"):
-            logger.info("Command: 0 (start of line)")
-            self.focused_box.start_of_line()
-
-        elif key == ord("R"):
-            logger.info("Command: R")
-            self.enter_replace_mode()
-            logger.info("Input Mode: %s", self.input_mode)
-
-        elif key == ord("x"):
-            logger.info("Command: x")
-            self.focused_box.handle_backspace()
-
-        elif key == ord(":"):
-            logger.info("Command: :")
-            self.enter_command_entry_mode()
-
-        elif key == ord("\n") or key == ord("\r"):
-            logger.info("Key: Enter")
-            self.submit()
-            self.enter_insert_mode(append=True)
-
-        elif key in [27]:
-            logger.info("Command: Escape (nop)")
-
-    def command_entry_handler(self, key: int):
-        logger.debug("command_entry_handler.key_pressed: %s", chr(key))
-        if key == curses.KEY_UP:
-            logger.info("Command: Up")
-            self.focused_box.history_scroll_up()
-
-        elif key == curses.KEY_DOWN:
-            logger.info("Key: Down")
-            self.focused_box.history_scroll_down()
-
-        elif key in [27]:
-            logger.info("Command: Escape")
-            self.enter_command_mode()
-
-        elif key in [ord("\n"), ord("\r")]:
-            logger.info("Command: Enter")
-            self.execute_command(str(self.command_box.text)[1:])
-            self.submit_command()
-            self.enter_command_mode()
+    def paste(self, text: str):
+        logger.info("Paste: %s characters", len(text))
+        if self.input_mode == INPUT_MODE.INSERT:
+            self.focused_box.insert_text_at_cursor(text)
+        elif self.input_mode == INPUT_MODE.REPLACE:
+            self.focused_box.replace_text_at_cursor(text)
+        elif self.input_mode in (INPUT_MODE.COMMAND_ENTRY, INPUT_MODE.SEARCH_ENTRY):
+            self.focused_box.insert_text_at_cursor(text.replace("\n", " "))
+        elif self.input_mode == INPUT_MODE.COMMAND:
+            # Like vim, a paste in command mode inserts the text and stays in command mode.
+            self.user_box.text.edit_mode = True
+            self.user_box.insert_text_at_cursor(text)
+            self.user_box.text.edit_mode = False
+        elif self.input_mode == INPUT_MODE.HISTORY_SEARCH:
+            self._history_search.add(text.replace("\n", " "))
+            self._show_history_search()
+
+    def _bind_default_keys(self):
+        """Bind the vim-like keys of every input mode"""
+        keymap = self.keymap
+        keymap.add_mode(INPUT_MODE.COMMAND, counts=True)
+        keymap.add_mode(INPUT_MODE.INSERT, default=lambda key: self.focused_box.insert_character_at_cursor(chr(key)))
+        keymap.add_mode(INPUT_MODE.REPLACE, default=lambda key: self.focused_box.replace_character_at_cursor(chr(key)))
+        keymap.add_mode(
+            INPUT_MODE.COMMAND_ENTRY, default=lambda key: self.focused_box.insert_character_at_cursor(chr(key))
+        )
+        keymap.add_mode(INPUT_MODE.READ_ONLY)
+        keymap.add_mode(INPUT_MODE.HISTORY_SEARCH, default=self._history_search_key)
+        keymap.add_mode(
+            INPUT_MODE.SEARCH_ENTRY, default=lambda key: self.focused_box.insert_character_at_cursor(chr(key))
+        )
 
-        else:
-            self.text_handler(key)
+        text_motions = {
+            "<Up>": lambda count: self.focused_box.cursor_up(count),
+            "<Down>": lambda count: self.focused_box.cursor_down(count),
+            "<Left>": lambda count: self.focused_box.cursor_left(count),
+            "<Right>": lambda count: self.focused_box.cursor_right(count),
+        }
+        for keys, action in text_motions.items():
+            keymap.bind(INPUT_MODE.INSERT, keys, action, repeatable=True)
+            keymap.bind(INPUT_MODE.REPLACE, keys, action, repeatable=True)
+            keymap.bind(INPUT_MODE.COMMAND_ENTRY, keys, action, repeatable=True)
+            keymap.bind(INPUT_MODE.SEARCH_ENTRY, keys, action, repeatable=True)
+
+        text_bindings = {
+            "<Esc>": lambda count: self.enter_command_mode(),
+            "<Enter>": lambda count: self.submit(),
+            "<CR>": lambda count: self.submit(),
+            "<Tab>": lambda count: self.cycle_focus(),
+            # Macs send delete instead of backspace.
+            "<BS>": lambda count: self.focused_box.handle_backspace(),
+            "<Del>": lambda count: self.focused_box.handle_backspace(),
+        }
+        for keys, action in text_bindings.items():
+            keymap.bind(INPUT_MODE.INSERT, keys, action)
+            keymap.bind(INPUT_MODE.REPLACE, keys, action)
+            keymap.bind(INPUT_MODE.COMMAND_ENTRY, keys, action)
+
+        command_entry_bindings = {
+            "<Up>": lambda count: self.focused_box.history_scroll_up(),
+            "<Down>": lambda count: self.focused_box.history_scroll_down(),
+            "<Esc>": lambda count: self.enter_command_mode(),
+            "<Enter>": lambda count: self.submit_command_entry(),
+            "<CR>": lambda count: self.submit_command_entry(),
+        }
+        for keys, action in command_entry_bindings.items():
+            keymap.bind(INPUT_MODE.COMMAND_ENTRY, keys, action)
+
+        command_bindings = {
+            "<Up>": lambda count: self.focused_box.history_scroll_up(),
+            "<Down>": lambda count: self.focused_box.history_scroll_down(),
+            "<Tab>": lambda count: self.cycle_focus(),
+            "x": lambda count: self._repeat(self.focused_box.handle_backspace, count),
+            "dd": lambda count: self._repeat(self.focused_box.delete_line, count),
+            "gg": lambda count: self.focused_box.start_of_text(),
+            "G": lambda count: self.focused_box.end_of_text(),
+            "$": lambda count: self.focused_box.end_of_line(),
+            "0": lambda count: self.focused_box.start_of_line(),
+            "a": lambda count: self.enter_insert_mode(append=True),
+            "i": lambda count: self.enter_insert_mode(),
+            "R": lambda count: self.enter_replace_mode(),
+            ":": lambda count: self.enter_command_entry_mode(),
+            "<Enter>": lambda count: self.submit_and_insert(),
+            "<CR>": lambda count: self.submit_and_insert(),
+        }
+        for keys, action in command_bindings.items():
+            keymap.bind(INPUT_MODE.COMMAND, keys, action)
+
+        command_motions = {
+            "j": lambda count: self.focused_box.cursor_down(count),
+            "k": lambda count: self.focused_box.cursor_up(count),
+            "h": lambda count: self.focused_box.cursor_left(count),
+            "l": lambda count: self.focused_box.cursor_right(count),
+            "w": lambda count: self.focused_box.word_forward(count),
+            "b": lambda count: self.focused_box.word_backward(count),
+        }
+        for keys, action in command_motions.items():
+            keymap.bind(INPUT_MODE.COMMAND, keys, action, repeatable=True)
+
+        keymap.bind(INPUT_MODE.COMMAND, "<Esc>", lambda count: self.cancel())
+        keymap.bind(INPUT_MODE.COMMAND, "<C-r>", lambda count: self.enter_history_search_mode())
+        keymap.bind(INPUT_MODE.INSERT, "<C-r>", lambda count: self.enter_history_search_mode())
+
+        history_search_bindings = {
+            "<C-r>": lambda count: self._history_search_older(),
+            "<BS>": lambda count: self._history_search_backspace(),
+            "<Del>": lambda count: self._history_search_backspace(),
+            "<Esc>": lambda count: self.leave_history_search(),
+            "<C-g>": lambda count: self.leave_history_search(restore=True),
+        }
+        for keys, action in history_search_bindings.items():
+            keymap.bind(INPUT_MODE.HISTORY_SEARCH, keys, action)
+
+        search_entry_bindings = {
+            "<Up>": lambda count: self.focused_box.history_scroll_up(),
+            "<Down>": lambda count: self.focused_box.history_scroll_down(),
+            "<BS>": lambda count: self._search_entry_backspace(),
+            "<Del>": lambda count: self._search_entry_backspace(),
+            "<Esc>": lambda count: self.enter_reading_mode(),
+            "<Enter>": lambda count: self.submit_search_entry(),
+            "<CR>": lambda count: self.submit_search_entry(),
+        }
+        for keys, action in search_entry_bindings.items():
+            keymap.bind(INPUT_MODE.SEARCH_ENTRY, keys, action)
+
+        read_only_bindings = {
+            "<Tab>": lambda count: self.cycle_focus(),
+            "<Esc>": lambda count: self.cancel(),
+            "/": lambda count: self.enter_search_entry_mode(),
+            "?": lambda count: self.enter_search_entry_mode(backward=True),
+            "n": lambda count: self.search_next(),
+            "N": lambda count: self.search_next(reverse=True),
+        }
+        for keys, action in read_only_bindings.items():
+            keymap.bind(INPUT_MODE.READ_ONLY, keys, action)
+
+    @staticmethod
+    def _repeat(func: Callable[[], None], count: int):
+        for _ in range(count):
+            func()
+
+    def submit_and_insert(self):
+        self.submit()
+        self.enter_insert_mode(append=True)
+
+    def submit_command_entry(self):
+        self.execute_command(str(self.command_box.text)[1:])
+        self.submit_command()
+        self.enter_command_mode()
@@ -1,19 +1,152 @@
-from typing import Callable
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import time
+
+KeyAction = Callable[[int], None]
+
+
+class KEY_MATCH(Enum):
+    # The keys so far do not start any binding.
+    NONE = 0
+    # The keys so far start a longer binding.  Wait for the next key, or for the timeout.
+    PARTIAL = 1
+    # The keys so far are a complete binding.
+    FULL = 2
+
+
+class _KeyNode:
+    __slots__ = ("children", "action")
+
+    def __init__(self):
+        self.children: Dict[int, "_KeyNode"] = {}
+        self.action: Optional[KeyAction] = None
 
 
 class KeyPressStateMachine:
     """A state machine for tracking the series of key presses that result in some action.
 
     Ex. pressing i enters insert mode immediately.  pressing d followed by d deletes the current line.
-    """
 
-    def __init__(self, matching_sequence: str, action: Callabe[[], None]):
-        self._state = 0
+    Bindings are stored in a trie keyed by key code, so each key press costs one dict lookup.  When counts are
+    enabled, a number typed before a binding is passed to its action, as in 3w.  A binding that is also the
+    start of a longer one, such as g and gg, waits for the next key or for the timeout."""
+
+    def __init__(self, timeout: Optional[float] = 1.0, counts: bool = False):
+        """
+        Args:
+            timeout (Optional[float]): Seconds to wait for the next key of a sequence.  None waits forever.
+            counts (bool): Whether digits typed before a binding are read as a count.
+        """
+        self.timeout = timeout
+        self.counts = counts
+        self._root = _KeyNode()
+        self._node = self._root
+        self._key_sequence: List[int] = []
+        self._count: Optional[int] = None
+        self._last_key_time = 0.0
+
+    def add(self, sequence: Sequence[int], action: KeyAction):
+        """Call action with the count when sequence is typed, replacing any action already bound to it"""
+        if len(sequence) == 0:
+            raise ValueError("Cannot bind an empty key sequence")
+        node = self._root
+        for key in sequence:
+            node = node.children.setdefault(key, _KeyNode())
+        node.action = action
+        self.reset()
+
+    def remove(self, sequence: Sequence[int]):
+        """Remove the action bound to sequence"""
+        path = [self._root]
+        for key in sequence:
+            if key not in path[-1].children:
+                raise KeyError(f"No binding for {list(sequence)}")
+            path.append(path[-1].children[key])
+        path[-1].action = None
+        # Prune the nodes that no longer lead to a binding.
+        for depth in range(len(sequence), 0, -1):
+            if path[depth].action is not None or len(path[depth].children) > 0:
+                break
+            del path[depth - 1].children[sequence[depth - 1]]
+        self.reset()
+
+    def get(self, sequence: Sequence[int]) -> Optional[KeyAction]:
+        """Get the action bound to sequence"""
+        node = self._root
+        for key in sequence:
+            node = node.children.get(key)
+            if node is None:
+                return None
+        return node.action
+
+    @property
+    def pending(self) -> bool:
+        """Whether keys have been typed that may still complete a binding"""
+        return len(self._key_sequence) > 0 or self._count is not None
+
+    @property
+    def key_sequence(self) -> List[int]:
+        """The keys typed since the last binding was completed, not counting the count"""
+        return list(self._key_sequence)
+
+    def expired(self, now: float = None) -> bool:
+        """Whether the pending keys have waited longer than the timeout"""
+        if not self.pending or self.timeout is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        return now - self._last_key_time >= self.timeout
+
+    def feed(self, key: int) -> Tuple[KEY_MATCH, Optional[KeyAction], int]:
+        """Advance the state machine by one key.
+
+        Returns:
+            Tuple[KEY_MATCH, Optional[KeyAction], int]: How the keys so far match, the completed binding's action
+                and its count.  The action is only set for a FULL match.
+        """
+        self._last_key_time = time.monotonic()
+        if self._is_count_digit(key):
+            self._count = (self._count or 0) * 10 + key - ord("0")
+            return KEY_MATCH.PARTIAL, None, 0
+
+        node = self._node.children.get(key)
+        if node is None:
+            self.reset()
+            return KEY_MATCH.NONE, None, 0
+
+        if len(node.children) > 0:
+            self._node = node
+            self._key_sequence.append(key)
+            return KEY_MATCH.PARTIAL, None, 0
+
+        count = self._count or 1
+        self.reset()
+        return KEY_MATCH.FULL, node.action, count
+
+    def continues(self, key: int) -> bool:
+        """Whether key would extend the keys typed so far rather than start over"""
+        return self._is_count_digit(key) or key in self._node.children
+
+    def _is_count_digit(self, key: int) -> bool:
+        if not self.counts or self._node is not self._root or not ord("0") <= key <= ord("9"):
+            return False
+        # A lone 0 is a key of its own, as in vim.
+        return self._count is not None or key != ord("0")
+
+    def expire(self) -> Tuple[KEY_MATCH, Optional[KeyAction], int]:
+        """Give up waiting for the next key.  The keys so far complete their binding if they have one."""
+        action = self._node.action
+        count = self._count or 1
+        self.reset()
+        if action is None:
+            return KEY_MATCH.NONE, None, 0
+        return KEY_MATCH.FULL, action, count
+
+    def reset(self):
+        """Forget the keys typed so far"""
+        self._node = self._root
         self._key_sequence = []
-        self._key_sequence_string = ""
-        self._key_sequence_string_history = []
-        self._key_sequence_string_history_ptr = 0
-        self._key_sequence_string_history_max_size = 100
+        self._count = None
 
     def __repr__(self):
-        return f"KeyPressStateMachine(state={self._state}, key_sequence={self._key_sequence})"
+        return f"KeyPressStateMachine(count={self._count}, key_sequence={self._key_sequence})"
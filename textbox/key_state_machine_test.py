@@ -0,0 +1,78 @@
+import pytest
+
+from textbox.key_state_machine import KEY_MATCH, KeyPressStateMachine
+
+
+def feed(machine: KeyPressStateMachine, keys: str):
+    return [machine.feed(ord(key)) for key in keys]
+
+
+def test_single_key():
+    action = lambda count: None
+    machine = KeyPressStateMachine()
+    machine.add([ord("x")], action)
+    assert machine.feed(ord("x")) == (KEY_MATCH.FULL, action, 1)
+    assert machine.feed(ord("y")) == (KEY_MATCH.NONE, None, 0)
+    assert not machine.pending
+
+
+def test_sequence():
+    delete_line = lambda count: None
+    machine = KeyPressStateMachine()
+    machine.add([ord("d"), ord("d")], delete_line)
+    assert feed(machine, "dd") == [(KEY_MATCH.PARTIAL, None, 0), (KEY_MATCH.FULL, delete_line, 1)]
+
+    assert machine.feed(ord("d"))[0] == KEY_MATCH.PARTIAL
+    assert machine.pending
+    assert machine.key_sequence == [ord("d")]
+    assert not machine.continues(ord("x"))
+    assert machine.feed(ord("x"))[0] == KEY_MATCH.NONE
+    assert not machine.pending
+
+
+def test_counts():
+    word = lambda count: None
+    start_of_line = lambda count: None
+    machine = KeyPressStateMachine(counts=True)
+    machine.add([ord("w")], word)
+    machine.add([ord("0")], start_of_line)
+    assert feed(machine, "3w")[-1] == (KEY_MATCH.FULL, word, 3)
+    assert feed(machine, "10w")[-1] == (KEY_MATCH.FULL, word, 10)
+    assert machine.feed(ord("0")) == (KEY_MATCH.FULL, start_of_line, 1)
+
+    machine = KeyPressStateMachine(counts=False)
+    machine.add([ord("w")], word)
+    assert machine.feed(ord("3"))[0] == KEY_MATCH.NONE
+
+
+def test_prefix_binding_waits_for_timeout():
+    go = lambda count: None
+    top = lambda count: None
+    machine = KeyPressStateMachine(timeout=0.5, counts=True)
+    machine.add([ord("g")], go)
+    machine.add([ord("g"), ord("g")], top)
+    assert feed(machine, "gg")[-1] == (KEY_MATCH.FULL, top, 1)
+
+    assert feed(machine, "2g")[-1][0] == KEY_MATCH.PARTIAL
+    assert not machine.expired()
+    assert machine.expired(now=machine._last_key_time + 0.5)
+    assert machine.expire() == (KEY_MATCH.FULL, go, 2)
+    assert not machine.pending
+    assert machine.expire() == (KEY_MATCH.NONE, None, 0)
+
+
+def test_remove():
+    action = lambda count: None
+    machine = KeyPressStateMachine()
+    machine.add([ord("d"), ord("d")], action)
+    machine.add([ord("d"), ord("w")], action)
+    machine.remove([ord("d"), ord("d")])
+    assert machine.get([ord("d"), ord("d")]) is None
+    assert machine.get([ord("d"), ord("w")]) is action
+    machine.remove([ord("d"), ord("w")])
+    assert machine.feed(ord("d"))[0] == KEY_MATCH.NONE
+
+    with pytest.raises(KeyError):
+        machine.remove([ord("q")])
+    with pytest.raises(ValueError):
+        machine.add([], action)
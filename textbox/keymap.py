@@ -0,0 +1,169 @@
+import curses
+from typing import Callable, Dict, Hashable, Optional, Sequence, Set, Tuple, Union
+
+from textbox.key_state_machine import KEY_MATCH, KeyAction, KeyPressStateMachine
+
+KEY_NAMES = {
+    "esc": 27,
+    "enter": ord("\n"),
+    "cr": ord("\r"),
+    "tab": ord("\t"),
+    "space": ord(" "),
+    "lt": ord("<"),
+    "bs": curses.KEY_BACKSPACE,
+    "del": 127,
+    "up": curses.KEY_UP,
+    "down": curses.KEY_DOWN,
+    "left": curses.KEY_LEFT,
+    "right": curses.KEY_RIGHT,
+    "home": curses.KEY_HOME,
+    "end": curses.KEY_END,
+    "pageup": curses.KEY_PPAGE,
+    "pagedown": curses.KEY_NPAGE,
+}
+
+
+def parse_keys(keys: Union[str, int, Sequence[int]]) -> Tuple[int, ...]:
+    """Turn a key sequence into key codes.
+
+    Characters stand for themselves and names in angle brackets stand for special keys, as in vim: "dd", "<Esc>",
+    "<C-r>" or "<Up>".  A key code or a sequence of key codes is passed through.
+    """
+    if isinstance(keys, int):
+        return (keys,)
+    if not isinstance(keys, str):
+        return tuple(keys)
+
+    codes = []
+    idx = 0
+    while idx < len(keys):
+        end = keys.find(">", idx)
+        if keys[idx] == "<" and end > idx + 1:
+            name = keys[idx + 1 : end]
+            codes.append(_parse_key_name(name))
+            idx = end + 1
+        else:
+            codes.append(ord(keys[idx]))
+            idx += 1
+    return tuple(codes)
+
+
+def _parse_key_name(name: str) -> int:
+    if name.lower().startswith("c-") and len(name) == 3:
+        return ord(name[2].lower()) & 0x1F
+    if name.lower() in KEY_NAMES:
+        return KEY_NAMES[name.lower()]
+    raise ValueError(f"Unknown key name: <{name}>")
+
+
+class Keymap:
+    """The key bindings of every input mode.
+
+    Each mode has its own KeyPressStateMachine, so finding the binding for a key is a dict lookup however many
+    bindings there are.  Keys that are not bound to anything go to the mode's default handler, e.g. to insert
+    the character that was typed."""
+
+    def __init__(self, timeout: Optional[float] = 1.0):
+        """
+        Args:
+            timeout (Optional[float]): Seconds to wait for the next key of a sequence such as gg.
+        """
+        self.timeout = timeout
+        self._machines: Dict[Hashable, KeyPressStateMachine] = {}
+        self._defaults: Dict[Hashable, Callable[[int], None]] = {}
+        self._repeatable: Dict[Hashable, Set[int]] = {}
+
+    def add_mode(self, mode: Hashable, counts: bool = False, default: Callable[[int], None] = None):
+        """Add a mode without bindings.
+
+        Args:
+            mode (Hashable): The mode
+            counts (bool): Whether digits typed before a binding are read as a count, as in 3w.
+            default (Callable[[int], None]): Called with each key that is not bound to anything.
+        """
+        self._machines[mode] = KeyPressStateMachine(self.timeout, counts=counts)
+        self._repeatable[mode] = set()
+        if default is not None:
+            self._defaults[mode] = default
+
+    def machine(self, mode: Hashable) -> KeyPressStateMachine:
+        if mode not in self._machines:
+            self.add_mode(mode)
+        return self._machines[mode]
+
+    def bind(self, mode: Hashable, keys: Union[str, int, Sequence[int]], action: KeyAction, repeatable: bool = False):
+        """Call action with the count, 1 unless one was typed, when keys are typed in mode.
+
+        Args:
+            repeatable (bool): Whether a run of the key may be applied as one call with the summed count, as for
+                motions.  Only single keys can be repeatable.
+        """
+        sequence = parse_keys(keys)
+        if repeatable and len(sequence) != 1:
+            raise ValueError("Only single keys can be repeatable")
+        self.machine(mode).add(sequence, action)
+        if repeatable:
+            self._repeatable[mode].add(sequence[0])
+        elif len(sequence) == 1:
+            self._repeatable[mode].discard(sequence[0])
+
+    def unbind(self, mode: Hashable, keys: Union[str, int, Sequence[int]]):
+        sequence = parse_keys(keys)
+        self.machine(mode).remove(sequence)
+        if len(sequence) == 1:
+            self._repeatable[mode].discard(sequence[0])
+
+    def repeatable(self, mode: Hashable, key: int) -> bool:
+        """Whether a run of key in mode can be handled as one call with the summed count"""
+        return key in self._repeatable.get(mode, ())
+
+    def get(self, mode: Hashable, keys: Union[str, int, Sequence[int]]) -> Optional[KeyAction]:
+        """Get the action bound to keys in mode"""
+        if mode not in self._machines:
+            return None
+        return self._machines[mode].get(parse_keys(keys))
+
+    def pending(self, mode: Hashable) -> bool:
+        """Whether keys typed in mode are waiting for the rest of their sequence"""
+        return mode in self._machines and self._machines[mode].pending
+
+    def handle(self, mode: Hashable, key: int, repeat: int = 1):
+        """Call the action that key completes in mode, or the mode's default handler if key is not bound.
+
+        Args:
+            repeat (int): How many times key was pressed in a row.  A repeatable binding is called once with the
+                presses added to its count, so 3 followed by lll moves 5 columns with one call.
+        """
+        machine = self._machines.get(mode)
+        if machine is None:
+            return
+        for remaining in range(repeat, 0, -1):
+            if machine.pending and (machine.expired() or not machine.continues(key)):
+                self._call(*machine.expire())
+
+            coalesce = remaining > 1 and len(machine.key_sequence) == 0 and key in self._repeatable[mode]
+            match, action, count = machine.feed(key)
+            if match == KEY_MATCH.FULL:
+                if coalesce:
+                    action(count + remaining - 1)
+                    return
+                action(count)
+            elif match == KEY_MATCH.NONE and mode in self._defaults:
+                self._defaults[mode](key)
+
+    def expire(self, mode: Hashable):
+        """Stop waiting for the rest of a sequence in mode, and call the binding of the keys typed so far"""
+        if self.pending(mode):
+            self._call(*self._machines[mode].expire())
+
+    def reset(self):
+        """Forget the keys typed so far in every mode"""
+        for machine in self._machines.values():
+            machine.reset()
+
+    def _call(self, match: KEY_MATCH, action: Optional[KeyAction], count: int):
+        if match == KEY_MATCH.FULL:
+            action(count)
+
+    def __repr__(self):
+        return f"Keymap(modes={list(self._machines)})"
@@ -0,0 +1,89 @@
+import curses
+
+import pytest
+
+from textbox.keymap import Keymap, parse_keys
+
+
+def test_parse_keys():
+    assert parse_keys("dd") == (ord("d"), ord("d"))
+    assert parse_keys("<Esc>") == (27,)
+    assert parse_keys("<C-r>") == (18,)
+    assert parse_keys("g<Up>") == (ord("g"), curses.KEY_UP)
+    assert parse_keys("<") == (ord("<"),)
+    assert parse_keys("<lt>x") == (ord("<"), ord("x"))
+    assert parse_keys(curses.KEY_DOWN) == (curses.KEY_DOWN,)
+    assert parse_keys([1, 2]) == (1, 2)
+    with pytest.raises(ValueError):
+        parse_keys("<Nope>")
+
+
+def test_handle():
+    calls = []
+    keymap = Keymap()
+    keymap.add_mode("command", counts=True)
+    keymap.add_mode("insert", default=lambda key: calls.append(("insert", chr(key))))
+    keymap.bind("command", "w", lambda count: calls.append(("w", count)))
+    keymap.bind("command", "dd", lambda count: calls.append(("dd", count)))
+    keymap.bind("insert", "<Esc>", lambda count: calls.append(("esc", count)))
+
+    for key in "3wddx2dd":
+        keymap.handle("command", ord(key))
+    for key in "a\x1b":
+        keymap.handle("insert", ord(key))
+    keymap.handle("unknown", ord("a"))
+    assert calls == [("w", 3), ("dd", 1), ("dd", 2), ("insert", "a"), ("esc", 1)]
+
+
+def test_user_binding_replaces_default():
+    calls = []
+    keymap = Keymap()
+    keymap.bind("command", "x", lambda count: calls.append("default"))
+    keymap.bind("command", "x", lambda count: calls.append("user"))
+    keymap.handle("command", ord("x"))
+    assert calls == ["user"]
+
+    keymap.unbind("command", "x")
+    assert keymap.get("command", "x") is None
+
+
+def test_pending_sequence_completes_on_expire_or_next_key():
+    calls = []
+    keymap = Keymap(timeout=None)
+    keymap.bind("command", "g", lambda count: calls.append("g"))
+    keymap.bind("command", "gg", lambda count: calls.append("gg"))
+    keymap.bind("command", "x", lambda count: calls.append("x"))
+
+    keymap.handle("command", ord("g"))
+    assert keymap.pending("command")
+    keymap.expire("command")
+    assert calls == ["g"]
+
+    keymap.handle("command", ord("g"))
+    keymap.handle("command", ord("x"))
+    assert calls == ["g", "g", "x"]
+    assert not keymap.pending("command")
+
+
+def test_repeat_coalesces_repeatable_keys():
+    calls = []
+    keymap = Keymap()
+    keymap.add_mode("command", counts=True)
+    keymap.bind("command", "l", lambda count: calls.append(("l", count)), repeatable=True)
+    keymap.bind("command", "x", lambda count: calls.append(("x", count)))
+    keymap.bind("command", "dl", lambda count: calls.append(("dl", count)))
+    assert keymap.repeatable("command", ord("l"))
+    assert not keymap.repeatable("command", ord("x"))
+
+    keymap.handle("command", ord("l"), repeat=4)
+    keymap.handle("command", ord("3"))
+    keymap.handle("command", ord("l"), repeat=3)
+    keymap.handle("command", ord("x"), repeat=2)
+    keymap.handle("command", ord("d"))
+    keymap.handle("command", ord("l"), repeat=3)
+    assert calls == [("l", 4), ("l", 5), ("x", 1), ("x", 1), ("dl", 1), ("l", 2)]
+
+    with pytest.raises(ValueError):
+        keymap.bind("command", "gg", lambda count: None, repeatable=True)
+    keymap.bind("command", "l", lambda count: None)
+    assert not keymap.repeatable("command", ord("l"))
@@ -0,0 +1,129 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import math
+import time
+
+
+class LatencyStats:
+    """Rolling latency samples for the stages between reading a key and painting its result.
+
+    A trace starts when the terminal has input, and each mark() records the time since the previous mark as one
+    sample of that stage.  end() also records the whole trace as the total.  Only the newest samples of each stage
+    are kept, and percentiles are computed from them when asked for.
+
+    Call sites check enabled before calling in, so while it is off the input pipeline pays one attribute lookup
+    per stage."""
+
+    # read: the terminal had input until the keys were read.  handler: the key handlers, which update the model.
+    # draw: the boxes were drawn into their windows.  paint: the frame was sent to the terminal.
+    STAGES = ("read", "handler", "draw", "paint", "total")
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, enabled: bool = False, window: int = 1000):
+        """
+        Args:
+            enabled (bool): Whether to record samples
+            window (int): The number of newest samples kept for each stage
+        """
+        self._enabled = enabled
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self._trace_start: Optional[float] = None
+        self._last_mark: Optional[float] = None
+        self._last_stage: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool):
+        self._enabled = value
+        self.discard()
+
+    @property
+    def tracing(self) -> bool:
+        """Whether a trace has begun and not ended"""
+        return self._trace_start is not None
+
+    @property
+    def last_stage(self) -> Optional[str]:
+        """The stage marked last in the current trace, or None before the first mark"""
+        return self._last_stage
+
+    def begin(self, start: float = None):
+        """Start a trace at start, a time.monotonic() timestamp, or now"""
+        if not self._enabled:
+            return
+        if start is None:
+            start = time.monotonic()
+        self._trace_start = start
+        self._last_mark = start
+        self._last_stage = None
+
+    def mark(self, stage: str):
+        """Record the time since the previous mark as a sample of stage"""
+        if self._last_mark is None:
+            return
+        now = time.monotonic()
+        self._samples[stage].append(now - self._last_mark)
+        self._last_mark = now
+        self._last_stage = stage
+
+    def end(self):
+        """Record the time since the trace began as a sample of the total, and end the trace"""
+        if self._trace_start is None:
+            return
+        self._samples["total"].append(time.monotonic() - self._trace_start)
+        self.discard()
+
+    def discard(self):
+        """End the trace without recording its total, e.g. when the terminal woke up without a key"""
+        self._trace_start = None
+        self._last_mark = None
+        self._last_stage = None
+
+    def record(self, stage: str, seconds: float):
+        """Add a sample of stage measured elsewhere"""
+        self._samples[stage].append(seconds)
+
+    def count(self, stage: str) -> int:
+        return len(self._samples[stage])
+
+    def percentile(self, stage: str, percent: float) -> Optional[float]:
+        """Get the nearest-rank percentile of the samples of stage in seconds, or None without samples"""
+        samples = sorted(self._samples[stage])
+        if len(samples) == 0:
+            return None
+        rank = max(math.ceil(percent / 100 * len(samples)), 1)
+        return samples[rank - 1]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Get the sample count and the p50, p95 and p99 latencies, in seconds, of every stage that has samples"""
+        summary = {}
+        for stage in self.STAGES:
+            if self.count(stage) == 0:
+                continue
+            summary[stage] = {"count": self.count(stage)}
+            for percent in self.PERCENTILES:
+                summary[stage][f"p{percent}"] = self.percentile(stage, percent)
+        return summary
+
+    def format(self) -> List[str]:
+        """Format the summary as a table in milliseconds"""
+        header = f"{'stage':<8}{'count':>7}" + "".join(f"{f'p{percent}':>10}" for percent in self.PERCENTILES)
+        lines = [header]
+        for stage, stats in self.summary().items():
+            line = f"{stage:<8}{stats['count']:>7}"
+            line += "".join(f"{stats[f'p{percent}'] * 1000:>8.2f}ms" for percent in self.PERCENTILES)
+            lines.append(line)
+        return lines
+
+    def reset(self):
+        """Drop every sample"""
+        for samples in self._samples.values():
+            samples.clear()
+        self.discard()
+
+    def __repr__(self):
+        return f"LatencyStats(enabled={self._enabled}, counts={[self.count(stage) for stage in self.STAGES]})"
@@ -0,0 +1,84 @@
+import time
+
+from textbox.latency_stats import LatencyStats
+
+
+def test_disabled_records_nothing():
+    stats = LatencyStats()
+    stats.begin()
+    stats.mark("read")
+    stats.end()
+    assert not stats.tracing
+    assert stats.summary() == {}
+
+
+def test_trace_records_each_stage_and_total():
+    stats = LatencyStats(enabled=True)
+    start = time.monotonic() - 0.5
+    stats.begin(start)
+    assert stats.tracing
+    assert stats.last_stage is None
+    stats.mark("read")
+    stats.mark("handler")
+    assert stats.last_stage == "handler"
+    stats.end()
+    assert not stats.tracing
+    assert stats.count("read") == 1
+    assert stats.count("handler") == 1
+    assert stats.count("draw") == 0
+    assert stats.percentile("read", 50) >= 0.5
+    assert stats.percentile("total", 50) >= stats.percentile("read", 50)
+
+
+def test_mark_without_trace_is_ignored():
+    stats = LatencyStats(enabled=True)
+    stats.mark("read")
+    stats.end()
+    assert stats.summary() == {}
+
+
+def test_discard_drops_trace():
+    stats = LatencyStats(enabled=True)
+    stats.begin()
+    stats.discard()
+    stats.mark("read")
+    stats.end()
+    assert stats.summary() == {}
+
+
+def test_percentiles_nearest_rank():
+    stats = LatencyStats(enabled=True)
+    for ms in range(100, 0, -1):
+        stats.record("paint", ms / 1000)
+    assert stats.percentile("paint", 50) == 0.05
+    assert stats.percentile("paint", 95) == 0.095
+    assert stats.percentile("paint", 99) == 0.099
+    assert stats.percentile("paint", 0) == 0.001
+    assert stats.percentile("draw", 50) is None
+    assert stats.summary() == {"paint": {"count": 100, "p50": 0.05, "p95": 0.095, "p99": 0.099}}
+
+
+def test_window_keeps_newest_samples():
+    stats = LatencyStats(enabled=True, window=3)
+    for seconds in (9.0, 1.0, 2.0, 3.0):
+        stats.record("total", seconds)
+    assert stats.count("total") == 3
+    assert stats.percentile("total", 100) == 3.0
+
+
+def test_format_in_milliseconds():
+    stats = LatencyStats(enabled=True)
+    stats.record("total", 0.0125)
+    lines = stats.format()
+    assert lines[0].split() == ["stage", "count", "p50", "p95", "p99"]
+    assert lines[1].split() == ["total", "1", "12.50ms", "12.50ms", "12.50ms"]
+
+
+def test_disable_and_reset():
+    stats = LatencyStats(enabled=True)
+    stats.begin()
+    stats.enabled = False
+    assert not stats.tracing
+    stats.record("total", 1.0)
+    stats.reset()
+    assert stats.count("total") == 0
@@ -0,0 +1,120 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Set
+
+
+class NgramIndex:
+    """An inverted index from every n character substring to the documents that contain it.
+
+    Documents are numbered by the caller in the order they are added, so each posting list is a sorted array of
+    document ids, and appending to it is O(1).  A query is looked up by walking the posting list of its rarest
+    n-gram and keeping the ids found in the posting lists of its other n-grams.  The candidates still have to be
+    checked against the query, since having every n-gram of the query does not mean containing it.
+
+    A document may be added again under the same id as it grows, e.g. a block of lines that more lines are
+    added to."""
+
+    def __init__(self, n: int = 3):
+        """
+        Args:
+            n (int): The length of the substrings indexed.  Queries shorter than n cannot be looked up.
+        """
+        if n <= 0:
+            raise ValueError(f"n must be positive, not {n}")
+        self.n = n
+        self._postings: Dict[str, array] = {}
+        self._last_id = -1
+
+    def grams(self, text: str) -> Set[str]:
+        """Get the distinct n-grams of text"""
+        n = self.n
+        return {text[idx : idx + n] for idx in range(len(text) - n + 1)}
+
+    def add(self, doc_id: int, text: str):
+        """Index text as part of the document doc_id.
+
+        Raises:
+            ValueError: If doc_id is less than the id of a document already added
+        """
+        if doc_id < self._last_id:
+            raise ValueError(f"Documents must be added in order, but {doc_id} came after {self._last_id}")
+        self._last_id = doc_id
+        for gram in self.grams(text):
+            postings = self._postings.get(gram)
+            if postings is None:
+                self._postings[gram] = array("I", (doc_id,))
+            elif postings[-1] != doc_id:
+                postings.append(doc_id)
+
+    def remove(self, doc_id: int, text: str):
+        """Remove the document doc_id, whose text was text, from the index"""
+        for gram in self.grams(text):
+            postings = self._postings.get(gram)
+            if postings is None:
+                continue
+            idx = bisect_left(postings, doc_id)
+            if idx < len(postings) and postings[idx] == doc_id:
+                del postings[idx]
+                if len(postings) == 0:
+                    del self._postings[gram]
+
+    def remove_before(self, doc_id: int):
+        """Remove every document with an id less than doc_id, e.g. after they were evicted.  Costs a pass over every
+        n-gram, so it is best done for many documents at once."""
+        for gram in list(self._postings):
+            postings = self._postings[gram]
+            stop = bisect_left(postings, doc_id)
+            if stop == len(postings):
+                del self._postings[gram]
+            elif stop > 0:
+                del postings[:stop]
+
+    def candidates(
+        self, query: str, before: Optional[int] = None, after: Optional[int] = None, newest_first: bool = True
+    ) -> Optional[Iterator[int]]:
+        """Get the ids of the documents that may contain query, newest first unless newest_first is False.
+
+        Args:
+            before (Optional[int]): Only yield ids less than before.
+            after (Optional[int]): Only yield ids greater than after.
+
+        Returns:
+            Optional[Iterator[int]]: The candidate ids, or None if query is too short to look up, in which case
+                every document is a candidate.
+        """
+        grams = self.grams(query)
+        if len(grams) == 0:
+            return None
+        postings = [self._postings.get(gram) for gram in grams]
+        if any(gram_postings is None for gram_postings in postings):
+            return iter(())
+        postings.sort(key=len)
+        return self._intersect(postings, before, after, newest_first)
+
+    @staticmethod
+    def _intersect(
+        postings: List[array], before: Optional[int], after: Optional[int], newest_first: bool
+    ) -> Iterator[int]:
+        # Walk the rarest posting list, and check each id against the others.
+        rarest, others = postings[0], postings[1:]
+        start = 0 if after is None else bisect_right(rarest, after)
+        stop = len(rarest) if before is None else bisect_left(rarest, before)
+        for idx in range(stop - 1, start - 1, -1) if newest_first else range(start, stop):
+            doc_id = rarest[idx]
+            for gram_postings in others:
+                found = bisect_left(gram_postings, doc_id)
+                if found == len(gram_postings) or gram_postings[found] != doc_id:
+                    break
+            else:
+                yield doc_id
+
+    def clear(self):
+        self._postings.clear()
+        self._last_id = -1
+
+    def __len__(self) -> int:
+        """The number of distinct n-grams indexed"""
+        return len(self._postings)
+
+    def __repr__(self) -> str:
+        return f"NgramIndex(n={self.n}, grams={len(self._postings)})"
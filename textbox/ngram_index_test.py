@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from textbox.ngram_index import NgramIndex
+
+
+def test_grams():
+    index = NgramIndex()
+    assert index.grams("hello") == {"hel", "ell", "llo"}
+    assert index.grams("hi") == set()
+    assert NgramIndex(n=1).grams("aab") == {"a", "b"}
+
+
+def test_candidates_newest_first():
+    index = NgramIndex()
+    for doc_id, text in enumerate(["hello world", "yellow", "help", "hello again"]):
+        index.add(doc_id, text)
+    assert list(index.candidates("hello")) == [3, 0]
+    assert list(index.candidates("ello")) == [3, 1, 0]
+    assert list(index.candidates("ello", before=3)) == [1, 0]
+    assert list(index.candidates("xyz")) == []
+    # Too short to look up.
+    assert index.candidates("he") is None
+
+
+def test_candidates_are_a_superset_of_matches():
+    rng = random.Random(0)
+    docs = ["".join(rng.choice("abc") for _ in range(rng.randrange(12))) for _ in range(300)]
+    index = NgramIndex()
+    for doc_id, text in enumerate(docs):
+        index.add(doc_id, text)
+    for query in ("abc", "aaa", "cabba", "bcbcb"):
+        candidates = list(index.candidates(query))
+        assert candidates == sorted(candidates, reverse=True)
+        matches = [doc_id for doc_id, text in enumerate(docs) if query in text]
+        assert set(matches) <= set(candidates)
+
+
+def test_add_to_growing_document():
+    index = NgramIndex()
+    index.add(0, "first line")
+    index.add(0, "second line")
+    index.add(1, "third line")
+    assert list(index.candidates("line")) == [1, 0]
+    assert list(index.candidates("second")) == [0]
+    with pytest.raises(ValueError):
+        index.add(0, "out of order")
+
+
+def test_remove():
+    index = NgramIndex()
+    index.add(0, "hello")
+    index.add(1, "hello there")
+    index.remove(0, "hello")
+    assert list(index.candidates("hello")) == [1]
+    index.remove(1, "hello there")
+    assert list(index.candidates("hello")) == []
+    assert len(index) == 0
+
+
+def test_candidates_oldest_first_in_range():
+    index = NgramIndex()
+    for doc_id in range(10):
+        index.add(doc_id, "match" if doc_id % 2 == 0 else "other")
+    assert list(index.candidates("match", newest_first=False)) == [0, 2, 4, 6, 8]
+    assert list(index.candidates("match", after=2, before=8, newest_first=False)) == [4, 6]
+    assert list(index.candidates("match", after=2, before=8)) == [6, 4]
+
+
+def test_remove_before():
+    index = NgramIndex()
+    index.add(0, "only old")
+    index.add(1, "shared")
+    index.add(2, "shared")
+    index.remove_before(2)
+    assert list(index.candidates("shared")) == [2]
+    assert list(index.candidates("old")) == []
+    assert "old" not in index._postings
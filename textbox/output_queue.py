@@ -0,0 +1,165 @@
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Deque, List, Optional
+import asyncio
+import threading
+
+import logging
+
+logger = logging.getLogger()
+
+
+class OVERFLOW(Enum):
+    # Make the producing thread wait until the event loop has drained the queue.
+    BLOCK = 0
+    # Drop the oldest queued item to make room.
+    DROP_OLDEST = 1
+    # Merge the item into the newest queued item.  Items that cannot be merged drop the oldest item instead.
+    MERGE = 2
+
+
+class OutputQueue:
+    """Hands items, such as printed output, from any thread to the event loop.
+
+    put() appends to a deque, which is safe to share between threads without a lock, and wakes the event loop
+    with call_soon_threadsafe only when no drain is already scheduled.  The event loop then passes everything
+    that was queued to apply in batches.  Producers only take a lock when the queue is full and the overflow
+    policy is BLOCK."""
+
+    DRAIN_BATCH = 1024
+
+    def __init__(
+        self,
+        apply: Callable[[List[Any]], None],
+        max_items: Optional[int] = None,
+        overflow: OVERFLOW = OVERFLOW.BLOCK,
+        merge: Callable[[Any, Any], Optional[Any]] = None,
+    ):
+        """
+        Args:
+            apply (Callable[[List[Any]], None]): Called on the event loop with each batch of items, oldest first.
+            max_items (Optional[int]): The most items that may wait in the queue.  None does not bound it.
+            overflow (OVERFLOW): What put() does when the queue is full.
+            merge (Callable[[Any, Any], Optional[Any]]): Combines the newest queued item with a new one for
+                OVERFLOW.MERGE, returning None if they cannot be combined.
+        """
+        if max_items is not None and max_items <= 0:
+            raise ValueError(f"max_items must be positive or None, not {max_items}")
+        if overflow == OVERFLOW.MERGE and merge is None:
+            raise ValueError("OVERFLOW.MERGE needs a merge function")
+        self._apply = apply
+        self.max_items = max_items
+        self.overflow = overflow
+        self._merge = merge
+        maxlen = max_items if overflow == OVERFLOW.DROP_OLDEST else None
+        self._items: Deque[Any] = deque(maxlen=maxlen)
+        self._not_full = threading.Condition()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduled = False
+        self.dropped = 0
+
+    @property
+    def attached(self) -> bool:
+        """Whether an event loop is draining the queue"""
+        return self._loop is not None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Start draining the queue on loop"""
+        self._loop = loop
+        if len(self._items) > 0:
+            self._schedule_drain()
+
+    def detach(self):
+        """Stop draining the queue, after applying what is already in it.  Blocked producers are released."""
+        self.drain()
+        self._loop = None
+        with self._not_full:
+            self._not_full.notify_all()
+
+    def put(self, item: Any):
+        """Queue item from any thread.
+
+        Raises:
+            ValueError: If no event loop is draining the queue
+        """
+        if self._loop is None:
+            raise ValueError("The application is not running.")
+        if self.max_items is not None and len(self._items) >= self.max_items:
+            if self.overflow == OVERFLOW.BLOCK:
+                self._wait_until_not_full()
+            elif self.overflow == OVERFLOW.MERGE and self._merge_newest(item):
+                return
+            else:
+                self.dropped += 1
+        # A deque with maxlen drops the oldest item itself.
+        self._items.append(item)
+        if not self._scheduled:
+            self._schedule_drain()
+
+    def _wait_until_not_full(self):
+        if self._on_loop_thread():
+            # Waiting on the event loop would keep it from ever draining the queue.
+            self.drain()
+            return
+        with self._not_full:
+            while self._loop is not None and len(self._items) >= self.max_items:
+                self._not_full.wait()
+        if self._loop is None:
+            raise ValueError("The application is not running.")
+
+    def _merge_newest(self, item: Any) -> bool:
+        try:
+            newest = self._items.pop()
+        except IndexError:
+            # The event loop drained the queue in the meantime.
+            return False
+        merged = self._merge(newest, item)
+        if merged is None:
+            self._items.append(newest)
+            self._items.popleft()
+            self._items.append(item)
+            self.dropped += 1
+        else:
+            self._items.append(merged)
+        return True
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _schedule_drain(self):
+        self._scheduled = True
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._on_drain)
+
+    def _on_drain(self):
+        self._scheduled = False
+        if self._loop is None:
+            return
+        self.drain(self.DRAIN_BATCH)
+        if len(self._items) > 0 and not self._scheduled:
+            # Leave the rest for the next loop iteration, so a flood of output does not starve the input.
+            self._schedule_drain()
+
+    def drain(self, max_items: Optional[int] = None):
+        """Apply the queued items now.  Must be called on the event loop."""
+        batch = []
+        while max_items is None or len(batch) < max_items:
+            try:
+                batch.append(self._items.popleft())
+            except IndexError:
+                break
+        if self.overflow == OVERFLOW.BLOCK and self.max_items is not None:
+            with self._not_full:
+                self._not_full.notify_all()
+        if len(batch) > 0:
+            self._apply(batch)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        return f"OutputQueue(len={len(self._items)}, max_items={self.max_items}, overflow={self.overflow})"
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from textbox.output_queue import OutputQueue, OVERFLOW
+
+
+def merge_strings(first: str, second: str):
+    if first == "unmergeable" or second == "unmergeable":
+        return None
+    return first + second
+
+
+def test_threads_are_drained_in_batches_on_the_loop():
+    batches = []
+    loop_thread = []
+
+    def apply(batch):
+        loop_thread.append(threading.get_ident())
+        batches.append(batch)
+
+    queue = OutputQueue(apply)
+
+    def produce(name: str):
+        for idx in range(500):
+            queue.put((name, idx))
+
+    async def main():
+        queue.attach(asyncio.get_running_loop())
+        threads = [threading.Thread(target=produce, args=(name,)) for name in "abc"]
+        for thread in threads:
+            thread.start()
+        await asyncio.to_thread(lambda: [thread.join() for thread in threads])
+        await asyncio.sleep(0.01)
+        queue.detach()
+
+    asyncio.run(main())
+    items = [item for batch in batches for item in batch]
+    assert len(items) == 1500
+    for name in "abc":
+        assert [idx for item_name, idx in items if item_name == name] == list(range(500))
+    assert len(batches) < 1500
+    assert set(loop_thread) == {threading.get_ident()}
+
+
+def test_put_needs_a_loop():
+    queue = OutputQueue(lambda batch: None)
+    with pytest.raises(ValueError):
+        queue.put("hello")
+
+
+def test_drop_oldest():
+    applied = []
+    loop = asyncio.new_event_loop()
+    queue = OutputQueue(applied.extend, max_items=3, overflow=OVERFLOW.DROP_OLDEST)
+    queue.attach(loop)
+    for idx in range(5):
+        queue.put(idx)
+    assert len(queue) == 3
+    assert queue.dropped == 2
+    queue.drain()
+    assert applied == [2, 3, 4]
+    loop.close()
+
+
+def test_merge():
+    applied = []
+    loop = asyncio.new_event_loop()
+    queue = OutputQueue(applied.extend, max_items=2, overflow=OVERFLOW.MERGE, merge=merge_strings)
+    queue.attach(loop)
+    for item in ["a", "b", "c", "d", "unmergeable"]:
+        queue.put(item)
+    assert queue.dropped == 1
+    queue.drain()
+    assert applied == ["bcd", "unmergeable"]
+    loop.close()
+
+    with pytest.raises(ValueError):
+        OutputQueue(applied.extend, overflow=OVERFLOW.MERGE)
+
+
+def test_block_waits_for_the_loop():
+    applied = []
+    loop = asyncio.new_event_loop()
+    queue = OutputQueue(applied.extend, max_items=2, overflow=OVERFLOW.BLOCK)
+    queue.attach(loop)
+    queue.put(0)
+    queue.put(1)
+    producer = threading.Thread(target=queue.put, args=(2,))
+    producer.start()
+    time.sleep(0.05)
+    assert producer.is_alive()
+    assert len(queue) == 2
+    queue.drain()
+    producer.join(1)
+    assert not producer.is_alive()
+    queue.drain()
+    assert applied == [0, 1, 2]
+
+    queue.put(3)
+    queue.put(4)
+    producer = threading.Thread(target=lambda: pytest.raises(ValueError, queue.put, 5))
+    producer.start()
+    time.sleep(0.05)
+    queue.detach()
+    producer.join(1)
+    assert not producer.is_alive()
+    assert applied == [0, 1, 2, 3, 4]
+    loop.close()
@@ -0,0 +1,101 @@
+from typing import Callable, Dict, Optional
+from contextlib import contextmanager
+import asyncio
+import time
+
+import logging
+
+logger = logging.getLogger()
+
+
+class RenderScheduler:
+    """Coalesces redraw requests into frames on the asyncio event loop.
+
+    request() queues a draw callback and schedules a frame, at most fps frames per second.  A frame calls every
+    queued callback once, however often it was requested, and then calls render, so printing thousands of
+    lines costs one repaint per frame instead of one per line.  Without a running event loop, requests are
+    drawn right away."""
+
+    def __init__(self, render: Callable[[], None] = None, fps: Optional[float] = 60):
+        self._render = render
+        self._pending: Dict[Callable[[], None], None] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._last_frame = 0.0
+        self._batch_depth = 0
+        self.fps = fps
+
+    @property
+    def fps(self) -> Optional[float]:
+        """The most frames drawn per second.  None draws a frame on the next loop iteration."""
+        return self._fps
+
+    @fps.setter
+    def fps(self, value: Optional[float]):
+        if value is not None and value <= 0:
+            raise ValueError(f"fps must be positive or None, not {value}")
+        self._fps = value
+
+    @property
+    def frame_interval(self) -> float:
+        return 0.0 if self._fps is None else 1.0 / self._fps
+
+    @property
+    def batching(self) -> bool:
+        """Whether draws are being held back until the end of a batch"""
+        return self._batch_depth > 0
+
+    @contextmanager
+    def batch(self):
+        """Hold every requested draw until the batch ends, then draw them all in one frame"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    @property
+    def pending(self) -> bool:
+        """Whether a frame has been requested but not drawn yet"""
+        return self._handle is not None or len(self._pending) > 0
+
+    def request(self, draw: Callable[[], None] = None):
+        """Call draw, and then render, in the next frame"""
+        if draw is not None:
+            self._pending[draw] = None
+        if self.batching:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._handle is not None:
+            return
+        delay = max(self._last_frame + self.frame_interval - time.monotonic(), 0.0)
+        self._handle = loop.call_later(delay, self._on_frame)
+
+    def flush(self):
+        """Draw everything that is pending right now"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        pending = list(self._pending)
+        self._pending.clear()
+        for draw in pending:
+            draw()
+        if self._render is not None:
+            self._render()
+        self._last_frame = time.monotonic()
+
+    def cancel(self):
+        """Drop the pending frame without drawing it"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._pending.clear()
+
+    def _on_frame(self):
+        self._handle = None
+        self.flush()
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from textbox.render_scheduler import RenderScheduler
+
+
+class CountingBox:
+    def __init__(self):
+        self.redraws = 0
+
+    def redraw(self):
+        self.redraws += 1
+
+
+def test_request_without_loop_draws_immediately():
+    frames = []
+    box = CountingBox()
+    scheduler = RenderScheduler(lambda: frames.append(box.redraws))
+    scheduler.request(box.redraw)
+    assert box.redraws == 1
+    assert frames == [1]
+    assert not scheduler.pending
+
+
+def test_requests_are_coalesced_into_one_frame():
+    frames = []
+    box = CountingBox()
+    other = CountingBox()
+
+    async def main():
+        scheduler = RenderScheduler(lambda: frames.append(box.redraws), fps=None)
+        for _ in range(1000):
+            scheduler.request(box.redraw)
+        scheduler.request(other.redraw)
+        assert scheduler.pending
+        assert box.redraws == 0
+        await asyncio.sleep(0.01)
+        assert not scheduler.pending
+
+    asyncio.run(main())
+    assert box.redraws == 1
+    assert other.redraws == 1
+    assert frames == [1]
+
+
+def test_fps_cap_delays_next_frame():
+    box = CountingBox()
+
+    async def main():
+        scheduler = RenderScheduler(fps=10)
+        scheduler.request(box.redraw)
+        await asyncio.sleep(0.01)
+        assert box.redraws == 1
+        scheduler.request(box.redraw)
+        await asyncio.sleep(0.01)
+        assert box.redraws == 1
+        await asyncio.sleep(0.15)
+        assert box.redraws == 2
+
+    asyncio.run(main())
+
+
+def test_flush_draws_pending_frame():
+    box = CountingBox()
+
+    async def main():
+        scheduler = RenderScheduler(fps=1)
+        scheduler.request(box.redraw)
+        scheduler.flush()
+        assert box.redraws == 1
+        assert not scheduler.pending
+        await asyncio.sleep(0.01)
+        assert box.redraws == 1
+
+    asyncio.run(main())
+
+
+def test_invalid_fps():
+    with pytest.raises(ValueError):
+        RenderScheduler(fps=0)
+
+
+def test_batch_holds_draws_until_it_ends():
+    frames = []
+    box = CountingBox()
+    scheduler = RenderScheduler(lambda: frames.append(box.redraws))
+    with scheduler.batch():
+        for _ in range(10):
+            scheduler.request(box.redraw)
+        with scheduler.batch():
+            scheduler.request(box.redraw)
+        assert scheduler.batching
+        assert box.redraws == 0
+        assert frames == []
+    assert not scheduler.batching
+    assert box.redraws == 1
+    assert frames == [1]
@@ -0,0 +1,94 @@
+from typing import Generic, Iterator, List, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """A sequence that appends at the end and evicts from the front in O(1), with O(1) random access.
+
+    Items live in a list used as a circle, and the index of the oldest item moves forward as items are evicted.
+    With a capacity, appending to a full buffer evicts the oldest item.  Without one, the list doubles when it
+    fills up."""
+
+    _INITIAL_SIZE = 8
+
+    def __init__(self, capacity: Optional[int] = None, items: Iterator[T] = ()):
+        """
+        Args:
+            capacity (Optional[int]): The most items kept.  None keeps every item.
+            items (Iterator[T]): Items to start with.  Only the newest capacity of them are kept.
+        """
+        if capacity is not None and capacity <= 0:
+            raise ValueError(f"capacity must be positive or None, not {capacity}")
+        self.capacity = capacity
+        size = capacity if capacity is not None else self._INITIAL_SIZE
+        self._items: List[Optional[T]] = [None] * size
+        self._head = 0
+        self._len = 0
+        for item in items:
+            self.append(item)
+
+    @property
+    def full(self) -> bool:
+        return self.capacity is not None and self._len == self.capacity
+
+    def append(self, item: T) -> Optional[T]:
+        """Add item at the end.
+
+        Returns:
+            Optional[T]: The oldest item, if it was evicted to make room
+        """
+        evicted = None
+        if self.full:
+            evicted = self.popleft()
+        elif self._len == len(self._items):
+            self._grow()
+        self._items[(self._head + self._len) % len(self._items)] = item
+        self._len += 1
+        return evicted
+
+    def _grow(self):
+        self._items = list(self) + [None] * len(self._items)
+        self._head = 0
+
+    def popleft(self) -> T:
+        """Remove and return the oldest item"""
+        if self._len == 0:
+            raise IndexError("pop from an empty RingBuffer")
+        item = self._items[self._head]
+        # Drop the reference, so evicted items can be freed.
+        self._items[self._head] = None
+        self._head = (self._head + 1) % len(self._items)
+        self._len -= 1
+        return item
+
+    def clear(self):
+        self._items = [None] * len(self._items)
+        self._head = 0
+        self._len = 0
+
+    def _physical(self, idx: int) -> int:
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("RingBuffer index out of range")
+        return (self._head + idx) % len(self._items)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(item, slice):
+            return [self._items[self._physical(idx)] for idx in range(*item.indices(self._len))]
+        return self._items[self._physical(item)]
+
+    def __setitem__(self, idx: int, item: T):
+        self._items[self._physical(idx)] = item
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[T]:
+        size = len(self._items)
+        for idx in range(self._len):
+            yield self._items[(self._head + idx) % size]
+
+    def __repr__(self) -> str:
+        return f"RingBuffer({list(self)}, capacity={self.capacity})"
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from textbox.ring_buffer import RingBuffer
+
+
+def test_append_and_index():
+    buffer = RingBuffer()
+    for idx in range(20):
+        assert buffer.append(idx) is None
+    assert len(buffer) == 20
+    assert buffer[0] == 0
+    assert buffer[-1] == 19
+    assert buffer[5:8] == [5, 6, 7]
+    assert list(buffer) == list(range(20))
+
+
+def test_capacity_evicts_oldest():
+    buffer = RingBuffer(3, range(5))
+    assert list(buffer) == [2, 3, 4]
+    assert buffer.full
+    assert buffer.append(5) == 2
+    assert list(buffer) == [3, 4, 5]
+    assert buffer[0] == 3
+    buffer[0] = 9
+    assert buffer[:] == [9, 4, 5]
+
+
+def test_popleft_and_clear():
+    buffer = RingBuffer(items="abc")
+    assert buffer.popleft() == "a"
+    assert list(buffer) == ["b", "c"]
+    buffer.clear()
+    assert len(buffer) == 0
+    with pytest.raises(IndexError):
+        buffer.popleft()
+    with pytest.raises(IndexError):
+        buffer[0]
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_matches_list_model():
+    rng = random.Random(0)
+    for capacity in (None, 1, 7):
+        buffer = RingBuffer(capacity)
+        model = []
+        for step in range(500):
+            if rng.random() < 0.3 and len(model) > 0:
+                assert buffer.popleft() == model.pop(0)
+            else:
+                evicted = buffer.append(step)
+                model.append(step)
+                if capacity is not None and len(model) > capacity:
+                    assert evicted == model.pop(0)
+                else:
+                    assert evicted is None
+            assert list(buffer) == model
+            if len(model) > 0:
+                idx = rng.randrange(-len(model), len(model))
+                assert buffer[idx] == model[idx]
@@ -0,0 +1,250 @@
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from textbox.ngram_index import NgramIndex
+from textbox.text_list import TextList
+
+
+class SearchMatch(NamedTuple):
+    text_id: int
+    lineno: int
+    start: int
+    stop: int
+
+    @property
+    def position(self) -> Tuple[int, int, int]:
+        return (self.text_id, self.lineno, self.start)
+
+
+class ScrollbackSearch:
+    """Finds the matches of a regex in the Texts of a TextList, as with / and ? in vim.
+
+    The Texts are kept in an n-gram index, in blocks of BLOCK_SIZE Texts to bound its memory.  A search takes the
+    longest literal that every match of the regex must contain, and only reads the Texts of the blocks that have
+    all of its n-grams, running the regex on the lines that contain the literal.  Texts that are not indexed yet,
+    which are the newest, are read one by one.  A regex without such a literal reads every Text.
+
+    The newest Text and Texts kept open to stream into may still grow, so only the Texts before the oldest of them
+    are indexed.  Evicted Texts are dropped from the index in bulk, once they make up more of it than the Texts
+    that are kept."""
+
+    BLOCK_SIZE = 16
+
+    def __init__(self, text_list: TextList, n: int = 3):
+        self.text_list = text_list
+        self._index = NgramIndex(n)
+        # The id of the oldest Text that is not in the index yet.
+        self._indexed = 0
+        # The blocks before this one were removed from the index.
+        self._pruned_block = 0
+
+    @property
+    def _text_ids(self) -> range:
+        first = self.text_list.first_text_id
+        return range(first, first + len(self.text_list.texts))
+
+    @property
+    def indexed(self) -> bool:
+        """Whether every Text that can no longer grow is in the index"""
+        return self._indexed >= self.text_list.first_open_text_id
+
+    def index_step(self, budget: int = 1000) -> bool:
+        """Add up to budget of the Texts that are not in the index yet to it, oldest first.
+
+        Returns:
+            bool: Whether Texts remain to be indexed
+        """
+        text_ids = self._text_ids
+        self._indexed = max(self._indexed, text_ids.start)
+        stop = min(self._indexed + budget, self.text_list.first_open_text_id)
+        for text_id in range(self._indexed, stop):
+            self._index.add(text_id // self.BLOCK_SIZE, self._plain(text_id))
+        self._indexed = max(self._indexed, stop)
+
+        first_block = text_ids.start // self.BLOCK_SIZE
+        if first_block - self._pruned_block > self._indexed // self.BLOCK_SIZE - first_block:
+            self._index.remove_before(first_block)
+            self._pruned_block = first_block
+        return not self.indexed
+
+    def can_look_up(self, regex: re.Pattern) -> bool:
+        """Whether the index narrows down the Texts a search for regex reads.  If not, find reads every Text."""
+        return len(self.required_literal(regex)) >= self._index.n
+
+    @staticmethod
+    def required_literal(regex: re.Pattern) -> str:
+        """Find the longest string that every match of regex contains, or "" if none could be found.
+
+        This reads the pattern conservatively: it only takes runs of plain characters outside of groups and
+        classes, and gives up on alternation and on flags that change what a character matches."""
+        if not isinstance(regex.pattern, str) or regex.flags & (re.IGNORECASE | re.VERBOSE):
+            return ""
+        pattern = regex.pattern
+        runs: List[str] = []
+        run: List[str] = []
+        idx = 0
+        while idx < len(pattern):
+            ch = pattern[idx]
+            literal = None
+            if ch == "\\":
+                escaped = pattern[idx + 1 : idx + 2]
+                # Escaped letters and digits are classes, anchors, references or character codes.
+                if escaped != "" and not escaped.isalnum():
+                    literal = escaped
+                idx += 2
+                if escaped in ("x", "u", "U"):
+                    idx += {"x": 2, "u": 4, "U": 8}[escaped]
+                elif escaped == "N":
+                    close = pattern.find("}", idx)
+                    idx = len(pattern) if close < 0 else close + 1
+                elif escaped.isdigit():
+                    while idx < len(pattern) and pattern[idx].isdigit():
+                        idx += 1
+            elif ch in "([":
+                idx = ScrollbackSearch._skip_group(pattern, idx)
+            elif ch == "|":
+                return ""
+            elif ch in ".^$*+?{)]":
+                idx += 1
+            else:
+                literal = ch
+                idx += 1
+
+            quantifier = pattern[idx : idx + 1]
+            if quantifier in ("*", "?", "{"):
+                # The atom may not be there at all.
+                literal = None
+            if literal is not None:
+                run.append(literal)
+            if literal is None or quantifier == "+":
+                runs.append("".join(run))
+                run = []
+            if quantifier == "{":
+                close = pattern.find("}", idx)
+                idx = len(pattern) if close < 0 else close + 1
+            elif quantifier in ("*", "?", "+"):
+                idx += 1
+            if quantifier != "" and pattern[idx : idx + 1] in ("?", "+"):
+                # Lazy and possessive quantifiers.
+                idx += 1
+        runs.append("".join(run))
+        return max(runs, key=len)
+
+    @staticmethod
+    def _skip_group(pattern: str, idx: int) -> int:
+        """Get the index after the group or class that starts at idx"""
+        depth = 0
+        in_class = False
+        while idx < len(pattern):
+            ch = pattern[idx]
+            if ch == "\\":
+                idx += 2
+                continue
+            if in_class:
+                # A ] right after [ or [^ is part of the class.
+                if ch == "]" and pattern[idx - 1] not in "[^":
+                    in_class = False
+            elif ch == "[":
+                in_class = True
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+            idx += 1
+            if depth == 0 and not in_class:
+                break
+        return idx
+
+    def find(
+        self,
+        regex: re.Pattern,
+        origin: Optional[Tuple[int, int, int]] = None,
+        backward: bool = False,
+        wrap: bool = True,
+    ) -> Optional[SearchMatch]:
+        """Find the first match of regex after origin, or the last one before it if backward.  Empty matches are
+        skipped, since there is nothing to show of them.
+
+        Args:
+            regex (re.Pattern): The pattern to find.  It is matched against one line at a time.
+            origin (Optional[Tuple[int, int, int]]): The (text_id, lineno, column) to search from, e.g. the position
+                of the last match.  None searches from the start of the scrollback, or the end if backward.
+            backward (bool): Search towards older Texts.
+            wrap (bool): Continue from the other end of the scrollback when there is no match before that end.
+
+        Returns:
+            Optional[SearchMatch]: The match, or None if there is none
+        """
+        text_ids = self._text_ids
+        if len(text_ids) == 0:
+            return None
+        if origin is None or origin[0] < text_ids.start:
+            origin = (text_ids.start, 0, -1) if not backward else (text_ids.stop, 0, 0)
+        literal = self.required_literal(regex)
+        origin_id = min(origin[0], text_ids.stop - 1)
+        if backward:
+            passes = [(text_ids.start, origin_id + 1, lambda key: key < origin)]
+            if wrap:
+                passes.append((origin_id, text_ids.stop, lambda key: key >= origin))
+        else:
+            passes = [(origin_id, text_ids.stop, lambda key: key > origin)]
+            if wrap:
+                passes.append((text_ids.start, origin_id + 1, lambda key: key <= origin))
+        for start, stop, wanted in passes:
+            for text_id in self._candidate_ids(literal, start, stop, backward):
+                for match in self._matches(regex, literal, text_id, backward):
+                    if wanted(match.position):
+                        return match
+        return None
+
+    def _candidate_ids(self, literal: str, start: int, stop: int, backward: bool) -> Iterator[int]:
+        """Get the ids in [start, stop) of the Texts that may contain literal, in search order"""
+        indexed_stop = max(min(self._indexed, stop), start)
+        unindexed = range(indexed_stop, stop)
+        candidates = None
+        if indexed_stop > start:
+            candidates = self._index.candidates(
+                literal,
+                after=start // self.BLOCK_SIZE - 1,
+                before=(indexed_stop - 1) // self.BLOCK_SIZE + 1,
+                newest_first=backward,
+            )
+        if candidates is None:
+            # The literal is too short to look up, so every Text is a candidate.
+            candidates = range(start, indexed_stop)
+        else:
+            candidates = self._block_text_ids(candidates, start, indexed_stop, backward)
+
+        if backward:
+            yield from reversed(unindexed)
+            yield from reversed(candidates) if isinstance(candidates, range) else candidates
+        else:
+            yield from candidates
+            yield from unindexed
+
+    def _block_text_ids(self, blocks: Iterator[int], start: int, stop: int, backward: bool) -> Iterator[int]:
+        for block in blocks:
+            text_ids = range(max(block * self.BLOCK_SIZE, start), min((block + 1) * self.BLOCK_SIZE, stop))
+            yield from reversed(text_ids) if backward else text_ids
+
+    def _matches(self, regex: re.Pattern, literal: str, text_id: int, backward: bool) -> Iterator[SearchMatch]:
+        """Get the matches of regex in a Text, in search order"""
+        lines = [str(line) for line in self.text_list.texts[text_id - self.text_list.first_text_id]]
+        linenos = range(len(lines) - 1, -1, -1) if backward else range(len(lines))
+        for lineno in linenos:
+            line = lines[lineno]
+            if literal not in line:
+                continue
+            matches = [
+                SearchMatch(text_id, lineno, match.start(), match.end())
+                for match in regex.finditer(line)
+                if match.end() > match.start()
+            ]
+            yield from reversed(matches) if backward else matches
+
+    def _plain(self, text_id: int) -> str:
+        text = self.text_list.texts[text_id - self.text_list.first_text_id]
+        return "\n".join(str(line) for line in text)
+
+    def __repr__(self) -> str:
+        return f"ScrollbackSearch(texts={len(self._text_ids)}, indexed={self._indexed}, index={self._index})"
@@ -0,0 +1,128 @@
+import random
+import re
+
+import pytest
+
+from textbox.scrollback_search import ScrollbackSearch, SearchMatch
+from textbox.text import Text
+from textbox.text_list import TextList
+
+
+def make_text_list(texts, **kwargs) -> TextList:
+    text_list = TextList(max_line_width=20, **kwargs)
+    for text in texts:
+        text_list.add_text(Text(text, max_line_width=20))
+    return text_list
+
+
+@pytest.mark.parametrize(
+    "pattern, literal",
+    [
+        ("error", "error"),
+        ("err(or)?s", "err"),
+        ("colou?r", "colo"),
+        ("ab+c", "ab"),
+        (r"\d+ failed tests", " failed tests"),
+        (r"a\.b\*", "a.b*"),
+        (r"[abc]+xyz", "xyz"),
+        (r"fo{2}bar", "bar"),
+        (r"\x41BCD", "BCD"),
+        ("foo|bar", ""),
+        ("(?i)error", ""),
+        (".*", ""),
+    ],
+)
+def test_required_literal(pattern, literal):
+    assert ScrollbackSearch.required_literal(re.compile(pattern)) == literal
+
+
+def test_find_forward_and_backward():
+    text_list = make_text_list(["one match", "nothing", "two\nmatch match"])
+    search = ScrollbackSearch(text_list)
+    regex = re.compile("match")
+    first = search.find(regex)
+    assert first == SearchMatch(0, 0, 4, 9)
+    second = search.find(regex, first.position)
+    assert second == SearchMatch(2, 1, 0, 5)
+    third = search.find(regex, second.position)
+    assert third == SearchMatch(2, 1, 6, 11)
+    # Wraps around to the first match.
+    assert search.find(regex, third.position) == first
+    assert search.find(regex, third.position, wrap=False) is None
+
+    assert search.find(regex, backward=True) == third
+    assert search.find(regex, third.position, backward=True) == second
+    assert search.find(regex, first.position, backward=True) == third
+    assert search.find(re.compile("missing"), backward=True) is None
+
+
+@pytest.mark.parametrize("indexed", [0, 5, 1000])
+def test_finds_the_same_matches_indexed_or_not(indexed):
+    rng = random.Random(indexed)
+    texts = ["\n".join("".join(rng.choice("abc ") for _ in range(15)) for _ in range(3)) for _ in range(100)]
+    search = ScrollbackSearch(make_text_list(texts))
+    search.index_step(indexed)
+    for pattern in ("abc", "a b+c", "cc", "[ab]{2}ca", "(ab|ba)cab"):
+        regex = re.compile(pattern)
+        expected = [
+            SearchMatch(text_id, lineno, match.start(), match.end())
+            for text_id, text in enumerate(texts)
+            for lineno, line in enumerate(text.split("\n"))
+            for match in regex.finditer(line)
+        ]
+        found = []
+        match = search.find(regex, wrap=False)
+        while match is not None:
+            found.append(match)
+            match = search.find(regex, match.position, wrap=False)
+        assert found == expected
+
+        found = []
+        match = search.find(regex, backward=True, wrap=False)
+        while match is not None:
+            found.append(match)
+            match = search.find(regex, match.position, backward=True, wrap=False)
+        assert found == expected[::-1]
+
+
+def test_newest_text_is_not_indexed():
+    text_list = make_text_list(["first", "second"])
+    search = ScrollbackSearch(text_list)
+    assert not search.index_step(10)
+    assert search._indexed == 1
+    text_list.append(" grows")
+    assert search.find(re.compile("grows")) == SearchMatch(1, 0, 7, 12)
+    text_list.add_text(Text("third"))
+    assert not search.indexed
+    assert not search.index_step(10)
+    assert search.find(re.compile("grows")) == SearchMatch(1, 0, 7, 12)
+
+
+def test_evicted_texts_are_not_found():
+    text_list = make_text_list([], max_lines=4)
+    search = ScrollbackSearch(text_list)
+    for idx in range(100):
+        text_list.add_text(Text(f"line {idx}"))
+        search.index_step()
+    assert text_list.first_text_id == 95
+    assert search.find(re.compile("line 1")) is None
+    assert search.find(re.compile("line")) == SearchMatch(95, 0, 0, 4)
+    assert search.find(re.compile("line"), backward=True) == SearchMatch(99, 0, 0, 4)
+    # Evicted blocks were dropped from the index.
+    assert search._pruned_block > 0
+
+
+def test_open_text_is_not_indexed_until_closed():
+    text_list = make_text_list(["first"])
+    search = ScrollbackSearch(text_list)
+    text_list.increment_text_ptr()
+    reply = text_list.open_text()
+    text_list.append_to(reply, "streamed")
+    text_list.add_text(Text("third"))
+    search.index_step(10)
+    assert search._indexed == 1
+    text_list.append_to(reply, " reply")
+    assert search.find(re.compile("reply")) == SearchMatch(1, 0, 9, 14)
+    text_list.close_text(reply)
+    assert not search.index_step(10)
+    assert search.find(re.compile("reply")) == SearchMatch(1, 0, 9, 14)
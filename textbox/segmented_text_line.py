@@ -1,3 +1,5 @@
+from array import array
+from bisect import bisect_left, bisect_right
 from typing import Union, List
 from textbox.text_segment import TextSegment
 from textbox.color_code import ColorCode
@@ -5,7 +7,10 @@ from textbox.color_code import ColorCode
 
 class SegmentedTextLine:
     """A line of text that can contain multiple TextSegments with different color pairs.
-    This makes the individual, multi-colored segments of text easier to manage as a single line."""
+    This makes the individual, multi-colored segments of text easier to manage as a single line.
+
+    `_offsets[idx]` holds the column at which segment idx starts, with one trailing entry for the total length,
+    so character lookup and slicing bisect into the segments instead of walking them."""
 
     def __init__(self, text: Union[List[TextSegment], TextSegment] = None):
         if text is None:
@@ -45,9 +50,17 @@ class SegmentedTextLine:
             else:
                 reduced_segments.append(segment)
         self._segments = reduced_segments
+        self._index_offsets()
+
+    def _index_offsets(self):
+        """Rebuild the cumulative column offsets of the segments.  Must be called whenever _segments changes."""
+        offsets = array("I", [0])
+        for segment in self._segments:
+            offsets.append(offsets[-1] + len(segment))
+        self._offsets = offsets
 
     def __len__(self):
-        return sum((len(segment) for segment in self._segments))
+        return self._offsets[-1]
 
     def __str__(self):
         return "".join([str(segment) for segment in self._segments])
@@ -85,12 +98,10 @@ class SegmentedTextLine:
         if isinstance(item, int):
             if item < 0:
                 item = len(self) + item
-            accumulated_length = 0
-            for idx, segment in enumerate(self._segments):
-                if accumulated_length <= item < len(segment) + accumulated_length:
-                    return self._segments[idx][item - accumulated_length]
-                accumulated_length += len(segment)
-            raise IndexError(f"{str(self)} does not contain index: {item}")
+            if not 0 <= item < len(self):
+                raise IndexError(f"{str(self)} does not contain index: {item}")
+            idx = bisect_right(self._offsets, item) - 1
+            return self._segments[idx][item - self._offsets[idx]]
 
         elif isinstance(item, slice):
             if item.step is not None and item.step != 1:
@@ -110,37 +121,19 @@ class SegmentedTextLine:
                     stop = len(self) + item.stop
                 else:
                     stop = item.stop
+            stop = min(stop, len(self))
 
-            if start == stop:
-                return SegmentedTextLine()
-
-            start_segment_idx = None
-            start_col_idx = None
-            stop_segment_idx = None
-            stop_col_idx = None
-            accumulated_length = 0
-            for idx, segment in enumerate(self._segments):
-                if accumulated_length <= start < len(segment) + accumulated_length:
-                    start_segment_idx = idx
-                    start_col_idx = start - accumulated_length
-                if accumulated_length <= stop < len(segment) + accumulated_length:
-                    stop_segment_idx = idx
-                    stop_col_idx = stop - accumulated_length
-                accumulated_length += len(segment)
-
-            if start_segment_idx is None:
+            if start < 0 or start >= stop:
                 return SegmentedTextLine()
 
-            if stop_segment_idx is None and stop >= len(self):
-                stop_segment_idx = len(self._segments) - 1
-                stop_col_idx = len(self._segments[-1])
+            # First segment containing start, through the last segment containing stop - 1.
+            start_segment_idx = bisect_right(self._offsets, start) - 1
+            stop_segment_idx = bisect_left(self._offsets, stop) - 1
 
             new_segments = []
-            while start_segment_idx < stop_segment_idx:
-                new_segments += [self._segments[start_segment_idx][start_col_idx:]]
-                start_col_idx = 0
-                start_segment_idx += 1
-            new_segments += [self._segments[stop_segment_idx][start_col_idx:stop_col_idx]]
+            for idx in range(start_segment_idx, stop_segment_idx + 1):
+                segment_start = self._offsets[idx]
+                new_segments.append(self._segments[idx][max(start - segment_start, 0) : stop - segment_start])
             return SegmentedTextLine(new_segments)
 
         else:
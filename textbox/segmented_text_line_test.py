@@ -109,3 +109,16 @@ def test_edge_cases_singleentry_slice():
     assert result == SegmentedTextLine()
     result = test[5:]
     assert result == SegmentedTextLine()
+
+
+def test_len_and_getitem_many_segments():
+    segments = [TextSegment(str(idx % 10) * 3, color_pair=idx % 2) for idx in range(100)]
+    test = SegmentedTextLine(segments)
+    assert len(test) == 300
+    assert test[0] == TextSegment("0", color_pair=0)
+    assert test[151] == TextSegment("0", color_pair=0)
+    assert test[-1] == TextSegment("9", color_pair=1)
+    assert test[2:4] == SegmentedTextLine([TextSegment("0", color_pair=0), TextSegment("1", color_pair=1)])
+    assert str(test[3:9]) == "111222"
+    assert str(test[295:]) == "88999"
+    assert test[299:400] == SegmentedTextLine(TextSegment("9", color_pair=1))
@@ -0,0 +1,234 @@
+import asyncio
+import multiprocessing
+import os
+import re
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import AsyncIterator, Iterator, List, NamedTuple, Optional, Tuple
+
+from textbox.scrollback_search import SearchMatch
+from textbox.text_list import TextList
+
+
+def scan_shard(name: str, line_count: int, pattern: str, flags: int) -> array:
+    """Find the matches of a regex in a shard exported to shared memory.  Runs in a worker process.
+
+    Returns:
+        array: The (line, start, stop) of every non-empty match, flattened
+    """
+    regex = re.compile(pattern, flags)
+    matches = array("I")
+    shm = SharedMemory(name=name)
+    try:
+        header = 8 * (line_count + 1)
+        offsets = shm.buf[:header].cast("Q")
+        data = shm.buf[header:]
+        for line in range(line_count):
+            text = str(data[offsets[line] : offsets[line + 1]], "utf-8")
+            for match in regex.finditer(text):
+                if match.end() > match.start():
+                    matches.extend((line, match.start(), match.end()))
+        del offsets, data
+    finally:
+        shm.close()
+    return matches
+
+
+class ScrollbackShard:
+    """A copy of the lines of the Texts [start, stop) in a block of shared memory, which worker processes can read
+    without the lines being pickled.  The block holds the byte offset of every line, then the lines in UTF-8."""
+
+    def __init__(self, text_list: TextList, start: int, stop: int):
+        first = text_list.first_text_id
+        lines = []
+        # The index of the first line of each Text.
+        self.text_starts = array("Q")
+        for text_id in range(start, stop):
+            self.text_starts.append(len(lines))
+            lines += [str(line).encode("utf-8") for line in text_list.texts[text_id - first]]
+        self.start = start
+        self.stop = stop
+        self.line_count = len(lines)
+
+        offsets = array("Q", [0])
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+        header = 8 * (self.line_count + 1)
+        self.shm = SharedMemory(create=True, size=header + offsets[-1] + 1)
+        self.shm.buf[:header] = offsets.tobytes()
+        self.shm.buf[header : header + offsets[-1]] = b"".join(lines)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def matches(self, found: array) -> Iterator[SearchMatch]:
+        """Map the flattened (line, start, stop) results of scan_shard to the Texts they were found in"""
+        for idx in range(0, len(found), 3):
+            line = found[idx]
+            text_idx = bisect_right(self.text_starts, line) - 1
+            yield SearchMatch(self.start + text_idx, line - self.text_starts[text_idx], found[idx + 1], found[idx + 2])
+
+    def close(self):
+        """Free the shared memory"""
+        self.shm.close()
+        self.shm.unlink()
+
+    def __repr__(self) -> str:
+        return f"ScrollbackShard(texts=[{self.start}, {self.stop}), lines={self.line_count}, name={self.name})"
+
+
+class SearchProgress(NamedTuple):
+    # The nearest match, once no shard still being scanned can have a nearer one.
+    match: Optional[SearchMatch]
+    matches: int
+    shards_done: int
+    shards: int
+
+
+class ShardedSearch:
+    """Finds the matches of a regex in the Texts of a TextList with a pool of worker processes, for patterns that
+    ScrollbackSearch cannot look up in its index and would have to scan on the event loop.
+
+    The Texts are exported to shards of about SHARD_LINES logical lines, before wrapping, in shared memory, and each
+    shard is scanned by a worker.  The shards are scanned nearest to where the search starts first, and progress is
+    reported as each one is done, so the nearest match is known as soon as the shards before it are.  Shards of
+    Texts that can no longer change are kept for the next search; the newest Texts are exported again for each one.
+    The shards hold a copy of the scrollback's text.
+
+    Workers are started with spawn, since the UI may have threads running when the pool starts."""
+
+    SHARD_LINES = 20000
+
+    def __init__(self, text_list: TextList, workers: Optional[int] = None):
+        """
+        Args:
+            workers (Optional[int]): The number of worker processes.  None starts one per core.
+        """
+        self.text_list = text_list
+        self.workers = workers if workers is not None else os.cpu_count()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._shards: List[ScrollbackShard] = []
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _export(self):
+        """Export the Texts that can no longer change to shards, in whole shards, yielding between them"""
+        first = self.text_list.first_text_id
+        while len(self._shards) > 0 and self._shards[0].stop <= first:
+            self._shards.pop(0).close()
+        start = self._shards[-1].stop if len(self._shards) > 0 else first
+        start = max(start, first)
+        closed_stop = self.text_list.first_open_text_id
+        while True:
+            stop, lines = start, 0
+            while stop < closed_stop and lines < self.SHARD_LINES:
+                # The shards hold the lines unwrapped.
+                lines += self.text_list.texts[stop - first].last_line_in_text + 1
+                stop += 1
+            if lines < self.SHARD_LINES:
+                return
+            self._shards.append(ScrollbackShard(self.text_list, start, stop))
+            start = stop
+            await asyncio.sleep(0)
+            # Texts may have been evicted while the event loop ran.
+            first = self.text_list.first_text_id
+            closed_stop = self.text_list.first_open_text_id
+            start = max(start, first)
+
+    async def find(
+        self, regex: re.Pattern, origin: Optional[Tuple[int, int, int]] = None, backward: bool = False
+    ) -> AsyncIterator[SearchProgress]:
+        """Scan every Text for regex, and report the progress each time a shard is done.  The search wraps around
+        the ends of the scrollback, as ScrollbackSearch.find does.
+
+        Args:
+            regex (re.Pattern): The pattern to find.  It is matched against one line at a time.
+            origin (Optional[Tuple[int, int, int]]): The (text_id, lineno, column) to search from.  None searches
+                from the start of the scrollback, or the end if backward.
+            backward (bool): Search towards older Texts.
+
+        Yields:
+            SearchProgress: The matches found so far.  The last one has the nearest match, or None if there is none.
+        """
+        await self._export()
+        first = self.text_list.first_text_id
+        stop = first + len(self.text_list.texts)
+        if stop == first:
+            yield SearchProgress(None, 0, 0, 0)
+            return
+        if origin is None or origin[0] < first:
+            origin = (first, 0, -1) if not backward else (stop, 0, 0)
+
+        def rank(match: SearchMatch) -> Tuple:
+            # Matches past the origin come first, nearest first, then the matches the search wraps around to.
+            if backward:
+                return (match.position >= origin, tuple(-value for value in match.position))
+            return (match.position <= origin, match.position)
+
+        def best_rank(shard: ScrollbackShard) -> Tuple:
+            # The best rank any match in the shard could have, to the Text.
+            if backward:
+                if shard.start <= origin[0]:
+                    return (False, (-min(shard.stop - 1, origin[0]),))
+                return (True, (-(shard.stop - 1),))
+            if shard.stop - 1 >= origin[0]:
+                return (False, (max(shard.start, origin[0]),))
+            return (True, (shard.start,))
+
+        tail_start = self._shards[-1].stop if len(self._shards) > 0 else first
+        tail = ScrollbackShard(self.text_list, max(tail_start, first), stop)
+        shards = sorted(self._shards + [tail], key=best_rank)
+        futures = {
+            self.pool.submit(scan_shard, shard.name, shard.line_count, regex.pattern, regex.flags): shard
+            for shard in shards
+        }
+        pending = {asyncio.wrap_future(future): future for future in futures}
+        best: Optional[SearchMatch] = None
+        count = 0
+        try:
+            while len(pending) > 0:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    shard = futures[pending.pop(future)]
+                    for match in shard.matches(future.result()):
+                        if match.text_id < self.text_list.first_text_id:
+                            continue
+                        count += 1
+                        if best is None or rank(match) < rank(best):
+                            best = match
+                certain = best is not None and all(
+                    rank(best) < best_rank(futures[future]) for future in pending.values()
+                )
+                yield SearchProgress(
+                    best if certain or len(pending) == 0 else None, count, len(shards) - len(pending), len(shards)
+                )
+        finally:
+            # Cancelling the asyncio futures cancels the scans that have not started, and drops the results of the
+            # others unread.
+            for future in pending:
+                future.cancel()
+            # A worker may still be reading the tail.
+            tail_future = next(future for future, shard in futures.items() if shard is tail)
+            if tail_future.done():
+                tail.close()
+            else:
+                tail_future.add_done_callback(lambda future: tail.close())
+
+    def close(self):
+        """Stop the workers and free the shards"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        for shard in self._shards:
+            shard.close()
+        self._shards = []
+
+    def __repr__(self) -> str:
+        return f"ShardedSearch(workers={self.workers}, shards={len(self._shards)})"
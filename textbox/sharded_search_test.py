@@ -0,0 +1,54 @@
+import asyncio
+import random
+import re
+
+from textbox.scrollback_search import ScrollbackSearch, SearchMatch
+from textbox.scrollback_search_test import make_text_list
+from textbox.sharded_search import ScrollbackShard, ShardedSearch, scan_shard
+
+
+def test_shard_round_trip():
+    text_list = make_text_list(["zero", "ünï line\nmatch ünï", "", "last ünï"])
+    shard = ScrollbackShard(text_list, 1, 4)
+    try:
+        # An empty Text has no lines.
+        assert shard.line_count == 3
+        found = scan_shard(shard.name, shard.line_count, "ünï", 0)
+        assert list(shard.matches(found)) == [
+            SearchMatch(1, 0, 0, 3),
+            SearchMatch(1, 1, 6, 9),
+            SearchMatch(3, 0, 5, 8),
+        ]
+    finally:
+        shard.close()
+
+
+def test_finds_the_same_match_as_scrollback_search():
+    rng = random.Random(0)
+    # The lines are wider than the TextList, and the shards are sized by their logical lines.
+    texts = ["\n".join("".join(rng.choice("abcé ") for _ in range(30)) for _ in range(3)) for _ in range(200)]
+    text_list = make_text_list(texts)
+    search = ScrollbackSearch(text_list)
+    sharded = ShardedSearch(text_list, workers=2)
+    sharded.SHARD_LINES = 50
+
+    async def find(regex, origin, backward):
+        progress = [progress async for progress in sharded.find(regex, origin, backward)]
+        assert progress[-1].shards_done == progress[-1].shards
+        return progress[-1].match
+
+    try:
+        for pattern, origin, backward in [
+            ("é.b", None, False),
+            ("é.b", None, True),
+            ("a[bc]{3}", (100, 1, 3), False),
+            ("a[bc]{3}", (100, 1, 3), True),
+            ("c?é{2}", (199, 2, 20), False),
+            ("missing", None, False),
+        ]:
+            regex = re.compile(pattern)
+            assert asyncio.run(find(regex, origin, backward)) == search.find(regex, origin, backward)
+        # The Texts before the newest are kept in whole shards for the next search.
+        assert len(sharded._shards) == 600 // 50 - 1
+    finally:
+        sharded.close()
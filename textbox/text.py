@@ -1,12 +1,13 @@
-from typing import List, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from textbox.fenwick_tree import FenwickTree
 from textbox.text_line import TextLine
+from textbox.text_row import TextRow
 from textbox.box_types import Position
 from textbox.text_segment import TextSegment
 from textbox.segmented_text_line import SegmentedTextLine
 from textbox.color_code import ColorCode
 import logging
 
-
 logger = logging.getLogger()
 
 
@@ -18,8 +19,18 @@ class Text:
     operations on Text are treated as if it were a single block of text.
 
     Each TextLine represents blocks of text seperated by newlines.  Text is a collection of TextLines.
+
+    The number of wrapped rows each TextLine occupies at max_line_width is kept in a FenwickTree, so
+    cursor_position and line_count cost O(log n).  Edits update the entries of the lines they touch in place, and
+    adding or removing lines splices entries in or out, so an edit never recounts the lines it did not touch.
+    Changing max_line_width to a new width builds an index for it on the next query.
+
+    Indexes built for other widths are kept in a small cache and updated along with the text, so resizing back
+    and forth between widths does not rewrap the text each time.
     """
 
+    WRAP_CACHE_SIZE = 4
+
     def __init__(self, text: str = "", max_line_width: int = None):
         self._text_lines: List[TextLine] = []
         self._line_ptr = 0
@@ -27,6 +38,10 @@ class Text:
         self._max_line_width = max_line_width
         self._edit_mode = False
         self._default_color_pair = None
+        self._row_index: Optional[FenwickTree] = None
+        self._wrap_cache: Dict[int, FenwickTree] = {}
+        self._synced_line: Optional[TextLine] = None
+        self._synced_line_version = 0
 
         self.text = text
 
@@ -45,6 +60,7 @@ class Text:
         new_text.max_line_width = self.max_line_width
         for line in self._text_lines:
             new_text._text_lines.append(line.copy())
+        new_text._invalidate_row_index()
         new_text.to_end_of_text()
         return new_text
 
@@ -89,8 +105,76 @@ class Text:
 
     @max_line_width.setter
     def max_line_width(self, value: int):
+        if value == self._max_line_width:
+            return
+        if self._row_index is not None:
+            self._wrap_cache[self._max_line_width] = self._row_index
+            while len(self._wrap_cache) > self.WRAP_CACHE_SIZE:
+                del self._wrap_cache[next(iter(self._wrap_cache))]
+        self._row_index = self._wrap_cache.pop(value, None)
         self._max_line_width = value
 
+    def _invalidate_row_index(self):
+        """Mark the wrapped row index stale.  Call after replacing every line."""
+        self._row_index = None
+        self._wrap_cache.clear()
+
+    def _row_indexes(self) -> Iterator[Tuple[int, FenwickTree]]:
+        """Get the width and index of every row index that is kept up to date with the text"""
+        if self._row_index is not None:
+            yield self._max_line_width, self._row_index
+        yield from self._wrap_cache.items()
+
+    def _line_changed(self, lineno: int):
+        """Update the wrapped row count of a single line after it was edited."""
+        if 0 <= lineno < len(self._text_lines):
+            line = self._text_lines[lineno]
+            for width, index in self._row_indexes():
+                index.set(lineno, line.line_count(width))
+
+    def _lines_replaced(self, lineno: int, removed: int, added: int):
+        """Splice the row counts of the added lines starting at lineno into the indexes, in place of the removed
+        ones, after the lines were replaced in the text."""
+        lines = self._text_lines[lineno : lineno + added]
+        for width, index in self._row_indexes():
+            index.splice(lineno, lineno + removed, (line.line_count(width) for line in lines))
+
+    def _sync_current_line(self):
+        """Update the row count of the current line if it was edited directly through current_line.  Call before
+        adding or removing lines, which may move the current line."""
+        if self._line_ptr < len(self._text_lines):
+            current_line = self._text_lines[self._line_ptr]
+            if self._synced_line is not current_line or self._synced_line_version != current_line.version:
+                self._line_changed(self._line_ptr)
+            self._synced_line = current_line
+            self._synced_line_version = current_line.version
+
+    @property
+    def _rows(self) -> FenwickTree:
+        """Get the wrapped row count of every line, rebuilding the index if it is stale."""
+        if self._row_index is None:
+            self._row_index = FenwickTree(line.line_count(self._max_line_width) for line in self._text_lines)
+        self._sync_current_line()
+        return self._row_index
+
+    def row_to_line(self, row: int) -> Tuple[int, int]:
+        """Map a wrapped row of the text to the line that contains it.
+
+        Args:
+            row (int): The wrapped row number, relative to the start of the text
+
+        Returns:
+            Tuple[int, int]: The line number, and the row within that line
+        """
+        return self._rows.find(row)
+
+    def line_to_row(self, lineno: int, column: int = 0) -> int:
+        """Map a column of a line to the wrapped row that displays it, relative to the start of the text"""
+        rows = self._rows
+        if self._max_line_width is None:
+            return rows.prefix_sum(lineno)
+        return rows.prefix_sum(lineno) + max(min(column // self._max_line_width, rows[lineno] - 1), 0)
+
     @property
     def cursor_position(self) -> Position:
         """Get the cursor position of the text.
@@ -99,10 +183,7 @@ class Text:
         if self._max_line_width is None:
             return Position(self._line_ptr, self.column_ptr)
         else:
-            line_offset = 0
-            for idx in range(self._line_ptr):
-                line_offset += self._text_lines[idx].line_count(self._max_line_width)
-            offset_position = Position(line_offset, 0)
+            offset_position = Position(self._rows.prefix_sum(self._line_ptr), 0)
             line_position = self.current_line.cursor_position(self.column_ptr, self._max_line_width)
 
             return offset_position + line_position
@@ -133,6 +214,39 @@ class Text:
                 lines.append(next_line)
         return lines
 
+    def iter_rows(self, start_row: int = 0, stop_row: int = None) -> Iterator[TextRow]:
+        """Lazily yield the wrapped rows in [start_row, stop_row) as TextRow views.
+        Unlike lines, nothing is copied and only the requested rows are visited.
+
+        Args:
+            start_row (int, optional): The first wrapped row to yield. Defaults to 0.
+            stop_row (int, optional): The wrapped row to stop before. Defaults to the end of the text.
+
+        Yields:
+            TextRow: A view of each wrapped row
+        """
+        rows = self._rows
+        if stop_row is None or stop_row > rows.total:
+            stop_row = rows.total
+        if start_row >= stop_row:
+            return
+
+        lineno, line_row = rows.find(start_row)
+        row = start_row
+        while row < stop_row:
+            text_line = self._text_lines[lineno]
+            if self._max_line_width is None:
+                yield TextRow(text_line, 0, len(text_line))
+                row += 1
+            else:
+                while line_row < rows[lineno] and row < stop_row:
+                    start = line_row * self._max_line_width
+                    yield TextRow(text_line, start, min(start + self._max_line_width, len(text_line)))
+                    line_row += 1
+                    row += 1
+            lineno += 1
+            line_row = 0
+
     @property
     def text(self):
         """Get the text of the textbox.  This is the text as a string with wrapping."""
@@ -165,6 +279,7 @@ class Text:
                 "Text must be a string or a list of strings or a list of TextLines or a list of SegmentedTextLines or a list of TextSegments"
             )
         self._text_lines = text
+        self._invalidate_row_index()
         self.to_last_line()
         self.to_end_of_line()
 
@@ -200,37 +315,50 @@ class Text:
     def last_line_in_text(self):
         return len(self._text_lines) - 1
 
-    def increment_line_ptr(self):
-        if self._line_ptr >= self.last_line_in_text:
-            return
-        self._line_ptr += 1
-        if self.column_ptr >= len(self.current_line):
-            self.to_end_of_line()
-
-    def decrement_line_ptr(self):
-        if self._line_ptr <= 0:
-            return
-        self._line_ptr -= 1
-        if self.column_ptr >= len(self.current_line):
-            self.to_end_of_line()
-
-    def increment_column_ptr(self):
-        if self.column_ptr >= self.last_column_on_line:
+    def increment_line_ptr(self, count: int = 1):
+        # Step one line at a time, since the column is clamped to each shorter line on the way.
+        for _ in range(count):
             if self._line_ptr >= self.last_line_in_text:
                 return
             self._line_ptr += 1
-            self.to_start_of_line()
-        else:
-            self._column_ptr += 1
+            if self.column_ptr >= len(self.current_line):
+                self.to_end_of_line()
 
-    def decrement_column_ptr(self):
-        if self.column_ptr <= 0:
+    def decrement_line_ptr(self, count: int = 1):
+        for _ in range(count):
             if self._line_ptr <= 0:
                 return
             self._line_ptr -= 1
-            self.to_end_of_line()
-        else:
-            self._column_ptr = max(0, self._column_ptr - 1)
+            if self.column_ptr >= len(self.current_line):
+                self.to_end_of_line()
+
+    def increment_column_ptr(self, count: int = 1):
+        """Move the cursor count characters forward, wrapping onto the following lines"""
+        while count > 0:
+            if self.column_ptr >= self.last_column_on_line:
+                if self._line_ptr >= self.last_line_in_text:
+                    return
+                self._line_ptr += 1
+                self.to_start_of_line()
+                count -= 1
+            else:
+                step = min(count, self.last_column_on_line - self.column_ptr)
+                self._column_ptr += step
+                count -= step
+
+    def decrement_column_ptr(self, count: int = 1):
+        """Move the cursor count characters back, wrapping onto the preceding lines"""
+        while count > 0:
+            if self.column_ptr <= 0:
+                if self._line_ptr <= 0:
+                    return
+                self._line_ptr -= 1
+                self.to_end_of_line()
+                count -= 1
+            else:
+                step = min(count, self._column_ptr)
+                self._column_ptr -= step
+                count -= step
 
     def to_end_of_line(self):
         self._column_ptr = self.last_column_on_line
@@ -274,7 +402,9 @@ class Text:
         if len(self._text_lines) == 0:
             return
 
+        self._sync_current_line()
         self._text_lines.pop(self._line_ptr)
+        self._lines_replaced(self._line_ptr, 1, 0)
         if self._line_ptr > 0 and self._line_ptr >= len(self._text_lines):
             self.decrement_line_ptr()
         elif self.column_ptr > len(self.current_line):
@@ -285,6 +415,7 @@ class Text:
 
         # If we're at the beginning of a line, delete the line.
         if self.column_ptr == 0:
+            self._sync_current_line()
             # If we're at the beginning of the first line, do nothing.
             if self._line_ptr == 0:
                 return
@@ -295,6 +426,8 @@ class Text:
                 self.to_end_of_line()
                 self.current_line.insert(self.next_line.rich_text)
                 self._text_lines.pop(self._line_ptr + 1)
+                self._line_changed(self._line_ptr)
+                self._lines_replaced(self._line_ptr + 1, 1, 0)
                 # Correct positioning is end of preioous line + 1
                 # We get that for free in edit mode. Need to set manually otherwise.
                 if not self.edit_mode:
@@ -303,21 +436,26 @@ class Text:
             # Otherwise, delete the empty line.
             else:
                 self._text_lines.pop(self._line_ptr)
+                self._lines_replaced(self._line_ptr, 1, 0)
                 self._line_ptr -= 1
                 self.to_end_of_line()
 
         # Otherwise, delete the character before the cursor on the same line.
         else:
             self.current_line.backspace(self.column_ptr)
+            self._line_changed(self._line_ptr)
             self.decrement_column_ptr()
 
     @property
     def line_count(self):
-        return sum((line.line_count(self._max_line_width) for line in self._text_lines))
+        return self._rows.total
 
     def break_line(self):
+        self._sync_current_line()
         line_remainder = self.current_line.delete_to_end(self.column_ptr)
         self._text_lines.insert(self._line_ptr + 1, TextLine(line_remainder))
+        self._line_changed(self._line_ptr)
+        self._lines_replaced(self._line_ptr + 1, 0, 1)
         self._line_ptr += 1
         self.to_start_of_line()
 
@@ -336,35 +474,98 @@ class Text:
                 self.backspace()
         else:
             self.current_line.replace_character(ch, self.column_ptr)
+            self._line_changed(self._line_ptr)
             self.increment_column_ptr()
 
     def insert_newline(self):
+        self._sync_current_line()
         if self.column_ptr == 0:
             self._text_lines.insert(self._line_ptr, TextLine())
+            self._lines_replaced(self._line_ptr, 0, 1)
             self._line_ptr += 1
         elif self.column_ptr >= len(self.current_line):
             self._text_lines.insert(self._line_ptr + 1, TextLine())
+            self._lines_replaced(self._line_ptr + 1, 0, 1)
             self._line_ptr += 1
         else:
             self.break_line()
         self.to_start_of_line()
 
-    def insert(self, text: str):
-        if len(self._text_lines) == 0:
-            self._text_lines.append(TextLine())
-
+    def insert(self, text: Union[str, TextSegment]):
         if not self._edit_mode:
             raise RuntimeError("Cannot insert text when not in edit mode")
 
-        for ch in text:
-            if ch == "\n":
-                self.insert_newline()
-            else:
-                self.current_line.insert(ch, self.column_ptr)
-                self.increment_column_ptr()
+        self.insert_block(text)
+
+    def insert_block(self, text: Union[str, TextSegment]):
+        """Insert text at the cursor and move the cursor to the end of it.
+
+        The text is split on newlines once and each run is spliced into its line whole, so the cost depends on
+        the number of lines inserted rather than the number of characters.  Runs take the color pair of the
+        character before them, as typed text does, and TextSegments keep their own."""
+        if len(self._text_lines) == 0:
+            self._text_lines.append(TextLine())
+            self._lines_replaced(0, 0, 1)
+        if len(text) == 0:
+            return
+
+        runs = text.split("\n")
+        line = self.current_line
+        column = self.column_ptr
+        if len(runs) == 1:
+            line.insert(text, column)
+            self._line_changed(self._line_ptr)
+            self._column_ptr = column + len(text)
+        else:
+            last_line = TextLine(line.delete_to_end(column))
+            last_line.insert(runs[-1], 0)
+            line.insert(runs[0], column)
+            new_lines = [TextLine(run) for run in runs[1:-1]]
+            new_lines.append(last_line)
+            self._sync_current_line()
+            self._text_lines[self._line_ptr + 1 : self._line_ptr + 1] = new_lines
+            # Streamed output grows at the end, where splicing the new lines in only extends the row index.
+            self._line_changed(self._line_ptr)
+            self._lines_replaced(self._line_ptr + 1, 0, len(new_lines))
+            self._line_ptr += len(new_lines)
+            self._column_ptr = len(runs[-1])
+        self._column_ptr = min(self._column_ptr, self.last_column_on_line)
+
+    def append(self, text: Union[str, TextSegment]):
+        """Append text after the last character, and move the cursor to the end of it"""
+        self.to_last_line()
+        self._column_ptr = len(self.current_line)
+        self.insert_block(text)
+
+    def replace_range(self, start: Position, stop: Position, text: Union[str, TextSegment] = ""):
+        """Replace the text from start up to stop with text, and move the cursor to the end of it.
+
+        Positions are line and column indexes into the unwrapped lines, as used by goto()."""
+        if not (0 <= start.lineno <= stop.lineno < len(self._text_lines)):
+            raise IndexError(f"Cannot replace lines {start.lineno} to {stop.lineno} of {len(self._text_lines)}")
+        if start.lineno == stop.lineno and stop.colno < start.colno:
+            raise ValueError("Cannot replace a range that ends before it starts")
+
+        first_line = self._text_lines[start.lineno]
+        if start.lineno == stop.lineno:
+            first_line.delete(start.colno, stop.colno)
+            self._line_changed(start.lineno)
+        else:
+            last_line = self._text_lines[stop.lineno]
+            if stop.colno > len(last_line):
+                raise ValueError("Cannot replace past the end of a line")
+            self._sync_current_line()
+            first_line.delete_to_end(start.colno)
+            first_line.insert(last_line[stop.colno :])
+            del self._text_lines[start.lineno + 1 : stop.lineno + 1]
+            self._line_changed(start.lineno)
+            self._lines_replaced(start.lineno + 1, stop.lineno - start.lineno, 0)
+        self.goto(start)
+        self.insert_block(text)
 
     def erase(self):
         self._text_lines = []
+        self._invalidate_row_index()
         self.to_first_line()
         self.to_start_of_line()
 
@@ -1,10 +1,15 @@
-from typing import List, Union
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
 import curses
+import re
 
 from textbox.window import Window
+from textbox.compositor import Compositor
+from textbox.render_scheduler import RenderScheduler
 from textbox.box_types import BoundingBox, Position
 from textbox.text import Text
 from textbox.text_list import TextList
+from textbox.text_row import TextRow
 from textbox.text_segment import TextSegment
 
 import logging
@@ -13,6 +18,15 @@ logger = logging.getLogger()
 
 
 class TextBox:
+    """A box of wrapped, scrollable text drawn into its own curses window.
+
+    Drawing is damage tracked: the box remembers what it last painted on each row of its window and only
+    repaints rows whose content changed.  The window is erased and the border redrawn only when the chrome
+    is dirty, i.e. after a resize or the border being hidden."""
+
+    # Number of Texts rewrapped between yields to the event loop while reflowing in the background.
+    REFLOW_BUDGET = 2000
+
     def __init__(
         self,
         name: str,
@@ -21,7 +35,14 @@ class TextBox:
         color_pair: int = 0,
         top_to_bottom: bool = True,
         has_box: bool = False,
+        max_lines: Optional[int] = None,
+        max_bytes: Optional[int] = None,
     ):
+        """
+        Args:
+            max_lines (Optional[int]): The most lines of scrollback kept.  None keeps every line.
+            max_bytes (Optional[int]): The most bytes of scrollback kept.  None keeps every byte.
+        """
         self.name = name
         self._has_box = has_box
         self.top_to_bottom = top_to_bottom
@@ -31,22 +52,80 @@ class TextBox:
 
         self.color_pair = color_pair
 
-        self._text_list: TextList = TextList()
+        self._text_list: TextList = TextList(max_lines=max_lines, max_bytes=max_bytes)
+        self._text_list.on_evict = self._rows_evicted
         self._first_lineno_in_window = 0
         self._box_visible = False
         self._text_list.max_line_width = self.printable_width
+        self._reflow_task: Optional[asyncio.Task] = None
+        # Window row -> the (text, color_pair) runs painted on it.  Highlighted runs carry a third item, the
+        # attribute they are highlighted with.
+        self._painted_rows: Dict[int, Tuple[Tuple, ...]] = {}
+        # Window row - text row of the painted rows.  Used to scroll rows that only moved instead of repainting.
+        self._painted_row_offset: Optional[int] = None
+        self._chrome_dirty = True
+        # When set, refreshes are batched into frames by the compositor instead of going straight to the screen.
+        self.compositor: Optional[Compositor] = None
+        # When set, redraws after adding text are deferred to the scheduler's next frame.
+        self.scheduler: Optional[RenderScheduler] = None
+        self._deferred_with_cursor = False
+        # Whether redraws scroll the view to the cursor.  Cleared by scroll_to_row, e.g. to show a search match.
+        self.follows_cursor = True
+        # The matches of this pattern are drawn highlighted.
+        self.highlight: Optional[re.Pattern] = None
         self.verbose = False
 
     def resize(self, box: BoundingBox):
         total_line_count = self._text_list.line_count
+        pinned_to_end = self.last_viewable_lineno >= total_line_count
         if self.last_viewable_lineno <= total_line_count:
             value = self.last_viewable_lineno
         else:
             value = total_line_count
         self.window.resize(box, self.verbose)
-        self._text_list.max_line_width = self.printable_width
+        self.invalidate()
+        self.reflow()
+        if pinned_to_end:
+            value = self._text_list.line_count
         self.last_viewable_lineno = value
 
+    def reflow(self):
+        """Rewrap the text to printable_width.
+
+        When an event loop is running, only the rows around the end of the text are rewrapped right away;
+        the rest of the scrollback is rewrapped in the background so that resizing stays interactive.
+        """
+        if self._reflow_task is not None:
+            self._reflow_task.cancel()
+            self._reflow_task = None
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._text_list.max_line_width = self.printable_width
+            return
+
+        if self._text_list.begin_reflow(self.printable_width, fresh_rows=self.printable_height * 2):
+            self._reflow_task = asyncio.create_task(self._reflow_in_background())
+
+    async def _reflow_in_background(self):
+        while self._text_list.reflowing:
+            await asyncio.sleep(0)
+            total_line_count = self._text_list.line_count
+            pinned_to_end = self.last_viewable_lineno >= total_line_count
+            shift = self._text_list.reflow_step(self.REFLOW_BUDGET, anchor_row=self._first_lineno_in_window)
+            if pinned_to_end:
+                self.last_viewable_lineno = self._text_list.line_count
+            else:
+                self._first_lineno_in_window = max(self._first_lineno_in_window + shift, 0)
+        self._reflow_task = None
+        logger.debug("%s - reflow complete", self.name)
+        self.request_redraw()
+
+    @property
+    def text_list(self) -> TextList:
+        return self._text_list
+
     @property
     def attributes(self):
         return [curses.color_pair(self.color_pair)]
@@ -61,6 +140,8 @@ class TextBox:
         if value:
             self.window.add_box(verbose=self.verbose)
             self.refresh()
+        else:
+            self.invalidate()
 
     @property
     def column_ptr(self):
@@ -170,6 +251,31 @@ class TextBox:
             self.scroll_up(self.first_printable_lineno - position.lineno)
             position = Position(self.first_printable_lineno, position.colno)
 
+    def follow_cursor(self):
+        """Scroll the view, without drawing, so that the cursor is on a printable line"""
+        lineno = self._text_list.cursor_position.lineno + self.box_offset.lineno - self._first_lineno_in_window
+        if lineno > self.last_printable_lineno:
+            self._first_lineno_in_window += lineno - self.last_printable_lineno
+        elif lineno < self.first_printable_lineno:
+            self._first_lineno_in_window = max(
+                self._first_lineno_in_window - (self.first_printable_lineno - lineno), 0
+            )
+
+    def scroll_to_row(self, row: int):
+        """Scroll the view so that a wrapped row is in the middle of it, and keep it there until follows_cursor
+        is set again"""
+        first_lineno = min(row - self.printable_height // 2, self._text_list.line_count - self.printable_height)
+        self._first_lineno_in_window = max(first_lineno, 0)
+        self.follows_cursor = False
+        self.request_redraw()
+
+    def _rows_evicted(self, rows: int):
+        """Keep the view on the same text after rows were evicted from the top of the scrollback"""
+        self._first_lineno_in_window = max(self._first_lineno_in_window - rows, 0)
+        if self._painted_row_offset is not None:
+            # The painted rows show text that is now rows earlier, so they can still be scrolled into place.
+            self._painted_row_offset += rows
+
     def scroll_down(self, n_lines):
         self._first_lineno_in_window += n_lines
         if self.verbose:
@@ -187,48 +293,105 @@ class TextBox:
     def erase(self):
         self._text_list = []
         self.window.erase(verbose=self.verbose)
+        self.invalidate()
+
+    def invalidate(self):
+        """Mark the whole window dirty, so the next redraw erases it and repaints the chrome and every row."""
+        self._chrome_dirty = True
 
     def refresh(self):
-        self.window.refresh(verbose=self.verbose)
+        if self.compositor is not None:
+            self.compositor.mark_dirty(self.window)
+        else:
+            self.window.refresh(verbose=self.verbose)
 
     def update_cursor(self):
+        if self.scheduler is not None and self.scheduler.batching:
+            self._defer_redraw(with_cursor=True)
+            return
         self.window.move_cursor(self.cursor_position, verbose=self.verbose)
-        self.window.refresh(verbose=self.verbose)
+        self.refresh()
 
-    def redraw(self, with_cursor: bool = False):
-        self.window.erase(verbose=self.verbose)
-        self.adjust_screen_position()
-        if self._box_visible:
-            logger.debug("Drawing box")
-            self.window.add_box(verbose=self.verbose)
-        logger.debug("cleared")
+    def redraw(self, with_cursor: bool = False, follow_cursor: bool = True):
+        if self.scheduler is not None and self.scheduler.batching:
+            self._defer_redraw(with_cursor)
+            return
+        if follow_cursor and self.follows_cursor:
+            self.adjust_screen_position()
+        if self._chrome_dirty:
+            self.window.erase(verbose=self.verbose)
+            self._painted_rows = {}
+            if self._box_visible:
+                logger.debug("Drawing box")
+                self.window.add_box(verbose=self.verbose)
+            self._chrome_dirty = False
+            logger.debug("cleared")
         self.draw_texts()
         if with_cursor:
             self.window.move_cursor(self.cursor_position, verbose=self.verbose)
             logger.debug("Cursor moved to %s", self.cursor_position)
         logger.debug("Texts added")
+        # Boxes share their border rows with their neighbours, so the whole window is copied to the screen
+        # as before. Only the rows that differ from the physical screen are sent to the terminal.
+        self.window.touch(verbose=self.verbose)
         self.refresh()
         logger.debug("refreshed")
 
+    def request_redraw(self):
+        """Redraw in the scheduler's next frame, or right away if there is no scheduler.
+        The view follows the cursor as of the request, just as it would for an immediate redraw."""
+        if self.scheduler is None:
+            self.redraw()
+            return
+        if self.follows_cursor:
+            self.follow_cursor()
+        self.scheduler.request(self._redraw_in_place)
+
+    def _redraw_in_place(self):
+        self.redraw(follow_cursor=False)
+
+    def _defer_redraw(self, with_cursor: bool):
+        """Redraw once when the scheduler's batch ends, however many redraws were asked for during it"""
+        self._deferred_with_cursor = self._deferred_with_cursor or with_cursor
+        self.scheduler.request(self._redraw_deferred)
+
+    def _redraw_deferred(self):
+        with_cursor = self._deferred_with_cursor
+        self._deferred_with_cursor = False
+        self.redraw(with_cursor=with_cursor)
+
     def hline(self, position: Position):
         self.window.hline(position, verbose=self.verbose)
 
     def print_text(self, text: str):
         self.add_text(text)
-        self.redraw()
+        self.request_redraw()
 
     def add_text(self, text: Text):
         text.max_line_width = self.printable_width
         self._text_list.add_text(text)
-        self.redraw()
+        self.request_redraw()
 
     def add_str(self, text: str):
         self._text_list.insert(text)
-        self.redraw()
+        self.request_redraw()
+
+    def open_text(self) -> int:
+        """Open a Text to stream into with append_to.  Later output is added below it."""
+        return self._text_list.open_text()
+
+    def append_to(self, text_id: int, text: Union[str, TextSegment]):
+        """Append text to the end of an open Text, e.g. the next token of a streamed reply.
+        Only the rows that changed are painted, in the scheduler's next frame."""
+        self._text_list.append_to(text_id, text)
+        self.request_redraw()
+
+    def close_text(self, text_id: int, resume: bool = False):
+        self._text_list.close_text(text_id, resume)
 
     def add_segmented_text_line(self, text: Text):
         self._text_list.add_segmented_text_line(text)
-        self.redraw()
+        self.request_redraw()
 
     # def add_text_segments(self, text: List[TextSegment]):
     #     self._text_list.add_text_segments(text)
@@ -242,45 +405,129 @@ class TextBox:
         self._text_list.current_text.insert(text)
         self._text_list.current_text.edit_mode = False
 
-    def draw_texts(self):
-        if self._text_list.line_count == 0:
-            return
+    @property
+    def printable_row_width(self):
+        """The number of columns between the borders, including the cursor buffer column"""
+        return self.last_printable_column - self.first_printable_column + 1
 
+    def draw_texts(self):
+        """Paint the visible rows, skipping every row whose content is unchanged since it was last painted."""
         if self.verbose:
             logger.info("Drawing texts on lines: %s - %s", self.first_viewable_lineno, self.last_viewable_lineno)
-        visible_lines = self._text_list[self.first_viewable_lineno : self.last_viewable_lineno]
+        # A one row box without a border has no printable height, but it still shows its single row.
+        last_viewable_lineno = max(self.last_viewable_lineno, self.first_viewable_lineno + 1)
+        visible_lines = list(self._text_list.iter_rows(self.first_viewable_lineno, last_viewable_lineno))
         logger.debug("visible_lines: %s", visible_lines)
         if not self.top_to_bottom:
             logger.debug("reversed printable set")
             visible_lines.reverse()
 
+        frame = {}
+        row_offset = None
+        highlights = {}
         for idx, line in enumerate(visible_lines):
-            columnno = self.first_printable_column
             local_lineno = idx + self.first_printable_lineno
             if not self.top_to_bottom:
                 local_lineno = self.printable_height - local_lineno + (1 if self._has_box else 0)
-
-            position = Position(local_lineno, columnno)
-            logger.info(
-                "%s - draw line %s %s: %s/%s (%s%s) at Coord(%s): %s/%s char w/ box=%s",
-                self.name,
-                idx,
-                "top to bottom" if self.top_to_bottom else "bottom to top",
-                local_lineno,
-                self.printable_height,
-                line[:5],
-                "..." if len(line) > 5 else "",
-                position,
-                len(line),
-                self.printable_width,
-                self._has_box,
-            )
+            if self.highlight is None:
+                frame[local_lineno] = tuple((str(text_segment), text_segment.color_pair) for text_segment in line)
+            else:
+                frame[local_lineno] = self._highlighted_runs(line, highlights)
+            if row_offset is None:
+                row_offset = local_lineno - self.first_viewable_lineno
+                if not self.top_to_bottom:
+                    row_offset -= len(visible_lines) - 1
+
+        if self._painted_rows and row_offset is not None and self._painted_row_offset is not None:
+            self.scroll_painted_rows(self._painted_row_offset - row_offset, frame)
+        self._painted_row_offset = row_offset
+
+        for local_lineno in self._painted_rows.keys() - frame.keys():
+            self.paint_row(local_lineno, ())
+        for local_lineno, runs in frame.items():
+            if self._painted_rows.get(local_lineno) != runs:
+                self.paint_row(local_lineno, runs)
+        self._painted_rows = frame
+
+    def _highlighted_runs(self, row: TextRow, highlights: Dict[int, List[Tuple[int, int]]]) -> Tuple[Tuple, ...]:
+        """Split the runs of a row where the matches of highlight start and stop.
+
+        Args:
+            highlights (Dict[int, List[Tuple[int, int]]]): The (start, stop) columns of the matches in each line
+                drawn so far, by the id of the line.  Lines that wrap over several rows are only matched once.
+        """
+        spans = highlights.get(id(row.line))
+        if spans is None:
+            spans = [match.span() for match in self.highlight.finditer(str(row.line)) if match.end() > match.start()]
+            highlights[id(row.line)] = spans
+        spans = [
+            (max(start, row.start), min(stop, row.stop))
+            for start, stop in spans
+            if start < row.stop and stop > row.start
+        ]
+        runs = []
+        column = row.start
+        for text_segment in row:
+            text = str(text_segment)
             offset = 0
-            for idx, text_segment in enumerate(line):
-                if text_segment.color_pair is None:
-                    attributes = self.attributes
-                else:
-                    attributes = [curses.color_pair(text_segment.color_pair)]
-                position = Position(local_lineno, columnno + offset)
-                self.window.addstr(str(text_segment), position, attributes=attributes, verbose=self.verbose)
-                offset += len(text_segment)
+            for start, stop in spans:
+                start = max(start - column, offset)
+                stop = min(stop - column, len(text))
+                if start >= stop:
+                    continue
+                if start > offset:
+                    runs.append((text[offset:start], text_segment.color_pair))
+                runs.append((text[start:stop], text_segment.color_pair, curses.A_REVERSE))
+                offset = stop
+            if offset < len(text):
+                runs.append((text[offset:], text_segment.color_pair))
+            column += len(text)
+        return tuple(runs)
+
+    def scroll_painted_rows(self, shift: int, frame: Dict[int, Tuple[Tuple, ...]]):
+        """Scroll the text rows of the window up by shift rows (down if negative) when more rows of frame are
+        already painted at their shifted position than in place.  The terminal scrolls those rows, so only the
+        rows scrolled in are painted."""
+        top = 1 if self._has_box else 0
+        bottom = self.height - 2 if self._has_box else self.height - 1
+        if shift == 0 or abs(shift) > bottom - top:
+            return
+        moved = sum(1 for local_lineno, runs in frame.items() if self._painted_rows.get(local_lineno + shift) == runs)
+        in_place = sum(1 for local_lineno, runs in frame.items() if self._painted_rows.get(local_lineno) == runs)
+        if moved <= in_place:
+            return
+        if self.verbose:
+            logger.info("%s - scroll %s rows, %s rows reused", self.name, shift, moved)
+        self.window.scroll(shift, top, bottom, verbose=self.verbose)
+        self._painted_rows = {
+            local_lineno - shift: runs
+            for local_lineno, runs in self._painted_rows.items()
+            if top <= local_lineno - shift <= bottom
+        }
+
+    def paint_row(self, local_lineno: int, runs: Tuple[Tuple, ...]):
+        """Paint a row of the window with the given (text, color_pair) runs, blanking the rest of the row.
+        A run may have a third item, an attribute such as curses.A_REVERSE to draw it with."""
+        columnno = self.first_printable_column
+        logger.info(
+            "%s - paint line %s/%s (%s runs) w/ box=%s",
+            self.name,
+            local_lineno,
+            self.printable_height,
+            len(runs),
+            self._has_box,
+        )
+        offset = 0
+        for text, color_pair, *highlight in runs:
+            if color_pair is None:
+                attributes = self.attributes
+            else:
+                attributes = [curses.color_pair(color_pair)]
+            if highlight:
+                attributes = [attributes[0] | highlight[0]]
+            position = Position(local_lineno, columnno + offset)
+            self.window.addstr(text, position, attributes=attributes, verbose=self.verbose)
+            offset += len(text)
+        if offset < self.printable_row_width:
+            position = Position(local_lineno, columnno + offset)
+            self.window.addstr(" " * (self.printable_row_width - offset), position, verbose=self.verbose)
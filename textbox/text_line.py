@@ -2,6 +2,7 @@ from typing import Union, Optional, List
 from textbox.box_types import Position
 from textbox.text_segment import TextSegment
 from textbox.segmented_text_line import SegmentedTextLine
+from textbox.text_rope import TextRope
 from textbox.color_code import ColorCode
 
 
@@ -12,7 +13,10 @@ class TextLine:
     TextLine may represent multiple lines of text if viewed with a max width. However, all
     operations on TextLine are treated as if it were a single line of text.
 
-    Textline is guaranteed to not contain newlines."""
+    Textline is guaranteed to not contain newlines.
+
+    The characters are stored in a TextRope, so edits at any column cost O(log n) in the length of the line.
+    The SegmentedTextLine and str views are built on demand and cached until the next edit."""
 
     def __init__(
         self,
@@ -20,7 +24,10 @@ class TextLine:
         default_color_pair: int = ColorCode.DEFAULT,
     ):
         """A single line of text, as in there are no newlines in the text."""
-        self._text: SegmentedTextLine = None
+        self._rope: TextRope = TextRope()
+        self._rich_text: Optional[SegmentedTextLine] = None
+        self._str: Optional[str] = None
+        self.version = 0
         self.text = text
         self.default_color_pair = default_color_pair
 
@@ -67,7 +74,7 @@ class TextLine:
 
     def copy(self):
         """Get a copy of the TextLine"""
-        return TextLine(self._text.copy())
+        return TextLine(self.rich_text.copy())
 
     def cursor_position(self, column_ptr: int, width: int = None):
         """Get the cursor position of column_ptr in the TextLine with width
@@ -94,21 +101,26 @@ class TextLine:
         """Get the number of lines this TextLine would take up if printed with width"""
         if width is None:
             return 1
-        if len(self.text) == 0:
+        length = len(self._rope)
+        if length == 0:
             return 1
-        if len(self.text) % width == 0:
-            return len(self.text) // width
-        return len(self.text) // width + 1
+        if length % width == 0:
+            return length // width
+        return length // width + 1
 
     @property
     def rich_text(self) -> SegmentedTextLine:
         """Get the rich text of the TextLine"""
-        return self._text
+        if self._rich_text is None:
+            self._rich_text = SegmentedTextLine(list(self._rope.segments()))
+        return self._rich_text
 
     @property
     def text(self) -> str:
         """Get the text of the TextLine"""
-        return str(self._text)
+        if self._str is None:
+            self._str = str(self._rope)
+        return self._str
 
     @text.setter
     def text(self, value: Union[str, TextSegment, List[TextSegment], SegmentedTextLine]):
@@ -117,24 +129,45 @@ class TextLine:
             raise ValueError("TextLine cannot contain newlines")
 
         if isinstance(value, str):
-            self._text = SegmentedTextLine(TextSegment(value))
+            rich_text = SegmentedTextLine(TextSegment(value))
         elif isinstance(value, list):
             if not all([isinstance(segment, TextSegment) for segment in value]):
                 raise ValueError(
                     "SegmentedTextLine must be initialized with a list of TextSegments, str, or SegmentedTextLine"
                 )
-            self._text = SegmentedTextLine(value)
+            rich_text = SegmentedTextLine(value)
         elif isinstance(value, TextSegment):
-            self._text = SegmentedTextLine(value)
+            rich_text = SegmentedTextLine(value)
         elif isinstance(value, SegmentedTextLine):
-            self._text = value
+            rich_text = value
         else:
             raise ValueError("TextLine must be initialized with a string or TextSegment")
 
+        self._rope = TextRope(rich_text)
+        self._rich_text = rich_text
+        self._str = None
+        self.version += 1
+
+    def _changed(self):
+        """Drop the cached views of the line after an edit"""
+        self._rich_text = None
+        self._str = None
+        self.version += 1
+
+    def _insertion_color_pair(self, column_ptr: int) -> int:
+        """Plain strings take on the color pair of the character before them."""
+        if column_ptr == 0:
+            return ColorCode.DEFAULT
+        return self._rope.color_at(column_ptr - 1)
+
+    def segments(self, start: int = 0, stop: int = None):
+        """Iterate over the TextSegments covering the columns [start, stop) without copying the line"""
+        return self._rope.segments(start, stop)
+
     def split_on_width(self, width: int):
         """Split the TextLine into TextLines of width"""
-        for idx in range(len(self.text) // width + 1):
-            sub_line = TextLine(self._text[idx * width : (idx + 1) * width])
+        for idx in range(len(self) // width + 1):
+            sub_line = TextLine(self[idx * width : (idx + 1) * width])
             if len(sub_line) > 0:
                 yield sub_line
 
@@ -147,32 +180,40 @@ class TextLine:
 
         if column_ptr < 0:
             raise ValueError("Cannot replace character before the beginning of a line")
-        if column_ptr > len(self._text):
+        if column_ptr > len(self._rope):
             raise ValueError("Cannot replace character past the end of a line")
 
-        if column_ptr == len(self._text):
-            self._text = self._text + ch
-        self._text = (
-            self._text[:column_ptr] + TextSegment(ch, self._text[column_ptr].color_pair) + self._text[column_ptr + 1 :]
-        )
+        if column_ptr == len(self._rope):
+            color_pair = self._insertion_color_pair(column_ptr)
+        else:
+            color_pair = self._rope.color_at(column_ptr)
+            self._rope.delete(column_ptr, column_ptr + 1)
+        self._rope.insert(column_ptr, ch, color_pair)
+        self._changed()
 
-    def delete_to_end(self, column_ptr: int) -> str:
+    def delete_to_end(self, column_ptr: int) -> SegmentedTextLine:
         """Delete from column_ptr to the end of the line, returning the deleted text"""
-        if column_ptr > len(self._text):
+        if column_ptr > len(self._rope):
             raise ValueError("Cannot delete past the end of a line")
 
-        remainder = self._text[column_ptr:]
-        self._text = self._text[:column_ptr]
+        remainder = self[column_ptr:]
+        self._rope.delete(column_ptr, len(self._rope))
+        self._changed()
         return remainder
 
-    def delete(self, column_ptr: int):
-        """Delete the character at column_ptr"""
+    def delete(self, column_ptr: int, stop: int = None):
+        """Delete the character at column_ptr, or the columns [column_ptr, stop) if stop is given"""
         if column_ptr < 0:
             raise ValueError("Cannot delete before the beginning of a line")
-        if column_ptr > len(self._text):
+        if column_ptr > len(self._rope) or (stop is not None and stop > len(self._rope)):
             raise ValueError("Cannot delete past the end of a line")
+        if stop is None:
+            stop = column_ptr + 1
+        elif stop < column_ptr:
+            raise ValueError("Cannot delete a range that ends before it starts")
 
-        self._text = self._text[:column_ptr] + self._text[column_ptr + 1 :]
+        self._rope.delete(column_ptr, stop)
+        self._changed()
 
     def insert(self, other: Union[str, TextSegment, SegmentedTextLine], cursor_ptr: int = None):
         """Insert other at cursor_ptr"""
@@ -180,40 +221,60 @@ class TextLine:
             raise ValueError("TextLine cannot contain newlines")
 
         if cursor_ptr is None:
-            cursor_ptr = len(self._text)
+            cursor_ptr = len(self._rope)
 
         if cursor_ptr < 0:
             raise ValueError("Cannot insert before the beginning of a line")
-        if cursor_ptr > len(self._text):
+        if cursor_ptr > len(self._rope):
             raise ValueError("Cannot insert past the end of a line")
 
-        if cursor_ptr == len(self._text):
-            self._text = self._text + other
+        if isinstance(other, str):
+            self._rope.insert(cursor_ptr, other, self._insertion_color_pair(cursor_ptr))
+        elif isinstance(other, TextSegment):
+            self._rope.insert(cursor_ptr, str(other), other.color_pair)
+        elif isinstance(other, SegmentedTextLine):
+            for segment in other:
+                self._rope.insert(cursor_ptr, str(segment), segment.color_pair)
+                cursor_ptr += len(segment)
         else:
-            self._text = self._text[:cursor_ptr] + other + self._text[cursor_ptr:]
+            raise ValueError(f"Cannot insert {type(other)} into TextLine")
+        self._changed()
 
     def backspace(self, column_ptr: int = None):
         """Delete the character before column_ptr"""
-        if len(self._text) == 0:
+        if len(self._rope) == 0:
             raise ValueError("Cannot backspace an empty line")
 
         if column_ptr is None:
-            column_ptr = len(self._text)
+            column_ptr = len(self._rope)
 
         if column_ptr == 0:
             raise ValueError("Cannot backspace at the beginning of a line")
 
-        if column_ptr > len(self._text):
+        if column_ptr > len(self._rope):
             raise ValueError("Cannot backspace past the end of a line")
 
-        self._text = self._text[: column_ptr - 1] + self._text[column_ptr:]
+        self._rope.delete(column_ptr - 1, column_ptr)
+        self._changed()
 
-    def __getitem__(self, item: Union[int, slice]):
+    def __getitem__(self, item: Union[int, slice]) -> Union[TextSegment, SegmentedTextLine]:
         """Get the character at item"""
-        return self._text[item]
+        if isinstance(item, int):
+            if item < 0:
+                item = len(self._rope) + item
+            if not 0 <= item < len(self._rope):
+                raise IndexError(f"{str(self)} does not contain index: {item}")
+            return TextSegment(*self._rope.char_at(item))
+        elif isinstance(item, slice):
+            if item.step is not None and item.step != 1:
+                raise IndexError("TextLine does not support slicing with a step at this time")
+            start, stop, _ = item.indices(len(self._rope))
+            return SegmentedTextLine(list(self._rope.segments(start, stop)))
+        else:
+            raise IndexError(f"TextLine does not support indexing with {type(item)}")
 
     def __len__(self) -> int:
-        return len(self.text)
+        return len(self._rope)
 
     def __hash__(self) -> int:
         return hash(self.text)
@@ -233,4 +294,4 @@ class TextLine:
         return False
 
     def __iter__(self):
-        return iter(self._text)
+        return self._rope.segments()
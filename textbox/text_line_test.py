@@ -1,5 +1,7 @@
 import pytest
 from textbox.text_line import TextLine
+from textbox.text_segment import TextSegment
+from textbox.segmented_text_line import SegmentedTextLine
 
 
 def test_text_line_init():
@@ -160,3 +162,21 @@ def test_start_of_previous_word():
         assert test.start_of_previous_word(idx) == 0
     for idx in range(7, len(test)):
         assert test.start_of_previous_word(idx) == 6
+
+
+def test_insert_keeps_color_runs():
+    text_line = TextLine([TextSegment("hello", 1), TextSegment(" world", 2)])
+    text_line.insert("X", 3)
+    assert text_line.rich_text == SegmentedTextLine([TextSegment("helXlo", 1), TextSegment(" world", 2)])
+    text_line.insert(TextSegment("!", 3))
+    assert text_line.rich_text == SegmentedTextLine(
+        [TextSegment("helXlo", 1), TextSegment(" world", 2), TextSegment("!", 3)]
+    )
+    text_line.replace_character("Y", 6)
+    assert text_line.rich_text == SegmentedTextLine(
+        [TextSegment("helXlo", 1), TextSegment("Yworld", 2), TextSegment("!", 3)]
+    )
+    text_line.backspace(7)
+    assert str(text_line) == "helXloworld!"
+    assert text_line[6] == TextSegment("w", 2)
+    assert text_line[5:7] == SegmentedTextLine([TextSegment("o", 1), TextSegment("w", 2)])
@@ -1,17 +1,68 @@
-from typing import List, Union
+from typing import Callable, Iterator, List, Optional, Set, Tuple, Union
+from textbox.fenwick_tree import FenwickTree
+from textbox.ring_buffer import RingBuffer
 from textbox.text import Text
 from textbox.box_types import LineSpan, Position
 from textbox.text_line import TextLine
+from textbox.text_row import TextRow
+from textbox.text_segment import TextSegment
 
 
 class TextList:
-    def __init__(self, max_line_width: int = None):
-        self._texts: List[Text] = []
+    """An ordered collection of Texts, addressed by wrapped row number.
+
+    The wrapped row count of each Text is kept in a FenwickTree so that mapping a row to its Text, and
+    line_count and cursor_position, cost O(log T) rather than a scan over every Text.  Texts that are added
+    or edited through the TextList update their entry in place; changing max_line_width rebuilds the index.
+
+    begin_reflow changes the width lazily instead: only the newest Texts covering the viewport are rewrapped
+    up front, and the rest keep their old row counts until reflow_step gets to them.  Texts are rewrapped
+    newest first, and any Text that is drawn or edited before then is rewrapped on demand.
+
+    With max_lines or max_bytes set, the oldest Texts are evicted when a new Text is added and the older ones
+    hold more than that, so the memory of a long session stays flat.  A Text is measured once, when a newer
+    Text is added after it.  The newest Text is never evicted, so it may hold more on its own.
+
+    open_text keeps a Text open for append_to, e.g. a streamed reply that other output is added after while it
+    grows.  An open Text is treated like the newest one until close_text: it is neither measured nor evicted, and
+    first_open_text_id tells readers such as the scrollback index that it may still grow.
+    """
+
+    def __init__(self, max_line_width: int = None, max_lines: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            max_line_width (int): The width the Texts are wrapped at
+            max_lines (Optional[int]): The most lines kept in the Texts before the newest.  None does not bound them.
+            max_bytes (Optional[int]): The most UTF-8 bytes kept in the Texts before the newest.  None does not
+                bound them.
+        """
+        self._texts: RingBuffer[Text] = RingBuffer()
         self._text_ptr = 0
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        # The (lines, bytes) of every Text but the newest, and their totals.
+        self._sizes: RingBuffer[Tuple[int, int]] = RingBuffer()
+        self._line_total = 0
+        self._byte_total = 0
+        # The number of Texts evicted so far.
+        self._evicted_texts = 0
+        # The ids of the Texts opened with open_text and not closed yet.
+        self._open_text_ids: Set[int] = set()
+        # Called with the number of wrapped rows evicted from the top, so views can move up with the text.
+        self.on_evict: Callable[[int], None] = lambda rows: None
+        # Called after a Text is added, e.g. to index the Text before it, which can no longer grow.
+        self.on_add: Callable[[], None] = lambda: None
         self._max_line_width = max_line_width
+        self._row_index: Optional[FenwickTree] = None
+        # Texts [0, _reflow_stop) may still be wrapped at an older width, except those in _reflowed_early.
+        self._reflow_stop = 0
+        self._reflowed_early: Set[int] = set()
 
     def set_first_text(self, text: Text):
+        # The text may come from elsewhere, e.g. a history file, wrapped at another width or not at all.
+        text.max_line_width = self._max_line_width
         self._texts[0] = text
+        self._text_changed(0)
 
     @property
     def max_line_width(self):
@@ -22,24 +73,207 @@ class TextList:
         self._max_line_width = value
         for text in self._texts:
             text.max_line_width = value
+        self._reflow_stop = 0
+        self._reflowed_early.clear()
+        self._invalidate_row_index()
+
+    @property
+    def reflowing(self) -> bool:
+        """Whether some Texts are still wrapped at an older max_line_width"""
+        return self._reflow_stop > 0
+
+    def begin_reflow(self, max_line_width: int, fresh_rows: int) -> bool:
+        """Change max_line_width, rewrapping only the newest Texts that cover fresh_rows rows.
+        The remaining Texts are rewrapped by reflow_step.
+
+        Returns:
+            bool: Whether Texts remain to be rewrapped
+        """
+        rows = self._rows
+        self._max_line_width = max_line_width
+        self._reflow_stop = len(self._texts)
+        self._reflowed_early.clear()
+        covered_rows = 0
+        while self._reflow_stop > 0 and covered_rows < fresh_rows:
+            self._reflow_stop -= 1
+            self._reflow_text(self._reflow_stop)
+            covered_rows += rows[self._reflow_stop]
+        self._ensure_reflowed(self._text_ptr)
+        return self.reflowing
+
+    def reflow_step(self, budget: int = 1000, anchor_row: int = 0) -> int:
+        """Rewrap up to budget of the Texts still at an older width, newest first.
+
+        Args:
+            budget (int, optional): The maximum number of Texts to rewrap. Defaults to 1000.
+            anchor_row (int, optional): A row to keep track of, such as the first row in view. Defaults to 0.
+
+        Returns:
+            int: How many rows anchor_row moved by, as Texts before it were rewrapped
+        """
+        rows = self._rows
+        shift = 0
+        while self._reflow_stop > 0 and budget > 0:
+            self._reflow_stop -= 1
+            text_idx = self._reflow_stop
+            if text_idx in self._reflowed_early:
+                self._reflowed_early.discard(text_idx)
+                continue
+            old_row_count = rows[text_idx]
+            text_before_anchor = rows.prefix_sum(text_idx) + old_row_count <= anchor_row + shift
+            self._reflow_text(text_idx)
+            if text_before_anchor:
+                shift += rows[text_idx] - old_row_count
+            budget -= 1
+        return shift
+
+    def _reflow_text(self, text_idx: int):
+        self._texts[text_idx].max_line_width = self._max_line_width
+        if self._row_index is not None:
+            self._row_index.set(text_idx, self._texts[text_idx].line_count)
+
+    def _ensure_reflowed(self, text_idx: int) -> bool:
+        """Rewrap a Text now if it is still at an older width.
+
+        Returns:
+            bool: Whether the Text had to be rewrapped
+        """
+        if text_idx >= self._reflow_stop or text_idx in self._reflowed_early:
+            return False
+        self._reflowed_early.add(text_idx)
+        self._reflow_text(text_idx)
+        return True
+
+    def _invalidate_row_index(self):
+        self._row_index = None
+
+    def _text_changed(self, text_idx: int):
+        """Update the wrapped row count of a single Text after it was edited."""
+        if self._row_index is not None and 0 <= text_idx < len(self._texts):
+            self._row_index.set(text_idx, self._texts[text_idx].line_count)
+
+    def _text_appended(self):
+        if self._row_index is not None:
+            self._row_index.append(self._texts[-1].line_count)
+        if self.max_lines is not None or self.max_bytes is not None:
+            self._measure_texts()
+            self._evict()
+        self.on_add()
+
+    def _measure_texts(self):
+        """Measure the Texts that a newer Text was added after and that are not open"""
+        while len(self._sizes) < self.first_open_text_id - self.first_text_id:
+            lines = [str(line) for line in self._texts[len(self._sizes)]]
+            size = sum(len(line.encode("utf-8")) + 1 for line in lines)
+            self._sizes.append((len(lines), size))
+            self._line_total += len(lines)
+            self._byte_total += size
+
+    def _over_limit(self) -> bool:
+        if self.max_lines is not None and self._line_total > self.max_lines:
+            return True
+        return self.max_bytes is not None and self._byte_total > self.max_bytes
+
+    def _evict(self):
+        """Drop the oldest Texts until the Texts before the newest fit in max_lines and max_bytes"""
+        evicted_rows = 0
+        while len(self._sizes) > 0 and self._over_limit():
+            lines, size = self._sizes.popleft()
+            self._line_total -= lines
+            self._byte_total -= size
+            text = self._texts.popleft()
+            self._evicted_texts += 1
+            if self._row_index is not None:
+                evicted_rows += self._row_index.popleft()
+            else:
+                evicted_rows += text.line_count
+            self._text_ptr = max(self._text_ptr - 1, 0)
+            self._reflow_stop = max(self._reflow_stop - 1, 0)
+            self._reflowed_early = {idx - 1 for idx in self._reflowed_early if idx > 0}
+        if evicted_rows > 0:
+            self.on_evict(evicted_rows)
+
+    @property
+    def _rows(self) -> FenwickTree:
+        """Get the wrapped row count of every Text, rebuilding the index if it is stale."""
+        if self._row_index is None:
+            self._row_index = FenwickTree(text.line_count for text in self._texts)
+        elif not self._ensure_reflowed(self._text_ptr):
+            # The current text is the one edited in place by the boxes.
+            self._text_changed(self._text_ptr)
+        return self._row_index
 
     @property
     def line_count(self):
-        return sum([text.line_count for text in self._texts])
+        return self._rows.total
 
     @property
-    def texts(self):
+    def texts(self) -> RingBuffer[Text]:
         return self._texts
 
+    @property
+    def first_text_id(self) -> int:
+        """The id of the oldest Text kept.  Texts are numbered in the order they were added, starting from 0, and a
+        Text's index in texts is its id minus first_text_id."""
+        return self._evicted_texts
+
+    @property
+    def first_open_text_id(self) -> int:
+        """The id of the oldest Text that may still grow: the oldest open Text, or else the newest Text"""
+        newest_id = self.first_text_id + len(self._texts) - 1
+        return min(self._open_text_ids, default=max(newest_id, self.first_text_id))
+
     @property
     def _text_line_spans(self):
-        accumulated_length = 0
+        rows = self._rows
         line_spans = []
-        for text in self._texts:
-            line_spans.append(LineSpan(accumulated_length, accumulated_length + text.line_count))
-            accumulated_length += text.line_count
+        for text_idx in range(len(rows)):
+            first_lineno = rows.prefix_sum(text_idx)
+            line_spans.append(LineSpan(first_lineno, first_lineno + rows[text_idx]))
         return line_spans
 
+    def locate(self, row: int) -> Tuple[int, int, int]:
+        """Map a wrapped row to the Text, line and sub-row that display it.
+
+        Returns:
+            Tuple[int, int, int]: The text index, the line number within the text, and the row within the line
+        """
+        text_idx, text_row = self._rows.find(row)
+        lineno, line_row = self._texts[text_idx].row_to_line(text_row)
+        return text_idx, lineno, line_row
+
+    def row_of(self, text_idx: int, lineno: int, column: int = 0) -> int:
+        """Map a column of a line of a Text to the wrapped row that displays it"""
+        self._ensure_reflowed(text_idx)
+        return self._rows.prefix_sum(text_idx) + self._texts[text_idx].line_to_row(lineno, column)
+
+    def iter_rows(self, start_row: int = 0, stop_row: int = None) -> Iterator[TextRow]:
+        """Lazily yield the wrapped rows in [start_row, stop_row) across every Text as TextRow views.
+        Only the Texts overlapping the requested rows are visited.
+        """
+        rows = self._rows
+        if stop_row is None or stop_row > rows.total:
+            stop_row = rows.total
+        if start_row >= stop_row:
+            return
+
+        # Texts still wrapped at an older width are rewrapped before they are drawn.
+        text_idx, text_row = rows.find(start_row)
+        while self._ensure_reflowed(text_idx):
+            stop_row = min(stop_row, rows.total)
+            if start_row >= stop_row:
+                return
+            text_idx, text_row = rows.find(start_row)
+
+        remaining = stop_row - start_row
+        while remaining > 0 and text_idx < len(self._texts):
+            self._ensure_reflowed(text_idx)
+            text_stop_row = min(rows[text_idx], text_row + remaining)
+            yield from self._texts[text_idx].iter_rows(text_row, text_stop_row)
+            remaining -= text_stop_row - text_row
+            text_idx += 1
+            text_row = 0
+
     @property
     def current_text(self) -> Text:
         if self._text_ptr > len(self._texts):
@@ -47,6 +281,7 @@ class TextList:
 
         if self._text_ptr == len(self._texts):
             self._texts.append(Text("", max_line_width=self._max_line_width))
+            self._text_appended()
         return self._texts[self._text_ptr]
 
     @property
@@ -54,8 +289,9 @@ class TextList:
         if len(self._texts) == 0:
             return Position(0, 0)
         else:
-            lines_before = sum([text.line_count for text in self._texts[: self._text_ptr]])
-            return self.current_text.cursor_position + Position(lines_before, 0)
+            current_text = self.current_text
+            lines_before = self._rows.prefix_sum(self._text_ptr)
+            return current_text.cursor_position + Position(lines_before, 0)
 
     def insert(self, text: str):
         prev_edit_mode = self.current_text.edit_mode
@@ -63,12 +299,58 @@ class TextList:
         self.current_text.increment_column_ptr()
         self.current_text.insert(text)
         self.current_text.edit_mode = prev_edit_mode
+        self._text_changed(self._text_ptr)
+
+    def append(self, text: Union[str, TextSegment]):
+        """Append text to the end of the current Text, whatever its cursor position"""
+        self.current_text.append(text)
+        self._text_changed(self._text_ptr)
+
+    def open_text(self) -> int:
+        """Keep the current Text open to append_to, and move past it so that later Texts are added after it.
+        The current Text is created if there is none, e.g. after a Text was ended.
+
+        Returns:
+            int: The id of the open Text
+        """
+        if self._text_ptr == len(self._texts):
+            self.add_text(Text("", max_line_width=self._max_line_width))
+        text_id = self.first_text_id + self._text_ptr
+        self._open_text_ids.add(text_id)
+        self._text_ptr += 1
+        return text_id
+
+    def append_to(self, text_id: int, text: Union[str, TextSegment]):
+        """Append text to the end of the Text with text_id, whichever Text is current.  Text appended to a Text
+        that was evicted is dropped."""
+        text_idx = text_id - self.first_text_id
+        if text_idx < 0:
+            return
+        self._texts[text_idx].append(text)
+        self._text_changed(text_idx)
+
+    def close_text(self, text_id: int, resume: bool = False):
+        """Mark a Text opened with open_text as done growing.
+
+        Args:
+            text_id (int): The id open_text returned
+            resume (bool): Make the Text current again, so the next output continues it, if no Text was added
+                after it.
+        """
+        self._open_text_ids.discard(text_id)
+        text_idx = text_id - self.first_text_id
+        if resume and text_idx == len(self._texts) - 1 and self._text_ptr == len(self._texts):
+            self._text_ptr = text_idx
+        if self.max_lines is not None or self.max_bytes is not None:
+            self._measure_texts()
+            self._evict()
 
     def add_text_line(self, text_line: TextLine):
         self.current_text.add_text_line(text_line)
 
     def add_text(self, text: Text):
         self._texts.append(text)
+        self._text_appended()
         self._text_ptr = len(self._texts) - 1
 
     def increment_text_ptr(self):
@@ -100,60 +382,33 @@ class TextList:
             return "" if return_single else []
 
         # Handle negative indices.
+        line_count = self.line_count
         if start < 0:
-            start = self.line_count + start
-
-        # Find the first text that contains the line number we're looking for.
-        first_text_in_slice = None
-        text_line_spans: List[LineSpan] = self._text_line_spans
-        for text_idx, span in enumerate(text_line_spans):
-            if start in span:
-                if return_single:
-                    for sub_lineno, line in enumerate(self._texts[text_idx].lines):
-                        if sub_lineno + span.first_lineno == start:
-                            return str(line)
-                else:
-                    first_text_in_slice = text_idx
-                    break
-
-        # If we didn't find a text that contains the line number we're looking for, raise an error.
-        if first_text_in_slice is None:
+            start = line_count + start
+
+        # Find the text that contains the first line we're looking for.
+        try:
+            text_idx, text_row = self._rows.find(start)
+        except IndexError:
             raise IndexError(f"Line number {start} is out of range for TextList.")
 
+        if return_single:
+            return str(self._texts[text_idx].lines[text_row])
+
         # Gauranteed to be a slice if we get here.
-        # Determine the stop value for the slice.
-        step = lineaddr.step if lineaddr.step is not None else 1
-        stop = lineaddr.stop if lineaddr.stop is not None else self.line_count
+        stop = lineaddr.stop if lineaddr.stop is not None else line_count
         if stop < 0:
-            stop = self.line_count + stop
-
-        # Determine the direction we're iterating through the texts.
-        text_step = 1
-        if step < 0:
-            text_step = -1
-
-        # Find the last text that contains the line number we're looking for.
-        last_text_in_span = first_text_in_slice
-        for idx, span in enumerate(text_line_spans[first_text_in_slice::text_step], start=first_text_in_slice):
-            last_text_in_span = idx
-            if stop in span:
-                break
+            stop = line_count + stop
 
-        # Get the lines from the texts.
+        # Only the texts overlapping [start, stop) are rendered into lines.
         result = []
-        global_lineno = text_line_spans[first_text_in_slice].first_lineno  # start
-        for text_idx, text in enumerate(
-            self._texts[first_text_in_slice : last_text_in_span + text_step : text_step], start=first_text_in_slice
-        ):
-            for _, line in enumerate(text.lines):
-                if global_lineno >= start:
-                    result.append(line)
-                global_lineno += step
-                if global_lineno >= stop:
-                    break
-
-            if global_lineno >= stop:
-                break
+        remaining = stop - start
+        while remaining > 0 and text_idx < len(self._texts):
+            lines = self._texts[text_idx].lines[text_row : text_row + remaining]
+            result += lines
+            remaining -= len(lines)
+            text_idx += 1
+            text_row = 0
 
         return result
 
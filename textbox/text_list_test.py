@@ -196,3 +196,225 @@ def test_insert(text_list: TextList):
     assert text_list.cursor_position == (1, 0)
     assert text_list[0] == "Hello World!"
     assert text_list.as_string == "Hello World!"
+
+
+def test_locate(text_list: TextList):
+    text_list.max_line_width = 3
+    text_list.add_text(Text("Hello\nab", max_line_width=3))
+    text_list.add_text(Text("", max_line_width=3))
+    text_list.add_text(Text("World!!", max_line_width=3))
+    assert text_list.line_count == 6
+    assert text_list.locate(0) == (0, 0, 0)
+    assert text_list.locate(1) == (0, 0, 1)
+    assert text_list.locate(2) == (0, 1, 0)
+    assert text_list.locate(3) == (2, 0, 0)
+    assert text_list.locate(5) == (2, 0, 2)
+    with pytest.raises(IndexError):
+        text_list.locate(6)
+
+
+def test_row_index_tracks_edits(text_list: TextList):
+    text_list.add_text(Text("Hello"))
+    text_list.add_text(Text("World"))
+    assert text_list.line_count == 2
+    text_list.current_text.edit_mode = True
+    text_list.current_text.to_end_of_line()
+    text_list.current_text.insert("\nfoo")
+    assert text_list.line_count == 3
+    assert text_list.cursor_position == (2, 3)
+    text_list.increment_text_ptr()
+    text_list.insert("bar")
+    assert text_list.line_count == 4
+    assert text_list[3] == "bar"
+    text_list.max_line_width = 2
+    assert text_list.line_count == 10
+    assert text_list[-1] == "r"
+
+
+def test_iter_rows(text_list: TextList):
+    text_list.max_line_width = 3
+    text_list.add_text(Text("Hello\n\nab", max_line_width=3))
+    text_list.add_text(Text("World!!", max_line_width=3))
+    rows = list(text_list.iter_rows())
+    assert [str(row) for row in rows] == ["Hel", "lo", "", "ab", "Wor", "ld!", "!"]
+    assert [str(row) for row in text_list.iter_rows(3, 6)] == ["ab", "Wor", "ld!"]
+    assert [str(row) for row in text_list.iter_rows(5, 100)] == ["ld!", "!"]
+    assert list(text_list.iter_rows(7, 10)) == []
+    assert [str(row) for row in text_list.iter_rows(0, 7)] == [str(line) for line in text_list[0:7]]
+    assert rows[4].line is text_list.texts[1].current_line
+    assert (rows[5].start, rows[5].stop) == (3, 6)
+
+
+def test_lazy_reflow(text_list: TextList):
+    text_list.max_line_width = 10
+    for word in ["aaaa", "bbbb", "cccc", "dddd"]:
+        text_list.add_text(Text(word, max_line_width=10))
+    assert text_list.line_count == 4
+
+    assert text_list.begin_reflow(2, fresh_rows=3)
+    assert text_list.reflowing
+    # The last two Texts cover the fresh rows and were rewrapped, the rest still count one row each.
+    assert text_list.line_count == 6
+    assert [str(row) for row in text_list.iter_rows(2, 6)] == ["cc", "cc", "dd", "dd"]
+
+    shift = text_list.reflow_step(budget=1, anchor_row=2)
+    assert shift == 1
+    assert text_list.line_count == 7
+    assert text_list.reflowing
+
+    text_list.reflow_step()
+    assert not text_list.reflowing
+    assert text_list.line_count == 8
+    assert [str(row) for row in text_list.iter_rows()] == ["aa", "aa", "bb", "bb", "cc", "cc", "dd", "dd"]
+
+
+def test_lazy_reflow_rewraps_drawn_texts(text_list: TextList):
+    for word in ["aaaa", "bbbb", "cccc", "dddd"]:
+        text_list.add_text(Text(word, max_line_width=10))
+    text_list.begin_reflow(2, fresh_rows=1)
+    assert [str(row) for row in text_list.iter_rows(0, 2)] == ["aa", "aa"]
+    text_list.reflow_step()
+    assert [str(row) for row in text_list.iter_rows()] == ["aa", "aa", "bb", "bb", "cc", "cc", "dd", "dd"]
+
+
+def test_append_streams_into_the_current_text():
+    text_list = TextList(max_line_width=4)
+    text_list.append("")
+    for token in ["Hel", "lo ", "wor", "ld\n", "ne", "xt"]:
+        text_list.append(token)
+    assert [str(line) for line in text_list.current_text._text_lines] == ["Hello world", "next"]
+    assert text_list.line_count == 4
+    assert text_list.cursor_position == (3, 3)
+
+    text_list.increment_text_ptr()
+    text_list.append("more")
+    assert [str(text.current_line) for text in text_list.texts] == ["next", "more"]
+    assert text_list.line_count == 5
+
+
+def print_text(text_list: TextList, text: str):
+    # As App.print does.
+    text_list.insert(text)
+    text_list.increment_text_ptr()
+
+
+def unwrapped(text_list: TextList):
+    return ["\n".join(str(line) for line in text) for text in text_list.texts]
+
+
+def test_print_while_streaming_goes_below_the_reply():
+    text_list = TextList(max_line_width=10)
+    print_text(text_list, "before")
+    reply = text_list.open_text()
+    for token in ["The ", "quick"]:
+        text_list.append_to(reply, token)
+    print_text(text_list, "hi there")
+    for token in [" brown", "\nfox"]:
+        text_list.append_to(reply, token)
+    text_list.close_text(reply)
+    print_text(text_list, "after")
+    assert unwrapped(text_list) == ["before", "The quick brown\nfox", "hi there", "after"]
+    assert list(text_list._rows) == [text.line_count for text in text_list.texts] == [1, 3, 1, 1]
+    assert text_list.locate(4) == (2, 0, 0)
+
+
+def test_concurrent_streams_keep_their_own_texts():
+    text_list = TextList(max_line_width=10)
+    first = text_list.open_text()
+    second = text_list.open_text()
+    for first_token, second_token in zip(["The ", "quick ", "fox"], ["The ", "lazy ", "dog"]):
+        text_list.append_to(first, first_token)
+        text_list.append_to(second, second_token)
+    assert text_list.first_open_text_id == first
+    text_list.close_text(first)
+    assert text_list.first_open_text_id == second
+    text_list.close_text(second)
+    assert unwrapped(text_list) == ["The quick fox", "The lazy dog"]
+    assert text_list.line_count == 4
+
+
+def test_close_text_resumes_the_reply():
+    text_list = TextList(max_line_width=10)
+    reply = text_list.open_text()
+    text_list.append_to(reply, "no newline")
+    text_list.close_text(reply, resume=True)
+    text_list.insert(" after")
+    assert unwrapped(text_list) == ["no newline after"]
+
+    # The Text is still current, so the next stream continues it too.  Output below it is not continued.
+    reply = text_list.open_text()
+    print_text(text_list, "below")
+    text_list.append_to(reply, "!")
+    text_list.close_text(reply, resume=True)
+    print_text(text_list, "last")
+    assert unwrapped(text_list) == ["no newline after!", "below", "last"]
+
+
+def test_open_text_is_not_evicted():
+    text_list = TextList(max_line_width=10, max_lines=2)
+    reply = text_list.open_text()
+    text_list.append_to(reply, "reply")
+    for idx in range(5):
+        print_text(text_list, f"line {idx}")
+    assert str(text_list.texts[0]) == "reply"
+    text_list.append_to(reply, " grows")
+    text_list.close_text(reply)
+    # The Texts before the newest hold the 2 lines allowed.
+    assert unwrapped(text_list) == ["line 2", "line 3", "line 4"]
+    assert text_list.first_text_id == 3
+    # Appending to an evicted Text is dropped.
+    text_list.append_to(reply, "!")
+    assert text_list.line_count == 3
+
+
+def test_max_lines_evicts_oldest_texts():
+    evicted = []
+    text_list = TextList(max_line_width=10, max_lines=4)
+    text_list.on_evict = evicted.append
+    for idx in range(6):
+        text_list.add_text(Text(f"text {idx}\nline two"))
+    # The newest Text is not counted, and the two before it hold the 4 lines allowed.
+    assert [str(text) for text in text_list.texts] == [f"text {idx}\nline two" for idx in (3, 4, 5)]
+    assert evicted == [2, 2, 2]
+    assert text_list.line_count == 6
+    assert text_list[0] == "text 3"
+    assert text_list.locate(4) == (2, 0, 0)
+    assert text_list.first_text_id == 3
+    assert text_list.cursor_position.lineno == 4 + text_list.current_text.cursor_position.lineno
+
+
+def test_max_bytes_evicts_oldest_texts():
+    text_list = TextList(max_line_width=80, max_bytes=12)
+    text_list.insert("ééé")
+    text_list.increment_text_ptr()
+    text_list.insert("four")
+    text_list.increment_text_ptr()
+    text_list.insert("five!")
+    assert [str(text) for text in text_list.texts] == ["ééé", "four", "five!"]
+    text_list.increment_text_ptr()
+    text_list.insert("six")
+    # "ééé" is 7 bytes with its newline, and "four" and "five!" are 11.
+    assert [str(text) for text in text_list.texts] == ["four", "five!", "six"]
+    assert text_list._text_ptr == 2
+    assert text_list.line_count == 3
+
+
+def test_eviction_keeps_row_index_consistent():
+    text_list = TextList(max_line_width=5, max_lines=50)
+    for idx in range(200):
+        text_list.add_text(Text("x" * (idx % 12)))
+        assert text_list.line_count == sum(text.line_count for text in text_list.texts)
+    rows = [row for row in text_list.iter_rows()]
+    assert len(rows) == text_list.line_count
+
+
+def test_row_of():
+    text_list = TextList(max_line_width=4)
+    text_list.add_text(Text("one", max_line_width=4))
+    text_list.add_text(Text("abcdefghij\nxy", max_line_width=4))
+    assert text_list.row_of(0, 0) == 0
+    assert text_list.row_of(1, 0, 0) == 1
+    assert text_list.row_of(1, 0, 5) == 2
+    assert text_list.row_of(1, 0, 9) == 3
+    assert text_list.row_of(1, 1, 1) == 4
+    assert str(text_list[text_list.row_of(1, 0, 9)]) == "ij"
@@ -0,0 +1,223 @@
+import random
+from typing import Iterable, Iterator, Optional, Tuple
+
+from textbox.text_segment import TextSegment
+from textbox.color_code import ColorCode
+
+
+class _RopeNode:
+    """A single chunk of same-colored text in a TextRope.
+    `length` is the number of characters in the subtree rooted at this node."""
+
+    __slots__ = ("text", "color_pair", "priority", "left", "right", "length")
+
+    def __init__(self, text: str, color_pair: int, priority: float = None):
+        self.text = text
+        self.color_pair = color_pair
+        self.priority = random.random() if priority is None else priority
+        self.left: Optional["_RopeNode"] = None
+        self.right: Optional["_RopeNode"] = None
+        self.length = len(text)
+
+    def update(self):
+        self.length = len(self.text) + _length(self.left) + _length(self.right)
+
+
+def _length(node: Optional[_RopeNode]) -> int:
+    return 0 if node is None else node.length
+
+
+def _merge(left: Optional[_RopeNode], right: Optional[_RopeNode]) -> Optional[_RopeNode]:
+    """Concatenate two ropes.  Every character in left comes before every character in right."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _split(node: Optional[_RopeNode], index: int) -> Tuple[Optional[_RopeNode], Optional[_RopeNode]]:
+    """Split a rope into the first `index` characters and the remainder.
+    A chunk straddling the split point is cut in two."""
+    if node is None:
+        return None, None
+
+    left_length = _length(node.left)
+    if index <= left_length:
+        left, right = _split(node.left, index)
+        node.left = right
+        node.update()
+        return left, node
+
+    node_end = left_length + len(node.text)
+    if index >= node_end:
+        left, right = _split(node.right, index - node_end)
+        node.right = left
+        node.update()
+        return node, right
+
+    # The split point falls inside this chunk.  The tail keeps the chunk's priority so the
+    # heap order of the right subtree it inherits is preserved.
+    offset = index - left_length
+    tail = _RopeNode(node.text[offset:], node.color_pair, node.priority)
+    tail.right = node.right
+    tail.update()
+    node.text = node.text[:offset]
+    node.right = None
+    node.update()
+    return node, tail
+
+
+class TextRope:
+    """The storage engine behind TextLine.
+
+    Colored text is kept as an implicit treap of chunks ordered by character offset.  Each chunk holds at
+    most MAX_CHUNK characters of a single color pair, so inserting or deleting at any offset costs
+    O(log n + MAX_CHUNK) no matter how long the line is.  Adjacent chunks may share a color pair; they are
+    combined into a single TextSegment whenever segments are read back out."""
+
+    MAX_CHUNK = 256
+
+    def __init__(self, segments: Iterable[TextSegment] = None):
+        self._root: Optional[_RopeNode] = None
+        if segments is not None:
+            for segment in segments:
+                self.insert(len(self), str(segment), segment.color_pair)
+
+    def copy(self) -> "TextRope":
+        return TextRope(self.segments())
+
+    def color_at(self, index: int) -> int:
+        """Get the color pair of the character at index"""
+        return self.char_at(index)[1]
+
+    def char_at(self, index: int) -> Tuple[str, int]:
+        """Get the character at index and its color pair
+
+        Raises:
+            IndexError: If index is out of range
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"TextRope does not contain index: {index}")
+        node = self._root
+        while node is not None:
+            left_length = _length(node.left)
+            if index < left_length:
+                node = node.left
+            elif index < left_length + len(node.text):
+                return node.text[index - left_length], node.color_pair
+            else:
+                index -= left_length + len(node.text)
+                node = node.right
+        raise IndexError(f"TextRope does not contain index: {index}")
+
+    def insert(self, index: int, text: str, color_pair: int = ColorCode.DEFAULT):
+        """Insert text with color_pair before the character at index"""
+        if not 0 <= index <= len(self):
+            raise IndexError(f"Cannot insert at index {index} of a TextRope of length {len(self)}")
+        if text == "":
+            return
+
+        left, right = _split(self._root, index)
+        consumed = self._extend_last_chunk(left, text, color_pair)
+        for start in range(consumed, len(text), self.MAX_CHUNK):
+            left = _merge(left, _RopeNode(text[start : start + self.MAX_CHUNK], color_pair))
+        self._root = _merge(left, right)
+
+    def delete(self, start: int, stop: int):
+        """Delete the characters in [start, stop).  The range is clamped to the rope."""
+        start = max(start, 0)
+        stop = min(stop, len(self))
+        if start >= stop:
+            return
+        left, right = _split(self._root, stop)
+        left, _ = _split(left, start)
+        self._root = _merge(left, right)
+
+    def chunks(self, start: int = 0, stop: int = None) -> Iterator[Tuple[str, int]]:
+        """Iterate over the raw (text, color_pair) chunks covering [start, stop), clipped to that range.
+        Subtrees entirely before start are skipped, so this costs O(log n + k)."""
+        if stop is None or stop > len(self):
+            stop = len(self)
+        start = max(start, 0)
+        if start >= stop:
+            return
+
+        stack = []
+        node = self._root
+        offset = 0
+        while stack or node is not None:
+            while node is not None:
+                node_start = offset + _length(node.left)
+                if start < node_start:
+                    stack.append((node, node_start))
+                    node = node.left
+                elif start < node_start + len(node.text):
+                    stack.append((node, node_start))
+                    node = None
+                else:
+                    offset = node_start + len(node.text)
+                    node = node.right
+
+            if not stack:
+                return
+            node, node_start = stack.pop()
+            if node_start >= stop:
+                return
+            chunk_start = max(start - node_start, 0)
+            chunk_stop = min(stop - node_start, len(node.text))
+            if chunk_start < chunk_stop:
+                yield node.text[chunk_start:chunk_stop], node.color_pair
+            offset = node_start + len(node.text)
+            node = node.right
+
+    def segments(self, start: int = 0, stop: int = None) -> Iterator[TextSegment]:
+        """Iterate over the TextSegments covering [start, stop), combining chunks with the same color pair"""
+        parts = []
+        color_pair = None
+        for text, chunk_color_pair in self.chunks(start, stop):
+            if parts and chunk_color_pair != color_pair:
+                yield TextSegment("".join(parts), color_pair)
+                parts = []
+            parts.append(text)
+            color_pair = chunk_color_pair
+        if parts:
+            yield TextSegment("".join(parts), color_pair)
+
+    def _extend_last_chunk(self, node: Optional[_RopeNode], text: str, color_pair: int) -> int:
+        """Append as much of text as fits onto the last chunk of node, if it has the same color pair.
+        This keeps character-at-a-time typing from creating one chunk per keystroke.
+
+        Returns:
+            int: The number of characters of text that were appended
+        """
+        path = []
+        while node is not None:
+            path.append(node)
+            node = node.right
+        if len(path) == 0 or path[-1].color_pair != color_pair:
+            return 0
+
+        last = path[-1]
+        consumed = min(len(text), self.MAX_CHUNK - len(last.text))
+        if consumed <= 0:
+            return 0
+        last.text += text[:consumed]
+        for path_node in path:
+            path_node.length += consumed
+        return consumed
+
+    def __len__(self) -> int:
+        return _length(self._root)
+
+    def __str__(self) -> str:
+        return "".join(text for text, _ in self.chunks())
+
+    def __repr__(self) -> str:
+        return f"TextRope({list(self.segments())})"
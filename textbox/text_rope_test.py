@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from textbox.text_rope import TextRope
+from textbox.text_segment import TextSegment
+
+
+def test_init():
+    assert str(TextRope()) == ""
+    assert len(TextRope()) == 0
+
+    test = TextRope([TextSegment("hello", 1), TextSegment(" world", 2)])
+    assert str(test) == "hello world"
+    assert len(test) == 11
+    assert list(test.segments()) == [TextSegment("hello", 1), TextSegment(" world", 2)]
+
+
+def test_insert():
+    test = TextRope()
+    test.insert(0, "world", 1)
+    test.insert(0, "hello ", 1)
+    test.insert(len(test), "!", 2)
+    assert str(test) == "hello world!"
+    assert list(test.segments()) == [TextSegment("hello world", 1), TextSegment("!", 2)]
+
+    with pytest.raises(IndexError):
+        test.insert(-1, "a")
+    with pytest.raises(IndexError):
+        test.insert(len(test) + 1, "a")
+
+
+def test_insert_splits_segment():
+    test = TextRope([TextSegment("hello", 1)])
+    test.insert(2, "XY", 2)
+    assert list(test.segments()) == [TextSegment("he", 1), TextSegment("XY", 2), TextSegment("llo", 1)]
+
+
+def test_delete():
+    test = TextRope([TextSegment("hello", 1), TextSegment(" world", 2)])
+    test.delete(3, 7)
+    assert str(test) == "helorld"
+    assert list(test.segments()) == [TextSegment("hel", 1), TextSegment("orld", 2)]
+    test.delete(5, 100)
+    assert str(test) == "helor"
+    test.delete(3, 3)
+    assert str(test) == "helor"
+
+
+def test_char_at():
+    test = TextRope([TextSegment("ab", 1), TextSegment("cd", 2)])
+    assert test.char_at(0) == ("a", 1)
+    assert test.char_at(3) == ("d", 2)
+    assert test.color_at(2) == 2
+    with pytest.raises(IndexError):
+        test.char_at(4)
+    with pytest.raises(IndexError):
+        test.char_at(-1)
+
+
+def test_segments_range():
+    test = TextRope([TextSegment("hello", 1), TextSegment(" world", 2)])
+    assert list(test.segments(3, 8)) == [TextSegment("lo", 1), TextSegment(" wo", 2)]
+    assert list(test.segments(6)) == [TextSegment("world", 2)]
+    assert list(test.segments(8, 8)) == []
+
+
+def test_long_insert_is_chunked():
+    test = TextRope()
+    test.insert(0, "a" * (TextRope.MAX_CHUNK * 3 + 5))
+    assert len(test) == TextRope.MAX_CHUNK * 3 + 5
+    assert len(list(test.chunks())) == 4
+    assert list(test.segments()) == [TextSegment("a" * (TextRope.MAX_CHUNK * 3 + 5))]
+
+
+def test_typing_extends_last_chunk():
+    test = TextRope()
+    for ch in "hello world":
+        test.insert(len(test), ch)
+    assert len(list(test.chunks())) == 1
+
+
+def test_matches_str_model():
+    rng = random.Random(0)
+    test = TextRope()
+    model = []
+    for _ in range(2000):
+        if model and rng.random() < 0.4:
+            start = rng.randrange(len(model))
+            stop = start + rng.randrange(1, 5)
+            test.delete(start, stop)
+            del model[start:stop]
+        else:
+            index = rng.randrange(len(model) + 1)
+            color_pair = rng.randrange(3)
+            text = "".join(rng.choice("abc") for _ in range(rng.randrange(1, 4)))
+            test.insert(index, text, color_pair)
+            model[index:index] = [(ch, color_pair) for ch in text]
+
+        assert len(test) == len(model)
+    assert str(test) == "".join(ch for ch, _ in model)
+    assert [test.char_at(idx) for idx in range(len(model))] == model
@@ -0,0 +1,54 @@
+from typing import Iterator, Union
+
+from textbox.text_line import TextLine
+from textbox.text_segment import TextSegment
+from textbox.segmented_text_line import SegmentedTextLine
+
+
+class TextRow:
+    """A view of a single wrapped row of a TextLine, covering the columns [start, stop).
+
+    Nothing is copied when a TextRow is created.  The segments of the row are read out of the
+    underlying TextLine only when the row is iterated, so a viewport of rows costs memory in
+    proportion to its height rather than to the text behind it."""
+
+    __slots__ = ("line", "start", "stop")
+
+    def __init__(self, line: TextLine, start: int, stop: int):
+        self.line = line
+        self.start = start
+        self.stop = stop
+
+    @property
+    def text(self) -> str:
+        """Get the text of the row"""
+        return "".join(str(segment) for segment in self)
+
+    def __iter__(self) -> Iterator[TextSegment]:
+        return self.line.segments(self.start, self.stop)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[TextSegment, SegmentedTextLine]:
+        if isinstance(item, slice):
+            if item.step is not None and item.step != 1:
+                raise IndexError("TextRow does not support slicing with a step at this time")
+            start, stop, _ = item.indices(len(self))
+            return self.line[self.start + start : self.start + stop]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f"TextRow does not contain index: {item}")
+        return self.line[self.start + item]
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"TextRow(text={self.text}, start={self.start}, stop={self.stop})"
+
+    def __eq__(self, other: "TextRow") -> bool:
+        if isinstance(other, TextRow):
+            return self.line is other.line and self.start == other.start and self.stop == other.stop
+        return False
@@ -31,6 +31,9 @@ class TextSegment:
     def __str__(self):
         return self._text
 
+    def __contains__(self, item: str):
+        return item in self._text
+
     def __getitem__(self, item: Union[int, slice]):
         return TextSegment(self._text[item], self.color_pair)
 
@@ -1,7 +1,10 @@
+import random
+
 import pytest
 from textbox.text import Text
 from textbox.text_line import TextLine
 from textbox.box_types import Position
+from textbox.text_segment import TextSegment
 
 
 def test_init():
@@ -246,6 +249,79 @@ def test_insert():
     assert test.cursor_position == (1, 0)
 
 
+def insert_per_character(test: Text, text: str):
+    for ch in text:
+        if ch == "\n":
+            test.insert_newline()
+        else:
+            test.current_line.insert(ch, test.column_ptr)
+            test._line_changed(test._line_ptr)
+            test.increment_column_ptr()
+
+
+@pytest.mark.parametrize("payload", ["", "abc", "\n", "ab\ncd", "\n\nx\n", "one\ntwo\nthree", "x\n"])
+@pytest.mark.parametrize("position", [Position(0, 0), Position(0, 2), Position(0, 5), Position(1, 3)])
+def test_insert_block_matches_typing(payload, position):
+    expected = Text("hello\nworld", max_line_width=4)
+    expected.edit_mode = True
+    expected.goto(position)
+    insert_per_character(expected, payload)
+
+    test = Text("hello\nworld", max_line_width=4)
+    test.edit_mode = True
+    test.goto(position)
+    test.insert_block(payload)
+    assert test.text == expected.text
+    assert [list(line.segments()) for line in test._text_lines] == [
+        list(line.segments()) for line in expected._text_lines
+    ]
+    assert (test.line_ptr, test.column_ptr) == (expected.line_ptr, expected.column_ptr)
+    assert test.line_count == expected.line_count
+    assert test.cursor_position == expected.cursor_position
+
+
+def test_insert_block_into_empty_text():
+    test = Text()
+    test.insert_block("hello\nworld")
+    assert test.text == "hello\nworld"
+    assert (test.line_ptr, test.column_ptr) == (1, 4)
+
+    test = Text()
+    test.edit_mode = True
+    test.insert_block("hello\nworld")
+    assert (test.line_ptr, test.column_ptr) == (1, 5)
+
+
+def test_insert_block_segment():
+    test = Text("hi")
+    test.edit_mode = True
+    test.goto(Position(0, 0))
+    test.insert_block(TextSegment("a\nb", 3))
+    assert [list(line.segments()) for line in test._text_lines] == [
+        [TextSegment("a", 3)],
+        [TextSegment("b", 3), TextSegment("hi", None)],
+    ]
+    assert (test.line_ptr, test.column_ptr) == (1, 1)
+
+
+def test_replace_range():
+    test = Text("hello\nbig\nworld")
+    test.edit_mode = True
+    test.replace_range(Position(0, 2), Position(2, 3), "y\nthe")
+    assert test.text == "hey\ntheld"
+    assert (test.line_ptr, test.column_ptr) == (1, 3)
+    assert test.line_count == 2
+
+    test.replace_range(Position(1, 0), Position(1, 5))
+    assert test.text == "hey\n"
+    assert (test.line_ptr, test.column_ptr) == (1, 0)
+
+    with pytest.raises(IndexError):
+        test.replace_range(Position(1, 0), Position(2, 0), "")
+    with pytest.raises(ValueError):
+        test.replace_range(Position(1, 2), Position(1, 1), "")
+
+
 def test_delete_line():
     test = Text("")
     test.delete_line()
@@ -408,3 +484,120 @@ def test_insert_from_empty():
     test.edit_mode = False
     with pytest.raises(RuntimeError):
         test.insert("h")
+
+
+def test_wrapped_cursor_position_tracks_edits():
+    test = Text("hello\nworld\nfoo", max_line_width=2)
+    assert test.line_count == 8
+    assert test.cursor_position == (7, 0)
+    test.edit_mode = True
+    test.to_first_line()
+    test.to_end_of_line()
+    test.insert("!!")
+    assert test.line_count == 9
+    test.to_last_line()
+    test.to_end_of_line()
+    assert test.cursor_position == (8, 1)
+    test.max_line_width = 3
+    assert test.line_count == 6
+    test.current_line.insert("ba")
+    assert test.line_count == 7
+    assert test.cursor_position == (6, 0)
+    test.insert_newline()
+    assert test.line_count == 7
+    assert test.cursor_position == (6, 0)
+    assert test.current_line == TextLine("ba")
+    test.insert_newline()
+    assert test.line_count == 8
+    assert test.cursor_position == (7, 0)
+    test.backspace()
+    assert test.line_count == 7
+
+
+def test_iter_rows():
+    test = Text("hello\nworld")
+    assert [str(row) for row in test.iter_rows()] == ["hello", "world"]
+    test.max_line_width = 2
+    assert [str(row) for row in test.iter_rows()] == [str(line) for line in test.lines]
+    assert [str(row) for row in test.iter_rows(2, 4)] == ["o", "wo"]
+    assert [len(row) for row in test.iter_rows(3)] == [2, 2, 1]
+
+
+def test_wrap_cache():
+    test = Text("hello\nworld", max_line_width=2)
+    assert test.line_count == 6
+    wrapped_at_2 = test._row_index
+    test.max_line_width = 3
+    assert test.line_count == 4
+    test.max_line_width = 2
+    assert test._row_index is wrapped_at_2
+    assert test.line_count == 6
+
+    test.current_line.insert("!")
+    assert test.line_count == 6
+    test.max_line_width = 3
+    assert test.line_count == 4
+    test.max_line_width = 5
+    assert test.line_count == 3
+
+
+@pytest.mark.parametrize("edit_mode", [False, True])
+@pytest.mark.parametrize("count", [0, 1, 2, 5, 9, 40])
+def test_counted_moves_match_single_moves(edit_mode, count):
+    for method in ["increment_column_ptr", "decrement_column_ptr", "increment_line_ptr", "decrement_line_ptr"]:
+        expected = Text("hello\n\nworld wide\nab")
+        expected.edit_mode = edit_mode
+        expected.goto(Position(2, 3))
+        for _ in range(count):
+            getattr(expected, method)()
+
+        test = Text("hello\n\nworld wide\nab")
+        test.edit_mode = edit_mode
+        test.goto(Position(2, 3))
+        getattr(test, method)(count)
+        assert (test.line_ptr, test.column_ptr) == (expected.line_ptr, expected.column_ptr), method
+
+
+def test_append_extends_the_row_index():
+    test = Text("ab", max_line_width=3)
+    test.goto(Position(0, 0))
+    assert test.line_count == 1
+    for token in ["cd", "\nef", "ghij\n", "", "k"]:
+        test.append(token)
+        rebuilt = Text("\n".join(str(line) for line in test._text_lines), max_line_width=3)
+        assert list(test._rows) == list(rebuilt._rows)
+    assert [str(line) for line in test._text_lines] == ["abcd", "efghij", "k"]
+    assert test.line_count == 5
+    assert (test.line_ptr, test.column_ptr) == (2, 0)
+    assert test.row_to_line(3) == rebuilt.row_to_line(3)
+
+
+def test_structural_edits_update_the_row_index_in_place():
+    rng = random.Random(0)
+    test = Text("\n".join("x" * rng.randrange(12) for _ in range(30)), max_line_width=4)
+    test.edit_mode = True
+    assert test.line_count > 0
+    test.max_line_width = 5
+    assert test.line_count > 0
+    wrapped_at_5 = test._row_index
+    edits = [
+        lambda: test.delete_line(),
+        lambda: test.backspace(),
+        lambda: test.break_line(),
+        lambda: test.insert_newline(),
+        lambda: test.insert_block("ab\ncdefgh\nij"),
+        lambda: test.replace_range(Position(0, 0), Position(min(2, test.last_line_in_text), 0), "k\nl"),
+    ]
+    for _ in range(200):
+        lineno = rng.randrange(len(test._text_lines))
+        test.goto(Position(lineno, rng.randrange(len(test._text_lines[lineno]) + 1)))
+        if rng.random() < 0.3:
+            # An edit made directly through current_line is only seen by the index later.
+            test.current_line.insert("mnopqr")
+        rng.choice(edits)()
+        for width in (4, 5):
+            test.max_line_width = width
+            rebuilt = Text("\n".join(str(line) for line in test._text_lines), max_line_width=width)
+            assert list(test._rows) == list(rebuilt._rows)
+    # Neither index was rebuilt.
+    assert test._row_index is wrapped_at_5
@@ -82,16 +82,34 @@ class Window:
     def refresh(self, verbose=False):
         self._local_window.refresh()
 
+    def noutrefresh(self, verbose=False):
+        """Copy the window to the virtual screen without updating the terminal.  See curses.doupdate."""
+        self._local_window.noutrefresh()
+
     def refresh_all(self, verbose=False):
         self._local_window.refresh()
         for subwin in self.__children:
             subwin.refresh()
 
+    def touch(self, verbose=False):
+        """Mark the whole window as changed, so the next refresh copies all of it to the screen."""
+        self._local_window.touchwin()
+
     def erase(self, verbose=False):
         if verbose:
             logger.info("Erased window")
         self._local_window.erase()
 
+    def scroll(self, lines: int, top: int, bottom: int, verbose=False):
+        """Scroll rows top through bottom up by lines, or down if lines is negative.  Rows scrolled in are blank."""
+        if verbose:
+            logger.info("Scroll rows %s-%s by %s", top, bottom, lines)
+        self._local_window.setscrreg(top, bottom)
+        self._local_window.scrollok(True)
+        self._local_window.scroll(lines)
+        # Leave scrolling off, so writing the bottom right cell doesn't scroll the window.
+        self._local_window.scrollok(False)
+
     def addch(self, ch: str, position: Position = None, attributes: list = None, verbose=False):
         if type(ch) is not str:
             raise ValueError(f"ch must be a string, not {type(ch)}")